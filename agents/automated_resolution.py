@@ -1,10 +1,14 @@
+import logging
 from agents.base import Agent
-from services.groq_service import GroqService
+from services.generation_profiles import get_profile
+from services.groq_service import BACKEND_UNAVAILABLE, GroqService
 from utils.text_processing import preprocess_text
 
+logger = logging.getLogger(__name__)
+
 class AutomatedResolutionAgent(Agent):
-    def __init__(self):
-        self.groq_service = GroqService()
+    def __init__(self, groq_service: GroqService = None):
+        self.groq_service = groq_service or GroqService(profile=get_profile("automated_resolution"))
         self.automatable_categories = [
             "password_reset",
             "account_activation",
@@ -13,6 +17,14 @@ class AutomatedResolutionAgent(Agent):
             "documentation_request"
         ]
 
+    def default_result(self):
+        return {
+            'can_automate': False,
+            'automation_steps': [],
+            'success_probability': 0,
+            'required_apis': []
+        }
+
     def process(self, title: str, description: str, category: str, priority: int):
         try:
             # Preprocess the input text
@@ -42,7 +54,10 @@ class AutomatedResolutionAgent(Agent):
             """
             
             response = self.groq_service.get_completion(prompt)
-            print(f"[DEBUG] AutomatedResolutionAgent raw API response: {response}")
+            logger.debug("AutomatedResolutionAgent raw API response: %s", response)
+            if response == BACKEND_UNAVAILABLE:
+                # Nothing is automated without the LLM to plan the steps
+                return self.default_result()
             
             try:
                 automate, steps, probability, apis = response.strip().split("|")
@@ -53,22 +68,12 @@ class AutomatedResolutionAgent(Agent):
                     'required_apis': [api.strip() for api in apis.split(",") if api.strip()]
                 }
             except (ValueError, AttributeError) as e:
-                print(f"Error parsing API response: {str(e)}")
-                return {
-                    'can_automate': False,
-                    'automation_steps': [],
-                    'success_probability': 0,
-                    'required_apis': []
-                }
+                logger.warning("Error parsing API response: %s", e)
+                return self.default_result()
                 
         except Exception as e:
-            print(f"Unexpected error in automated resolution: {str(e)}")
-            return {
-                'can_automate': False,
-                'automation_steps': [],
-                'success_probability': 0,
-                'required_apis': []
-            }
+            logger.error("Unexpected error in automated resolution: %s", e)
+            return self.default_result()
 
     def train(self, training_data):
         # Training would be implemented here in a production system
@@ -1,6 +1,15 @@
 from abc import ABC, abstractmethod
+from utils import metrics
+
+AGENT_SECONDS = metrics.histogram("agent_process_seconds", "Duration of agent process() calls", ["agent"])
 
 class Agent(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Time every agent's process() without each agent having to opt in
+        if "process" in cls.__dict__:
+            cls.process = metrics.timed(AGENT_SECONDS, agent=cls.__name__)(cls.process)
+
     @abstractmethod
     def process(self, *args, **kwargs):
         pass
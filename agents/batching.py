@@ -0,0 +1,79 @@
+import logging
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_ROW = re.compile(r"^\s*\[?(T\d+)\]?\s*\|(.*)$")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (about four characters per token)
+    """
+    return len(text) // 4 + 1
+
+def pack_batches(tickets: Sequence[Tuple[int, str, str]], token_budget: int, max_batch_size: int,
+                 overhead_tokens: int, tokens_per_answer: int) -> List[List[Tuple[int, str, str]]]:
+    """
+    Greedily group (index, title, description) tickets so that each batch's
+    prompt plus expected answers stays within token_budget
+    """
+    batches, current, used = [], [], overhead_tokens
+    for ticket in tickets:
+        cost = estimate_tokens(ticket[1]) + estimate_tokens(ticket[2]) + tokens_per_answer + 8
+        if current and (used + cost > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current, used = [], overhead_tokens
+        current.append(ticket)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def format_tickets(batch: Sequence[Tuple[int, str, str]]) -> str:
+    return "\n".join(
+        f"[T{index}]\nTitle: {title}\nDescription: {description}\n" for index, title, description in batch
+    )
+
+def parse_rows(response: str) -> Dict[int, str]:
+    """
+    Split a batched reply into {ticket index: row text after the id}
+    """
+    rows = {}
+    for line in response.splitlines():
+        match = _ROW.match(line)
+        if match:
+            rows.setdefault(int(match.group(1)[1:]), match.group(2).strip())
+    return rows
+
+def run_batched(tickets: Sequence[Tuple[str, str]], build_prompt: Callable[[str], str],
+                parse_row: Callable[[str], object], get_completion: Callable[[str, int], str],
+                token_budget: int, max_batch_size: int, tokens_per_answer: int,
+                max_retries: int = 1) -> List[Optional[object]]:
+    """
+    Classify many tickets with one LLM request per batch. Tickets whose row
+    is missing or fails to parse are re-batched and retried up to
+    max_retries times; anything still unresolved comes back as None.
+    """
+    results: List[Optional[object]] = [None] * len(tickets)
+    pending = [(index, title, description) for index, (title, description) in enumerate(tickets)]
+    overhead_tokens = estimate_tokens(build_prompt(""))
+
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        failed = []
+        for batch in pack_batches(pending, token_budget, max_batch_size, overhead_tokens, tokens_per_answer):
+            response = get_completion(build_prompt(format_tickets(batch)), tokens_per_answer * len(batch) + 50)
+            rows = {} if response.startswith("Error:") else parse_rows(response)
+            for ticket in batch:
+                try:
+                    results[ticket[0]] = parse_row(rows[ticket[0]])
+                except (KeyError, ValueError, AttributeError):
+                    failed.append(ticket)
+        if failed:
+            logger.warning("%s of %s batched tickets failed to parse (attempt %s)",
+                           len(failed), len(pending), attempt + 1)
+        pending = failed
+
+    return results
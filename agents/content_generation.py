@@ -1,12 +1,36 @@
+import logging
+from typing import Generator, Optional
 from agents.base import Agent
-from services.groq_service import GroqService
+from services.generation_profiles import get_profile
+from services.groq_service import BACKEND_UNAVAILABLE, GroqService
+
+logger = logging.getLogger(__name__)
 
 class ContentGenerationAgent(Agent):
-    def __init__(self):
-        self.groq_service = GroqService()
+    def __init__(self, groq_service: GroqService = None):
+        # Responses should read fresh each time, so generated content is never cached
+        self.groq_service = groq_service or GroqService(use_cache=False, profile=get_profile("content_generation"))
 
-    def process(self, ticket_title: str, ticket_description: str, knowledge_base_solution: str = None):
-        prompt = f"""Generate a professional and helpful response for this support ticket:
+    def default_result(self):
+        return (
+            "Thank you for contacting support. We have received your ticket and "
+            "a member of our team will follow up with you shortly."
+        )
+
+    def local_result(self, knowledge_base_solution: str = None):
+        """
+        Template response used while the LLM is unavailable
+        """
+        if not knowledge_base_solution:
+            return self.default_result()
+        return (
+            "Thank you for contacting support. The following steps have resolved similar issues:\n\n"
+            f"{knowledge_base_solution}\n\n"
+            "If this does not help, reply to this ticket and a member of our team will follow up."
+        )
+
+    def _prompt(self, ticket_title: str, ticket_description: str, knowledge_base_solution: str = None) -> str:
+        return f"""Generate a professional and helpful response for this support ticket:
         Title: {ticket_title}
         Description: {ticket_description}
         
@@ -18,11 +42,41 @@ class ContentGenerationAgent(Agent):
         3. Provide clear next steps
         4. Include relevant solution if available
         """
-        
+
+    def process(self, ticket_title: str, ticket_description: str, knowledge_base_solution: str = None):
+        prompt = self._prompt(ticket_title, ticket_description, knowledge_base_solution)
         response = self.groq_service.get_completion(prompt)
-        print(f"[DEBUG] ContentGenerationAgent raw API response: {response}")
+        logger.debug("ContentGenerationAgent raw API response: %s", response)
+        if response == BACKEND_UNAVAILABLE:
+            return self.local_result(knowledge_base_solution)
+        if response.startswith("Error:"):
+            logger.warning("Using the default response due to API error: %s", response)
+            return self.default_result()
         return response
 
+    def process_stream(self, ticket_title: str, ticket_description: str, knowledge_base_solution: str = None,
+                       timeout: Optional[float] = None) -> Generator[str, None, bool]:
+        """
+        Like process(), but yields the response in chunks as it is generated,
+        giving up after timeout seconds. If the LLM fails before any text
+        arrives, the local or default response is yielded instead. Returns
+        whether the LLM's response was complete.
+        """
+        prompt = self._prompt(ticket_title, ticket_description, knowledge_base_solution)
+        received = False
+        for chunk in self.groq_service.stream_completion(prompt, timeout=timeout):
+            if chunk == BACKEND_UNAVAILABLE:
+                yield self.local_result(knowledge_base_solution)
+                return False
+            if chunk.startswith("Error:"):
+                logger.warning("Response stream failed: %s", chunk)
+                if not received:
+                    yield self.default_result()
+                return False
+            received = True
+            yield chunk
+        return True
+
     def train(self, training_data):
         # Training would be implemented here in a production system
         pass
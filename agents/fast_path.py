@@ -0,0 +1,138 @@
+import logging
+import os
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Hashable, List, Optional, Sequence, Tuple
+from utils import metrics
+from utils.naive_bayes import HashedNaiveBayes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_DIR = os.getenv("LOCAL_MODEL_DIR", ".cache/models")
+DEFAULT_THRESHOLD = float(os.getenv("LOCAL_MODEL_THRESHOLD", "0.9"))
+# Share of confident local answers that are also sent to the LLM to measure agreement
+DEFAULT_AUDIT_RATE = float(os.getenv("LOCAL_MODEL_AUDIT_RATE", "0.05"))
+
+FAST_PATH_DECISIONS = metrics.counter("fast_path_decisions_total",
+                                      "Fast-path predictions by whether they replaced the LLM call",
+                                      ["classifier", "path"])
+
+# (classifier name, key) of the labels the LLM assigned inside track_llm_labels()
+_llm_labels: ContextVar[Optional[list]] = ContextVar("llm_labels", default=None)
+
+@contextmanager
+def track_llm_labels():
+    """
+    Collect (classifier name, key) for every label the LLM assigned in the
+    enclosed block, so a caller can tell LLM labels from local predictions
+    and fallbacks. Batch calls pass the ticket's index as key; single
+    tickets use None.
+    """
+    labels: List[Tuple[str, Any]] = []
+    token = _llm_labels.set(labels)
+    try:
+        yield labels
+    finally:
+        _llm_labels.reset(token)
+
+def record_llm_label(name: str, key: Optional[Hashable] = None):
+    labels = _llm_labels.get()
+    if labels is not None:
+        labels.append((name, key))
+
+@dataclass
+class Prediction:
+    label: Optional[str]
+    confidence: float
+    use_local: bool
+    audited: bool = False
+
+class FastPathClassifier:
+    """
+    Local model an agent consults before calling the LLM. A prediction at or
+    above threshold confidence is used as the answer; anything else falls
+    through to the LLM, whose answer is compared with the local prediction
+    so the agreement rate can be reported.
+    """
+
+    def __init__(self, name: str, model_dir: str = None, threshold: float = None,
+                 audit_rate: float = None, min_examples: int = 20):
+        self.name = name
+        self.path = os.path.join(model_dir or DEFAULT_MODEL_DIR, f"{name}.npz")
+        self.threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+        self.audit_rate = DEFAULT_AUDIT_RATE if audit_rate is None else audit_rate
+        self.min_examples = min_examples
+        self.model: Optional[HashedNaiveBayes] = None
+        self._lock = threading.Lock()
+        self._stats = {'local': 0, 'llm': 0, 'compared': 0, 'agreed': 0, 'audited': 0, 'audit_agreed': 0}
+        self.load()
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            self.model = HashedNaiveBayes.load(self.path)
+            logger.debug("Loaded local %s model with %s labels", self.name, len(self.model.labels))
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Could not load local %s model: %s", self.name, e)
+            return False
+
+    def train(self, texts: Sequence[str], labels: Sequence[str]) -> int:
+        """
+        Fit on labelled texts and persist the model. Returns the number of
+        examples used; nothing is trained below min_examples.
+        """
+        examples = [(text, label) for text, label in zip(texts, labels) if text and label]
+        if len(examples) < self.min_examples:
+            logger.warning("Not enough labelled tickets to train %s (%s)", self.name, len(examples))
+            return 0
+        texts, labels = zip(*examples)
+        model = HashedNaiveBayes().fit(texts, labels)
+        model.save(self.path)
+        self.model = model
+        logger.debug("Trained local %s model on %s tickets", self.name, len(examples))
+        return len(examples)
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        if self.model is None:
+            return None, 0.0
+        return self.model.predict(text)
+
+    def decide(self, text: str) -> Prediction:
+        """
+        Predict and decide whether the prediction replaces the LLM call.
+        Counts the outcome towards the hit rate.
+        """
+        label, confidence = self.predict(text)
+        prediction = Prediction(label, confidence, label is not None and confidence >= self.threshold)
+        if prediction.use_local and random.random() < self.audit_rate:
+            prediction.use_local, prediction.audited = False, True
+        with self._lock:
+            self._stats['local' if prediction.use_local else 'llm'] += 1
+        FAST_PATH_DECISIONS.inc(classifier=self.name, path="local" if prediction.use_local else "llm")
+        return prediction
+
+    def record_llm_answer(self, prediction: Prediction, answer: str, key: Optional[Hashable] = None):
+        record_llm_label(self.name, key)
+        if prediction.label is None:
+            return
+        with self._lock:
+            self._stats['compared'] += 1
+            self._stats['audited'] += prediction.audited
+            if prediction.label == answer:
+                self._stats['audit_agreed' if prediction.audited else 'agreed'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats['local'] + stats['llm']
+        stats['hit_rate'] = stats['local'] / total if total else 0.0
+        stats['agreement'] = (stats['agreed'] + stats['audit_agreed']) / stats['compared'] if stats['compared'] else None
+        # Agreement on audited confident answers estimates the fast path's accuracy
+        stats['audit_agreement'] = stats['audit_agreed'] / stats['audited'] if stats['audited'] else None
+        stats['trained'] = self.model is not None
+        return stats
@@ -0,0 +1,176 @@
+import json
+import logging
+from agents.base import Agent
+from agents.fast_path import record_llm_label
+from agents.ticket_classification import TicketClassificationAgent
+from agents.intent_extraction import IntentExtractionAgent
+from agents.language_semantics import LanguageSemanticsAgent
+from agents.priority_understanding import PriorityUnderstandingAgent
+from services.generation_profiles import get_profile
+from services.groq_service import BACKEND_UNAVAILABLE, GroqService
+
+logger = logging.getLogger(__name__)
+
+class FusedAnalysisAgent(Agent):
+    """
+    Runs classification, intent extraction, language semantics and priority
+    understanding as a single structured LLM request, then fans the reply
+    back out into the results the individual agents would have returned.
+    """
+
+    def __init__(self, tca: TicketClassificationAgent = None, iea: IntentExtractionAgent = None,
+                 lsa: LanguageSemanticsAgent = None, pua: PriorityUnderstandingAgent = None,
+                 groq_service: GroqService = None):
+        self.groq_service = groq_service or GroqService(profile=get_profile("fused_analysis"))
+        self.tca = tca or TicketClassificationAgent()
+        self.iea = iea or IntentExtractionAgent()
+        self.lsa = lsa or LanguageSemanticsAgent()
+        self.pua = pua or PriorityUnderstandingAgent()
+
+    def process(self, title: str, description: str):
+        try:
+            prompt = f"""Analyze this support ticket:
+            Title: {title}
+            Description: {description}
+
+            Respond with a single JSON object and nothing else, using exactly these keys:
+            {{
+                "category": one of: {', '.join(self.tca.categories)},
+                "priority": a number 1-4 (1=Low, 2=Medium, 3=High, 4=Critical) based on urgency and impact,
+                "primary_intent": one of: {', '.join(self.iea.intent_types)},
+                "secondary_intents": list of other intents (may be empty),
+                "required_actions": list of actions needed,
+                "routing": the suggested department/team,
+                "sentiment": one of: {', '.join(self.lsa.sentiment_levels)},
+                "urgency": one of: {', '.join(self.lsa.urgency_levels)},
+                "key_phrases": list of the most important phrases,
+                "technical_terms": list of any technical terms used,
+                "sla_requirement": the time within which this should be resolved,
+                "business_impact": a brief description of the impact,
+                "user_frustration": one of: Low, Medium, High
+            }}
+            """
+
+            response = self.groq_service.get_completion(prompt)
+            logger.debug("FusedAnalysisAgent raw API response: %s", response)
+            if response == BACKEND_UNAVAILABLE:
+                return self.local_result(title, description)
+
+            data = self._parse(response)
+            # Only fields the reply actually filled in count as LLM labels, not their defaults
+            if (_choice(data, 'category', self.tca.categories, None) is not None
+                    and _choice(data, 'priority', list(self.tca.priority_levels), None) is not None):
+                record_llm_label(self.tca.fast_path.name)
+            if _choice(data, 'primary_intent', self.iea.intent_types, None) is not None:
+                record_llm_label(self.iea.fast_path.name)
+            return self.fan_out(data)
+
+        except Exception as e:
+            logger.error("Unexpected error in fused analysis: %s", e)
+            return self.fan_out({})
+
+    def local_result(self, title: str, description: str):
+        """
+        Combine the individual agents' keyword-based results while the LLM
+        is unavailable
+        """
+        category, priority = self.tca.local_result(title, description)
+        priority_info = self.pua.local_result(title, description, priority)
+        return {
+            'classification': (category, priority),
+            'intent_info': self.iea.local_result(title, description),
+            'semantics': self.lsa.local_result(title, description),
+            'priority_info': priority_info
+        }
+
+    def _parse(self, response: str) -> dict:
+        if response.startswith("Error:"):
+            logger.warning("Using default values due to API error: %s", response)
+            return {}
+
+        # Tolerate code fences or chatter around the JSON object
+        start, end = response.find("{"), response.rfind("}")
+        try:
+            data = json.loads(response[start:end + 1]) if start != -1 else None
+        except ValueError as e:
+            logger.warning("Error parsing API response: %s", e)
+            return {}
+        if not isinstance(data, dict):
+            logger.debug("Fused analysis response is not a JSON object")
+            return {}
+        return data
+
+    def fan_out(self, data: dict):
+        """
+        Validate each field of the fused reply and build the per-agent results,
+        falling back to that agent's default for any missing or invalid field
+        """
+        category, priority = self.tca.default_result()
+        category = _choice(data, 'category', self.tca.categories, category)
+        priority = _choice(data, 'priority', list(self.tca.priority_levels), priority)
+
+        intent_defaults = self.iea.default_result()
+        intent_info = {
+            'primary_intent': _choice(data, 'primary_intent', self.iea.intent_types,
+                                      intent_defaults['primary_intent']),
+            'secondary_intents': _string_list(data, 'secondary_intents', intent_defaults['secondary_intents']),
+            'required_actions': _string_list(data, 'required_actions', intent_defaults['required_actions']),
+            'routing': _string(data, 'routing', intent_defaults['routing'])
+        }
+
+        semantics_defaults = self.lsa.default_result()
+        semantics = {
+            'sentiment': _choice(data, 'sentiment', self.lsa.sentiment_levels, semantics_defaults['sentiment']),
+            'urgency': _choice(data, 'urgency', self.lsa.urgency_levels, semantics_defaults['urgency']),
+            'key_phrases': _string_list(data, 'key_phrases', semantics_defaults['key_phrases']),
+            'technical_terms': _string_list(data, 'technical_terms', semantics_defaults['technical_terms'])
+        }
+
+        priority_defaults = self.pua.default_result(priority)
+        priority_info = {
+            'priority': priority,
+            'sla_requirement': _string(data, 'sla_requirement', priority_defaults['sla_requirement']),
+            'business_impact': _string(data, 'business_impact', priority_defaults['business_impact']),
+            'user_frustration': _choice(data, 'user_frustration', ['Low', 'Medium', 'High'],
+                                        priority_defaults['user_frustration'])
+        }
+
+        return {
+            'classification': (category, priority),
+            'intent_info': intent_info,
+            'semantics': semantics,
+            'priority_info': priority_info
+        }
+
+    def train(self, training_data):
+        # Training would be implemented here in a production system
+        pass
+
+def _string(data: dict, key: str, default: str) -> str:
+    value = data.get(key)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str) or not value.strip():
+        return default
+    return value.strip()
+
+def _string_list(data: dict, key: str, default: list) -> list:
+    value = data.get(key)
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        return list(default)
+    return [str(item).strip() for item in value if str(item).strip()]
+
+def _choice(data: dict, key: str, allowed: list, default):
+    value = data.get(key)
+    if isinstance(value, bool):
+        return default
+    if isinstance(value, str):
+        value = value.strip()
+        if isinstance(allowed[0], int):
+            try:
+                value = int(value)
+            except ValueError:
+                return default
+    return allowed[allowed.index(value)] if value in allowed else default
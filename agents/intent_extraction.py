@@ -1,10 +1,18 @@
+import logging
+from typing import List, Optional, Tuple
 from agents.base import Agent
-from services.groq_service import GroqService
+from agents import local_rules
+from agents.batching import run_batched
+from agents.fast_path import FastPathClassifier
+from services.generation_profiles import get_profile
+from services.groq_service import BACKEND_UNAVAILABLE, GroqService
 from utils.text_processing import preprocess_text
 
+logger = logging.getLogger(__name__)
+
 class IntentExtractionAgent(Agent):
-    def __init__(self):
-        self.groq_service = GroqService()
+    def __init__(self, groq_service: GroqService = None):
+        self.groq_service = groq_service or GroqService(profile=get_profile("intent_extraction"))
         self.intent_types = [
             'technical_support',
             'account_management',
@@ -15,9 +23,38 @@ class IntentExtractionAgent(Agent):
             'product_guidance',
             'service_outage'
         ]
+        # Trained on stored tickets; labels are the primary intent
+        self.fast_path = FastPathClassifier("intent_extraction")
+
+    def default_result(self):
+        return {
+            'primary_intent': 'general_inquiry',
+            'secondary_intents': [],
+            'required_actions': ['review_ticket'],
+            'routing': 'general_support'
+        }
+
+    def local_result(self, title: str, description: str):
+        """
+        Rough keyword-based intent used while the LLM is unavailable
+        """
+        return local_rules.intent(title, description)
+
+    def _from_primary_intent(self, primary_intent: str):
+        return {
+            'primary_intent': primary_intent,
+            'secondary_intents': [],
+            'required_actions': ['review_ticket'],
+            'routing': local_rules.INTENT_ROUTING.get(primary_intent, 'general_support')
+        }
 
     def process(self, title: str, description: str):
         try:
+            prediction = self.fast_path.decide(f"{title} {description}")
+            if prediction.use_local:
+                logger.debug("Local intent model answered %s (%.2f)", prediction.label, prediction.confidence)
+                return self._from_primary_intent(prediction.label)
+
             # Preprocess the input text
             preprocessed_text = preprocess_text(f"{title} {description}")
             
@@ -43,34 +80,92 @@ class IntentExtractionAgent(Agent):
             """
             
             response = self.groq_service.get_completion(prompt)
-            print(f"[DEBUG] IntentExtractionAgent raw API response: {response}")
+            logger.debug("IntentExtractionAgent raw API response: %s", response)
+            if response == BACKEND_UNAVAILABLE:
+                return self.local_result(title, description)
             
             try:
-                primary, secondary, actions, routing = response.strip().split("|")
-                return {
-                    'primary_intent': primary.strip(),
-                    'secondary_intents': [i.strip() for i in secondary.split(",") if i.strip()],
-                    'required_actions': [a.strip() for a in actions.split(",") if a.strip()],
-                    'routing': routing.strip()
-                }
+                result = self._parse(response)
+                self.fast_path.record_llm_answer(prediction, result['primary_intent'])
+                return result
             except (ValueError, AttributeError) as e:
-                print(f"Error parsing API response: {str(e)}")
-                return {
-                    'primary_intent': 'general_inquiry',
-                    'secondary_intents': [],
-                    'required_actions': ['review_ticket'],
-                    'routing': 'general_support'
-                }
+                logger.warning("Error parsing API response: %s", e)
+                return self.default_result()
                 
         except Exception as e:
-            print(f"Unexpected error in intent extraction: {str(e)}")
-            return {
-                'primary_intent': 'general_inquiry',
-                'secondary_intents': [],
-                'required_actions': ['review_ticket'],
-                'routing': 'general_support'
-            }
-
-    def train(self, training_data):
-        # Training would be implemented here in a production system
-        pass
+            logger.error("Unexpected error in intent extraction: %s", e)
+            return self.default_result()
+
+    def _parse(self, response: str):
+        primary, secondary, actions, routing = response.strip().split("|")
+        return {
+            'primary_intent': primary.strip(),
+            'secondary_intents': [i.strip() for i in secondary.split(",") if i.strip()],
+            'required_actions': [a.strip() for a in actions.split(",") if a.strip()],
+            'routing': routing.strip()
+        }
+
+    def process_batch(self, tickets: List[Tuple[str, str]], token_budget: int = 4000,
+                      max_batch_size: int = 15, max_retries: int = 1,
+                      fallback: bool = True) -> List[Optional[dict]]:
+        """
+        Extract intents for many (title, description) tickets, packing as many
+        as fit in token_budget into each LLM request. Results are in input
+        order. Tickets the LLM did not answer get the local or default result,
+        or None without fallback.
+        """
+        def build_prompt(ticket_block):
+            return f"""Analyze each support ticket below and determine:
+            1. Primary intent
+            2. Secondary intents (if any)
+            3. Required actions
+            4. Routing suggestion
+
+            {ticket_block}
+
+            Available intent types: {', '.join(self.intent_types)}
+
+            Respond with exactly one line per ticket, in format:
+            ticket_id|primary_intent|secondary_intents|required_actions|routing
+            Where:
+            - ticket_id is the id shown in brackets, e.g. T0
+            - primary_intent is one of the available intent types
+            - secondary_intents are comma-separated intents (if any)
+            - required_actions are comma-separated actions needed
+            - routing is the suggested department/team
+            """
+
+        # Confident local predictions never reach the LLM
+        predictions = [self.fast_path.decide(f"{title} {description}") for title, description in tickets]
+        results = [self._from_primary_intent(p.label) if p.use_local else None for p in predictions]
+        pending = [i for i, p in enumerate(predictions) if not p.use_local]
+
+        answers = run_batched([tickets[i] for i in pending], build_prompt, self._parse,
+                              lambda prompt, max_tokens: self.groq_service.get_completion(prompt, max_tokens, stop=()),
+                              token_budget, max_batch_size, tokens_per_answer=40, max_retries=max_retries)
+        for i, answer in zip(pending, answers):
+            if answer:
+                self.fast_path.record_llm_answer(predictions[i], answer['primary_intent'], key=i)
+            results[i] = answer
+
+        if not fallback:
+            return results
+        local = not self.groq_service.available()
+        return [
+            result or (self.local_result(*ticket) if local else self.default_result())
+            for result, ticket in zip(results, tickets)
+        ]
+
+    def train(self, training_data) -> int:
+        """
+        Train the local fast-path intent model from LLM-labelled tickets
+        (mappings with title, description and intent, as from
+        Database.get_training_tickets) and save it to disk. Returns the
+        number of tickets used.
+        """
+        texts, labels = [], []
+        for ticket in training_data:
+            if ticket.get('intent') in self.intent_types:
+                texts.append(f"{ticket['title']} {ticket['description']}")
+                labels.append(ticket['intent'])
+        return self.fast_path.train(texts, labels)
@@ -1,66 +1,175 @@
+import logging
+import os
+from typing import List
 from agents.base import Agent
-from database.db import db
+from database.kb_cache import kb_cache
+from models.ticket import KnowledgeBaseEntry
+from services.generation_profiles import get_profile
 from services.groq_service import GroqService
+from utils.bm25 import BM25Index
+from utils.embeddings import VectorIndex
 from utils.text_processing import preprocess_text
 
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ("lexical", "semantic", "hybrid")
+
 class KnowledgeBaseAgent(Agent):
-    def __init__(self):
-        self.groq_service = GroqService()
+    def __init__(self, top_k: int = 3, min_score: float = 1.0, search_mode: str = None,
+                 min_similarity: float = 0.2, vector_dir: str = None,
+                 groq_service: GroqService = None):
+        self.groq_service = groq_service or GroqService(profile=get_profile("knowledge_base"))
+        self.index = BM25Index()
+        # Only the top_k matches are sent to the LLM, and the call is skipped
+        # entirely when no entry reaches min_score (BM25) or min_similarity (cosine)
+        self.top_k = top_k
+        self.min_score = min_score
+        self.min_similarity = min_similarity
+
+        self.search_mode = search_mode or os.getenv("KB_SEARCH_MODE", "lexical")
+        if self.search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown KB search mode: {self.search_mode}")
+        self.vector_dir = vector_dir or os.getenv("KB_VECTOR_DIR", ".cache/kb_vectors")
+        self.vector_index = None
+        if self.search_mode != "lexical":
+            self.vector_index = VectorIndex(self.vector_dir)
+        self._indexed_version = None
+        # In lexical mode match_batch() keeps its own vector index, so process()
+        # never starts ranking with it
+        self._batch_index = None
+        self._batch_indexed_version = None
+
+    def default_result(self):
+        return None
+
+    def warm_up(self):
+        """
+        Load the knowledge base and build the search indexes ahead of the
+        first ticket
+        """
+        try:
+            self._load_entries()
+        except Exception as e:
+            logger.warning("Could not preload the knowledge base: %s", e)
+
+    def _load_entries(self):
+        """
+        Get the cached knowledge base snapshot, re-syncing the search indexes
+        only when it has changed. Returns {entry id: entry}.
+        """
+        version, entries_by_id = kb_cache.snapshot()
+        if not entries_by_id:
+            logger.debug("No knowledge base entries found")
+            return {}
+
+        if version != self._indexed_version:
+            documents = _documents(entries_by_id)
+            indexed, removed = self.index.sync(documents)
+            logger.debug("KB index updated to v%s: %s indexed, %s removed", version, indexed, removed)
+            if self.search_mode != "lexical":
+                self.vector_index.sync(documents)
+            self._indexed_version = version
+        return entries_by_id
+
+    def _rank(self, lexical, semantic):
+        """
+        Combine lexical and semantic matches into the ids to send to the LLM
+        """
+        lexical = lexical if lexical and lexical[0][1] >= self.min_score else []
+        semantic = [(entry_id, score) for entry_id, score in semantic if score >= self.min_similarity]
+
+        # Reciprocal rank fusion; with a single result list this keeps its order
+        fused = {}
+        for matches in (lexical, semantic):
+            for rank, (entry_id, _) in enumerate(matches):
+                fused[entry_id] = fused.get(entry_id, 0.0) + 1.0 / (60 + rank)
+        return sorted(fused, key=fused.get, reverse=True)[:self.top_k]
 
     def process(self, ticket_title: str, ticket_description: str):
         try:
-            # Get relevant knowledge base entries
-            print("[DEBUG] Fetching knowledge base entries...")
-            kb_entries = db.get_knowledge_base_entries()
-            
-            if not kb_entries:
-                print("[DEBUG] No knowledge base entries found")
-                return None
-            
-            # Validate KB entries
-            valid_entries = []
-            for entry in kb_entries:
-                if not isinstance(entry, dict) or 'content' not in entry:
-                    print(f"[DEBUG] Invalid KB entry format: {entry}")
-                    continue
-                if not entry['content'] or not isinstance(entry['content'], str):
-                    print(f"[DEBUG] Invalid KB entry content: {entry}")
-                    continue
-                valid_entries.append(entry)
-            
-            if not valid_entries:
-                print("[DEBUG] No valid knowledge base entries found")
+            entries_by_id = self._load_entries()
+            if not entries_by_id:
                 return None
-            
-            # Create embedding search prompt
+
             search_text = preprocess_text(f"{ticket_title} {ticket_description}")
-            print(f"[DEBUG] Preprocessed search text: {search_text}")
-            
+            logger.debug("Preprocessed search text: %s", search_text)
+
+            lexical, semantic = [], []
+            if self.search_mode != "semantic":
+                lexical = self.index.search(search_text, k=self.top_k)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Top lexical KB matches: %s", [(i, round(s, 2)) for i, s in lexical])
+            if self.search_mode != "lexical":
+                semantic = self.vector_index.search(search_text, k=self.top_k)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Top semantic KB matches: %s", [(i, round(s, 3)) for i, s in semantic])
+
+            candidate_ids = self._rank(lexical, semantic)
+            if not candidate_ids:
+                logger.debug("No knowledge base entry scored above the relevance threshold")
+                return None
+            candidates = [entries_by_id[entry_id] for entry_id in candidate_ids]
+
             prompt = f"""Given this support ticket:
             Title: {ticket_title}
             Description: {ticket_description}
-            
+
             Find the most relevant solution from these knowledge base entries:
-            {[entry['content'] for entry in valid_entries]}
-            
+            {[entry.content for entry in candidates]}
+
             Return only the most relevant solution in a clear, formatted manner.
             If no relevant solution is found, respond with 'NO_RELEVANT_SOLUTION'.
             """
-            
+
             relevant_solution = self.groq_service.get_completion(prompt)
-            print(f"[DEBUG] KnowledgeBaseAgent raw API response: {relevant_solution}")
-            
+            logger.debug("KnowledgeBaseAgent raw API response: %s", relevant_solution)
+
+            if relevant_solution.startswith("Error:"):
+                # Without the LLM to pick between candidates, use the best local match
+                logger.warning("Using top local KB match due to API error: %s", relevant_solution)
+                return candidates[0].content
+
             # Validate and format the response
             if relevant_solution.strip() == "NO_RELEVANT_SOLUTION":
-                print("[DEBUG] No relevant solution found in knowledge base")
+                logger.debug("No relevant solution found in knowledge base")
                 return None
-                
+
             return relevant_solution.strip()
-            
+
         except Exception as e:
-            print(f"[DEBUG] Error in KnowledgeBaseAgent processing: {str(e)}")
+            logger.warning("Error in KnowledgeBaseAgent processing: %s", e)
             return None
 
+    def match_batch(self, texts: List[str], k: int = None) -> List[List[KnowledgeBaseEntry]]:
+        """
+        Find the closest knowledge base entries for many tickets at once using
+        the vector index, without calling the LLM
+        """
+        entries_by_id = self._load_entries()
+        if not entries_by_id:
+            return [[] for _ in texts]
+
+        vector_index = self.vector_index
+        if vector_index is None:
+            if self._batch_index is None:
+                self._batch_index = VectorIndex(self.vector_dir)
+            if self._batch_indexed_version != self._indexed_version:
+                self._batch_index.sync(_documents(entries_by_id))
+                self._batch_indexed_version = self._indexed_version
+            vector_index = self._batch_index
+
+        results = vector_index.search_batch([preprocess_text(text) for text in texts], k or self.top_k)
+        return [
+            [entries_by_id[entry_id] for entry_id, score in matches if score >= self.min_similarity]
+            for matches in results
+        ]
+
     def train(self, training_data):
         # Training would be implemented here in a production system
         pass
+
+def _documents(entries_by_id):
+    return {entry_id: _index_text(entry) for entry_id, entry in entries_by_id.items()}
+
+def _index_text(entry: KnowledgeBaseEntry) -> str:
+    return " ".join([entry.title, entry.content, " ".join(entry.tags)])
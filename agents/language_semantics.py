@@ -1,13 +1,32 @@
+import logging
+from agents import local_rules
 from agents.base import Agent
-from services.groq_service import GroqService
+from services.generation_profiles import get_profile
+from services.groq_service import BACKEND_UNAVAILABLE, GroqService
 from utils.text_processing import preprocess_text
 
+logger = logging.getLogger(__name__)
+
 class LanguageSemanticsAgent(Agent):
-    def __init__(self):
-        self.groq_service = GroqService()
+    def __init__(self, groq_service: GroqService = None):
+        self.groq_service = groq_service or GroqService(profile=get_profile("language_semantics"))
         self.sentiment_levels = ['Very Negative', 'Negative', 'Neutral', 'Positive', 'Very Positive']
         self.urgency_levels = ['Low', 'Medium', 'High', 'Critical']
 
+    def default_result(self):
+        return {
+            'sentiment': 'Neutral',
+            'urgency': 'Medium',
+            'key_phrases': [],
+            'technical_terms': []
+        }
+
+    def local_result(self, title: str, description: str):
+        """
+        Rough keyword-based analysis used while the LLM is unavailable
+        """
+        return local_rules.semantics(title, description)
+
     def process(self, title: str, description: str):
         try:
             # Preprocess the input text
@@ -28,7 +47,9 @@ class LanguageSemanticsAgent(Agent):
             """
             
             response = self.groq_service.get_completion(prompt)
-            print(f"[DEBUG] LanguageSemanticsAgent raw API response: {response}")
+            logger.debug("LanguageSemanticsAgent raw API response: %s", response)
+            if response == BACKEND_UNAVAILABLE:
+                return self.local_result(title, description)
             
             try:
                 sentiment, urgency, phrases, terms = response.strip().split("|")
@@ -39,22 +60,12 @@ class LanguageSemanticsAgent(Agent):
                     'technical_terms': [t.strip() for t in terms.split(",")]
                 }
             except (ValueError, AttributeError) as e:
-                print(f"Error parsing API response: {str(e)}")
-                return {
-                    'sentiment': 'Neutral',
-                    'urgency': 'Medium',
-                    'key_phrases': [],
-                    'technical_terms': []
-                }
+                logger.warning("Error parsing API response: %s", e)
+                return self.default_result()
                 
         except Exception as e:
-            print(f"Unexpected error in language semantics analysis: {str(e)}")
-            return {
-                'sentiment': 'Neutral',
-                'urgency': 'Medium',
-                'key_phrases': [],
-                'technical_terms': []
-            }
+            logger.error("Unexpected error in language semantics analysis: %s", e)
+            return self.default_result()
 
     def train(self, training_data):
         # Training would be implemented here in a production system
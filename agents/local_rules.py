@@ -0,0 +1,114 @@
+"""
+Keyword rules used to triage tickets without the LLM, e.g. while the
+circuit breaker has the backend marked as unavailable. They only need to
+be roughly right: the goal is a sensible category, urgency and routing
+until the LLM answers again.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+from utils.text_processing import extract_keywords, preprocess_text
+
+CATEGORY_KEYWORDS = {
+    "Technical Issue": {
+        "error", "errors", "crash", "crashes", "crashed", "bug", "broken", "fail", "fails", "failed",
+        "failing", "slow", "timeout", "install", "installation", "update", "upgrade", "server", "app",
+        "connection", "sync", "loading", "freeze", "frozen", "exception",
+    },
+    "Account Related": {
+        "login", "log", "password", "account", "signin", "locked", "username", "profile", "reset",
+        "2fa", "mfa", "verification", "permissions", "access", "email",
+    },
+    "Billing": {
+        "invoice", "invoices", "billing", "billed", "charge", "charged", "payment", "refund", "subscription",
+        "price", "pricing", "card", "bill", "plan", "receipt",
+    },
+    "Feature Request": {
+        "feature", "request", "suggest", "suggestion", "improve", "improvement", "enhancement", "wish",
+        "option", "integration", "roadmap",
+    },
+}
+
+URGENCY_KEYWORDS = {
+    "Critical": {
+        "outage", "down", "urgent", "emergency", "asap", "critical", "production", "security", "breach",
+        "hacked", "everyone", "all",
+    },
+    "High": {"immediately", "blocked", "blocking", "cannot", "unable", "broken", "failing", "deadline", "stuck"},
+    "Low": {"question", "wondering", "minor", "whenever", "curious", "suggestion", "cosmetic"},
+}
+
+URGENCY_PRIORITY = {"Critical": 4, "High": 3, "Medium": 2, "Low": 1}
+
+NEGATIVE_KEYWORDS = {
+    "angry", "frustrated", "frustrating", "terrible", "unacceptable", "awful", "worst", "annoyed",
+    "disappointed", "ridiculous", "again", "still",
+}
+
+INTENT_KEYWORDS = {
+    "service_outage": {"outage", "down", "unavailable", "offline", "unreachable"},
+    "bug_report": {"bug", "crash", "crashes", "crashed", "error", "exception", "broken", "glitch"},
+    "billing_inquiry": CATEGORY_KEYWORDS["Billing"],
+    "account_management": CATEGORY_KEYWORDS["Account Related"],
+    "feature_request": CATEGORY_KEYWORDS["Feature Request"],
+    "product_guidance": {"how", "guide", "documentation", "docs", "tutorial", "configure", "setup"},
+    "technical_support": CATEGORY_KEYWORDS["Technical Issue"],
+}
+
+INTENT_ROUTING = {
+    "service_outage": "incident_response",
+    "bug_report": "engineering",
+    "billing_inquiry": "billing",
+    "account_management": "account_support",
+    "feature_request": "product",
+    "product_guidance": "customer_success",
+    "technical_support": "technical_support",
+    "general_inquiry": "general_support",
+}
+
+TECHNICAL_TERMS = {
+    "api", "sso", "2fa", "mfa", "dns", "ssl", "vpn", "database", "server", "browser", "cache", "token",
+    "timeout", "http", "https", "url", "sdk", "webhook", "oauth", "cpu", "memory", "network",
+}
+
+def keywords(title: str, description: str) -> List[str]:
+    return extract_keywords(preprocess_text(f"{title} {description}"))
+
+def best_match(words: Set[str], rules: Dict[str, Set[str]], default: Optional[str]) -> Optional[str]:
+    """
+    Label whose keyword set overlaps the ticket most; ties go to the label
+    listed first and no overlap at all returns default
+    """
+    best, best_hits = default, 0
+    for label, vocabulary in rules.items():
+        hits = len(words & vocabulary)
+        if hits > best_hits:
+            best, best_hits = label, hits
+    return best
+
+def urgency(words: Set[str]) -> str:
+    return best_match(words, URGENCY_KEYWORDS, "Medium")
+
+def classify(title: str, description: str, default_category: str) -> Tuple[str, int]:
+    words = set(keywords(title, description))
+    return best_match(words, CATEGORY_KEYWORDS, default_category), URGENCY_PRIORITY[urgency(words)]
+
+def semantics(title: str, description: str) -> dict:
+    ordered = keywords(title, description)
+    words = set(ordered)
+    return {
+        'sentiment': 'Negative' if words & NEGATIVE_KEYWORDS else 'Neutral',
+        'urgency': urgency(words),
+        'key_phrases': list(dict.fromkeys(word for word in ordered if len(word) > 3))[:5],
+        'technical_terms': sorted(words & TECHNICAL_TERMS)
+    }
+
+def intent(title: str, description: str) -> dict:
+    words = set(keywords(title, description))
+    scores = {label: len(words & vocabulary) for label, vocabulary in INTENT_KEYWORDS.items()}
+    matched = [label for label, hits in sorted(scores.items(), key=lambda item: -item[1]) if hits]
+    primary = matched[0] if matched else "general_inquiry"
+    return {
+        'primary_intent': primary,
+        'secondary_intents': matched[1:3],
+        'required_actions': ['review_ticket'],
+        'routing': INTENT_ROUTING[primary]
+    }
@@ -1,10 +1,15 @@
+import logging
+from agents import local_rules
 from agents.base import Agent
-from services.groq_service import GroqService
+from services.generation_profiles import get_profile
+from services.groq_service import BACKEND_UNAVAILABLE, GroqService
 from utils.text_processing import preprocess_text
 
+logger = logging.getLogger(__name__)
+
 class PriorityUnderstandingAgent(Agent):
-    def __init__(self):
-        self.groq_service = GroqService()
+    def __init__(self, groq_service: GroqService = None):
+        self.groq_service = groq_service or GroqService(profile=get_profile("priority_understanding"))
         self.sla_requirements = {
             4: "1 hour",   # Critical
             3: "4 hours",  # High
@@ -12,6 +17,28 @@ class PriorityUnderstandingAgent(Agent):
             1: "48 hours"  # Low
         }
 
+    def default_result(self, current_priority: int = None):
+        return {
+            'priority': current_priority or 2,
+            'sla_requirement': self.sla_requirements[2],
+            'business_impact': "Unable to determine",
+            'user_frustration': "Medium"
+        }
+
+    def local_result(self, title: str, description: str, current_priority: int = None):
+        """
+        Keyword-based urgency mapped onto the SLA table, used while the LLM is
+        unavailable. Never lowers a priority the ticket already has.
+        """
+        semantics = local_rules.semantics(title, description)
+        priority = max(current_priority or 1, local_rules.URGENCY_PRIORITY[semantics['urgency']])
+        return {
+            'priority': priority,
+            'sla_requirement': self.sla_requirements[priority],
+            'business_impact': "Unable to determine",
+            'user_frustration': "High" if semantics['sentiment'] == 'Negative' else "Medium"
+        }
+
     def process(self, title: str, description: str, current_priority: int = None):
         try:
             # Preprocess the input text
@@ -37,7 +64,9 @@ class PriorityUnderstandingAgent(Agent):
             """
             
             response = self.groq_service.get_completion(prompt)
-            print(f"[DEBUG] PriorityUnderstandingAgent raw API response: {response}")
+            logger.debug("PriorityUnderstandingAgent raw API response: %s", response)
+            if response == BACKEND_UNAVAILABLE:
+                return self.local_result(title, description, current_priority)
             
             try:
                 priority, sla, impact, frustration = response.strip().split("|")
@@ -48,22 +77,12 @@ class PriorityUnderstandingAgent(Agent):
                     'user_frustration': frustration.strip()
                 }
             except (ValueError, AttributeError) as e:
-                print(f"Error parsing API response: {str(e)}")
-                return {
-                    'priority': current_priority or 2,
-                    'sla_requirement': self.sla_requirements[2],
-                    'business_impact': "Unable to determine",
-                    'user_frustration': "Medium"
-                }
+                logger.warning("Error parsing API response: %s", e)
+                return self.default_result(current_priority)
                 
         except Exception as e:
-            print(f"Unexpected error in priority understanding: {str(e)}")
-            return {
-                'priority': current_priority or 2,
-                'sla_requirement': self.sla_requirements[2],
-                'business_impact': "Unable to determine",
-                'user_frustration': "Medium"
-            }
+            logger.error("Unexpected error in priority understanding: %s", e)
+            return self.default_result(current_priority)
 
     def train(self, training_data):
         # Training would be implemented here in a production system
@@ -0,0 +1,68 @@
+import importlib
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+from agents.base import Agent
+
+logger = logging.getLogger(__name__)
+
+# Agent name -> "module:class"; modules are only imported when the agent is first needed
+AGENT_CLASSES = {
+    'ticket_classification': "agents.ticket_classification:TicketClassificationAgent",
+    'intent_extraction': "agents.intent_extraction:IntentExtractionAgent",
+    'language_semantics': "agents.language_semantics:LanguageSemanticsAgent",
+    'priority_understanding': "agents.priority_understanding:PriorityUnderstandingAgent",
+    'knowledge_base': "agents.knowledge_base:KnowledgeBaseAgent",
+    'solution_recommendation': "agents.solution_recommendation:SolutionRecommendationAgent",
+    'automated_resolution': "agents.automated_resolution:AutomatedResolutionAgent",
+    'content_generation': "agents.content_generation:ContentGenerationAgent",
+    'fused_analysis': "agents.fused_analysis:FusedAnalysisAgent",
+}
+
+# Agents built from other agents, which are shared rather than duplicated
+AGENT_DEPENDENCIES = {
+    'fused_analysis': ('ticket_classification', 'intent_extraction', 'language_semantics', 'priority_understanding'),
+}
+
+class AgentRegistry:
+    """
+    Builds each agent the first time it is asked for and returns the same
+    instance from then on. Concurrent first requests for one agent build it
+    once; different agents can be built in parallel.
+    """
+
+    def __init__(self, agents: Optional[Dict[str, Agent]] = None):
+        # Prebuilt agents (e.g. with an injected GroqService) are used as given
+        self._agents: Dict[str, Agent] = dict(agents or {})
+        self._locks = {name: threading.Lock() for name in AGENT_CLASSES}
+
+    def get(self, name: str) -> Agent:
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        if name not in self._locks:
+            raise KeyError(f"Unknown agent: {name}")
+        with self._locks[name]:
+            agent = self._agents.get(name)
+            if agent is None:
+                agent = self._agents[name] = self._build(name)
+        return agent
+
+    def _build(self, name: str) -> Agent:
+        module_name, class_name = AGENT_CLASSES[name].split(":")
+        agent_class = getattr(importlib.import_module(module_name), class_name)
+        logger.debug("Building %s", class_name)
+        return agent_class(*(self.get(dependency) for dependency in AGENT_DEPENDENCIES.get(name, ())))
+
+    def built(self) -> Dict[str, Agent]:
+        return dict(self._agents)
+
+    def warm_up(self, names: Iterable[str]):
+        """
+        Build the named agents now, and let those that support it preload
+        their data (e.g. the knowledge base index)
+        """
+        for name in names:
+            agent = self.get(name)
+            if hasattr(agent, "warm_up"):
+                agent.warm_up()
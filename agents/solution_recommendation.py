@@ -1,10 +1,33 @@
+import logging
 from agents.base import Agent
-from services.groq_service import GroqService
+from services.generation_profiles import get_profile
+from services.groq_service import BACKEND_UNAVAILABLE, GroqService
 from utils.text_processing import preprocess_text
 
+logger = logging.getLogger(__name__)
+
 class SolutionRecommendationAgent(Agent):
-    def __init__(self):
-        self.groq_service = GroqService()
+    def __init__(self, groq_service: GroqService = None):
+        self.groq_service = groq_service or GroqService(profile=get_profile("solution_recommendation"))
+
+    def default_result(self):
+        return {
+            'primary_solution': "Unable to determine best solution",
+            'alternative_approaches': [],
+            'estimated_resolution_time': 30,
+            'confidence_level': 0
+        }
+
+    def local_result(self, kb_solution: str = None):
+        """
+        Used while the LLM is unavailable: recommend the knowledge base match
+        if there is one
+        """
+        result = self.default_result()
+        if kb_solution:
+            result['primary_solution'] = kb_solution
+            result['confidence_level'] = 50
+        return result
 
     def process(self, title: str, description: str, kb_solution: str = None, category: str = None):
         try:
@@ -30,7 +53,9 @@ class SolutionRecommendationAgent(Agent):
             """
             
             response = self.groq_service.get_completion(prompt)
-            print(f"[DEBUG] SolutionRecommendationAgent raw API response: {response}")
+            logger.debug("SolutionRecommendationAgent raw API response: %s", response)
+            if response == BACKEND_UNAVAILABLE:
+                return self.local_result(kb_solution)
             
             try:
                 solution, alternatives, time_est, confidence = response.strip().split("|")
@@ -41,16 +66,11 @@ class SolutionRecommendationAgent(Agent):
                     'confidence_level': int(confidence.strip().replace("%", ""))
                 }
             except (ValueError, AttributeError) as e:
-                print(f"Error parsing API response: {str(e)}")
-                return {
-                    'primary_solution': "Unable to determine best solution",
-                    'alternative_approaches': [],
-                    'estimated_resolution_time': 30,
-                    'confidence_level': 0
-                }
+                logger.warning("Error parsing API response: %s", e)
+                return self.default_result()
                 
         except Exception as e:
-            print(f"Unexpected error in solution recommendation: {str(e)}")
+            logger.error("Unexpected error in solution recommendation: %s", e)
             return {
                 'primary_solution': "Error generating solution recommendation",
                 'alternative_approaches': [],
@@ -1,11 +1,18 @@
-from typing import Tuple
+import logging
+from typing import List, Optional, Tuple
 from agents.base import Agent
-from services.groq_service import GroqService
+from agents import local_rules
+from agents.batching import run_batched
+from agents.fast_path import FastPathClassifier
+from services.generation_profiles import get_profile
+from services.groq_service import BACKEND_UNAVAILABLE, GroqService
 from utils.text_processing import preprocess_text
 
+logger = logging.getLogger(__name__)
+
 class TicketClassificationAgent(Agent):
-    def __init__(self):
-        self.groq_service = GroqService()
+    def __init__(self, groq_service: GroqService = None):
+        self.groq_service = groq_service or GroqService(profile=get_profile("ticket_classification"))
         self.categories = [
             "Technical Issue",
             "Account Related",
@@ -21,9 +28,25 @@ class TicketClassificationAgent(Agent):
         }
         self.default_category = "General Inquiry"
         self.default_priority = 2
+        # Trained on stored tickets; labels are "category|priority"
+        self.fast_path = FastPathClassifier("ticket_classification")
+
+    def default_result(self) -> Tuple[str, int]:
+        return self.default_category, self.default_priority
+
+    def local_result(self, title: str, description: str) -> Tuple[str, int]:
+        """
+        Rough keyword-based classification used while the LLM is unavailable
+        """
+        return local_rules.classify(title, description, self.default_category)
 
     def process(self, title: str, description: str) -> Tuple[str, int]:
         try:
+            prediction = self.fast_path.decide(f"{title} {description}")
+            if prediction.use_local:
+                logger.debug("Local classifier answered %s (%.2f)", prediction.label, prediction.confidence)
+                return self._parse(prediction.label)
+
             # Preprocess the input text
             preprocessed_text = preprocess_text(f"{title} {description}")
             
@@ -40,34 +63,97 @@ class TicketClassificationAgent(Agent):
             """
             
             response = self.groq_service.get_completion(prompt)
-            print(f"[DEBUG] TicketClassificationAgent raw API response: {response}")
+            logger.debug("TicketClassificationAgent raw API response: %s", response)
             
+            if response == BACKEND_UNAVAILABLE:
+                return self.local_result(title, description)
+
             # Check if the response contains an error message
             if response.startswith("Error:"):
-                print(f"[DEBUG] Using default values due to API error: {response}")
-                return self.default_category, self.default_priority
+                logger.warning("Using default values due to API error: %s", response)
+                return self.default_result()
             
             # Try to parse the response
             try:
-                category, priority = response.strip().split("|")
-                priority = int(priority)
-                
-                # Validate category and priority
-                if category not in self.categories:
-                    category = self.default_category
-                if priority not in self.priority_levels:
-                    priority = self.default_priority
-                    
-                return category, priority
-                
+                result = self._parse(response)
+                self.fast_path.record_llm_answer(prediction, _label(*result))
+                return result
+
             except (ValueError, AttributeError) as e:
-                print(f"Error parsing API response: {str(e)}")
-                return self.default_category, self.default_priority
+                logger.warning("Error parsing API response: %s", e)
+                return self.default_result()
                 
         except Exception as e:
-            print(f"Unexpected error in ticket classification: {str(e)}")
-            return self.default_category, self.default_priority
+            logger.error("Unexpected error in ticket classification: %s", e)
+            return self.default_result()
+
+    def _parse(self, response: str) -> Tuple[str, int]:
+        category, priority = response.strip().split("|")
+        category = category.strip()
+        priority = int(priority)
+
+        # Validate category and priority
+        if category not in self.categories:
+            category = self.default_category
+        if priority not in self.priority_levels:
+            priority = self.default_priority
+
+        return category, priority
+
+    def process_batch(self, tickets: List[Tuple[str, str]], token_budget: int = 4000,
+                      max_batch_size: int = 25, max_retries: int = 1,
+                      fallback: bool = True) -> List[Optional[Tuple[str, int]]]:
+        """
+        Classify many (title, description) tickets, packing as many as fit in
+        token_budget into each LLM request. Results are in input order. Tickets
+        the LLM did not answer get the local or default result, or None
+        without fallback.
+        """
+        def build_prompt(ticket_block):
+            return f"""Analyze each support ticket below and provide:
+            1. The most appropriate category from: {', '.join(self.categories)}
+            2. Priority level (1-4) based on urgency and impact
+
+            {ticket_block}
+
+            Respond with exactly one line per ticket, in format: ticket_id|category|priority_number
+            For example: T0|Billing|2
+            """
+
+        # Confident local predictions never reach the LLM
+        predictions = [self.fast_path.decide(f"{title} {description}") for title, description in tickets]
+        results = [self._parse(p.label) if p.use_local else None for p in predictions]
+        pending = [i for i, p in enumerate(predictions) if not p.use_local]
+
+        answers = run_batched([tickets[i] for i in pending], build_prompt, self._parse,
+                              lambda prompt, max_tokens: self.groq_service.get_completion(prompt, max_tokens, stop=()),
+                              token_budget, max_batch_size, tokens_per_answer=12, max_retries=max_retries)
+        for i, answer in zip(pending, answers):
+            if answer:
+                self.fast_path.record_llm_answer(predictions[i], _label(*answer), key=i)
+            results[i] = answer
+
+        if not fallback:
+            return results
+        local = not self.groq_service.available()
+        return [
+            result or (self.local_result(*ticket) if local else self.default_result())
+            for result, ticket in zip(results, tickets)
+        ]
+
+    def train(self, training_data) -> int:
+        """
+        Train the local fast-path classifier from LLM-labelled tickets
+        (mappings with title, description, category and priority, as from
+        Database.get_training_tickets) and save it to disk.
+        Returns the number of tickets used.
+        """
+        texts, labels = [], []
+        for ticket in training_data:
+            if ticket.get('category') in self.categories and ticket.get('priority') in self.priority_levels:
+                texts.append(f"{ticket['title']} {ticket['description']}")
+                labels.append(_label(ticket['category'], ticket['priority']))
+        return self.fast_path.train(texts, labels)
 
-    def train(self, training_data):
-        # Training would be implemented here in a production system
-        pass
+def _label(category: str, priority: int) -> str:
+    return f"{category}|{priority}"
@@ -0,0 +1,180 @@
+"""
+Headless batch processing: stream tickets from a JSONL or CSV file through
+the agent pipeline and write results as each ticket finishes.
+
+    python batch_process.py tickets.jsonl --output results.jsonl --concurrency 8
+
+Each input record needs a title and description and may carry an id
+(the record number is used otherwise). Processed ids are appended to a
+checkpoint file, so rerunning the same command resumes where it stopped.
+Tickets are read in groups of --batch-size whose classification and
+intent are requested together, a few LLM calls per group instead of two
+per ticket.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional
+from pipeline.ticket_pipeline import TicketPipeline
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+def read_tickets(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for number, record in enumerate(records, start=1):
+            # Blank CSV cells and JSON nulls fall back to the record number too
+            if not record.get("id"):
+                record["id"] = number
+            record["id"] = str(record["id"])
+            yield record
+
+def load_checkpoint(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+def run_batch(input_path: str, output_path: Optional[str] = None, concurrency: int = 4,
+              checkpoint_path: Optional[str] = None, save_to_db: bool = False,
+              fmt: Optional[str] = None, pipeline: Optional[TicketPipeline] = None,
+              progress_every: int = 100, batch_size: int = 20) -> Dict:
+    """
+    Process every ticket in input_path that is not already in the checkpoint.
+    At most 2 * concurrency + batch_size tickets are held in memory at any
+    time. batch_size 1 classifies every ticket on its own.
+    """
+    if not output_path and not save_to_db:
+        raise ValueError("Nothing to do: pass an output path and/or save_to_db=True")
+
+    checkpoint_path = checkpoint_path or f"{output_path or input_path}.checkpoint"
+    done_ids = load_checkpoint(checkpoint_path)
+    db = None
+    if save_to_db:
+        from database.db import db
+    pipeline = pipeline or TicketPipeline(max_workers=concurrency * 4, database=db)
+
+    stats = {'processed': 0, 'failed': 0, 'skipped': 0, 'near_duplicates': 0}
+    started = time.perf_counter()
+
+    def process(record, given):
+        results = pipeline.process(record['title'], record['description'], given=given)
+        if db is not None:
+            results['ticket_id'] = db.save_ticket(
+                record['title'], record['description'], results['category'], results['priority'],
+                results['intent_info']['primary_intent'], cluster_id=results['cluster_id'],
+                training_labels=results['training_labels']
+            )
+            pipeline.link_ticket(record['title'], record['description'], results['ticket_id'], results)
+            pipeline.save_analysis(results['ticket_id'], results)
+        return results
+
+    output = open(output_path, "a", encoding="utf-8") if output_path else None
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+            running = {}
+
+            def drain(block_until):
+                while len(running) > block_until:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record = running.pop(future)
+                        try:
+                            output_record = {'id': record['id'], 'title': record['title'], **future.result()}
+                            stats['processed'] += 1
+                            stats['near_duplicates'] += output_record['reused_analysis']
+                        except Exception as e:
+                            logger.warning("Ticket %s failed: %s", record['id'], e)
+                            output_record = {'id': record['id'], 'title': record['title'], 'error': str(e)}
+                            stats['failed'] += 1
+                        if output:
+                            output.write(json.dumps(output_record, default=str) + "\n")
+                            output.flush()
+                        if 'error' not in output_record:
+                            checkpoint.write(record['id'] + "\n")
+                            checkpoint.flush()
+
+                        finished = stats['processed'] + stats['failed']
+                        if progress_every and finished % progress_every == 0:
+                            rate = finished / (time.perf_counter() - started)
+                            logger.info("%s tickets done (%.2f/s)", finished, rate)
+
+            def submit(records: List[Dict]):
+                given = [None] * len(records)
+                if batch_size > 1:
+                    try:
+                        given = pipeline.classify_batch([(r['title'], r['description']) for r in records])
+                    except Exception as e:
+                        # Each ticket's own stages still classify it
+                        logger.warning("Batched classification of %s tickets failed: %s", len(records), e)
+                for record, known in zip(records, given):
+                    running[executor.submit(process, record, known)] = record
+                    drain(block_until=concurrency * 2 - 1)
+
+            waiting = []
+            for record in read_tickets(input_path, fmt):
+                if record['id'] in done_ids:
+                    stats['skipped'] += 1
+                    continue
+                if not record.get('title') or not record.get('description'):
+                    logger.warning("Skipping ticket %s: missing title or description", record['id'])
+                    stats['failed'] += 1
+                    continue
+                waiting.append(record)
+                if len(waiting) >= batch_size:
+                    submit(waiting)
+                    waiting = []
+            submit(waiting)
+            drain(block_until=0)
+    finally:
+        if output:
+            output.close()
+        checkpoint.close()
+        if pipeline.analysis_store is not None:
+            pipeline.analysis_store.flush()
+
+    stats['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+    stats['tickets_per_second'] = round(stats['processed'] / stats['elapsed_seconds'], 3) if stats['elapsed_seconds'] else 0.0
+    stats['fast_path'] = {agent.fast_path.name: agent.fast_path.stats() for agent in (pipeline.tca, pipeline.iea)}
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a ticket backlog through the agent pipeline")
+    parser.add_argument("input", help="JSONL or CSV file with title and description per ticket")
+    parser.add_argument("--output", help="JSONL file to append results to")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from extension)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Tickets processed in parallel")
+    parser.add_argument("--batch-size", type=int, default=20,
+                        help="Tickets classified per batched LLM request (1 disables batching)")
+    parser.add_argument("--checkpoint", help="File of processed ids (default: <output>.checkpoint)")
+    parser.add_argument("--save-to-db", action="store_true", help="Also save each ticket to the database")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics here when the run finishes")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "INFO"), help="Logging level (default: INFO)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    metrics.serve_from_env()
+
+    stats = run_batch(args.input, args.output, args.concurrency, args.checkpoint,
+                      args.save_to_db, args.format, batch_size=args.batch_size)
+    if args.metrics_file:
+        metrics.write(args.metrics_file)
+    print(f"Processed {stats['processed']} tickets ({stats['failed']} failed, {stats['skipped']} already done, "
+          f"{stats['near_duplicates']} near-duplicates) in {stats['elapsed_seconds']}s: "
+          f"{stats['tickets_per_second']} tickets/s")
+    for name, fast_path in stats['fast_path'].items():
+        agreement = "n/a" if fast_path['agreement'] is None else f"{fast_path['agreement']:.1%}"
+        print(f"{name}: {fast_path['hit_rate']:.1%} answered locally, {agreement} agreement with the LLM")
+
+if __name__ == "__main__":
+    main()
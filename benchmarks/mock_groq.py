@@ -0,0 +1,258 @@
+"""
+Local stand-in for Groq's OpenAI-compatible chat completions endpoint, so the
+pipeline can be benchmarked without spending API quota.
+
+    python -m benchmarks.mock_groq --port 8900 --latency-ms 400 --error-rate 0.01 --throttle-rate 0.02
+
+Point the app at it with GROQ_API_URL=http://127.0.0.1:8900/openai/v1/chat/completions.
+Replies are canned answers in the format each agent's prompt asks for, picked
+deterministically from the ticket text, and carry a usage block estimated at
+four characters per token. Streaming requests get server-sent events.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+CATEGORIES = ["Technical Issue", "Account Related", "Billing", "Feature Request", "General Inquiry"]
+INTENTS = ["technical_support", "account_management", "billing_inquiry", "feature_request",
+           "bug_report", "general_inquiry", "product_guidance", "service_outage"]
+SENTIMENTS = ["Very Negative", "Negative", "Neutral", "Positive"]
+URGENCIES = ["Low", "Medium", "High", "Critical"]
+SLAS = {1: "72 hours", 2: "24 hours", 3: "8 hours", 4: "1 hour"}
+
+@dataclass
+class MockConfig:
+    # Response latency is lognormal around latency_ms with latency_sigma spread
+    latency_ms: float = 300.0
+    latency_sigma: float = 0.5
+    # Extra latency per completion token, like a real model's generation time
+    ms_per_token: float = 2.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: Optional[int] = None
+
+class MockStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.statuses: Dict[int, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, status: int, prompt_tokens: int = 0, completion_tokens: int = 0):
+        with self._lock:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens
+            }
+
+def canned_reply(prompt: str) -> str:
+    """
+    Answer in the format the prompt asks for. Batched prompts get one row
+    per [T<n>] ticket.
+    """
+    ticket_ids = re.findall(r"^\s*\[(T\d+)\]\s*$", prompt, re.M)
+    if ticket_ids and "ticket_id|" in prompt:
+        blocks = re.split(r"^\s*\[T\d+\]\s*$", prompt, flags=re.M)[1:]
+        return "\n".join(f"{ticket_id}|{_single_reply(prompt, block)}"
+                         for ticket_id, block in zip(ticket_ids, blocks))
+    return _single_reply(prompt, prompt)
+
+def _single_reply(prompt: str, ticket: str) -> str:
+    pick = _picker(ticket)
+    priority = pick(4) + 1
+    if "category|priority" in prompt:
+        return f"{CATEGORIES[pick(len(CATEGORIES))]}|{priority}"
+    if "primary_intent|secondary_intents" in prompt:
+        return f"{INTENTS[pick(len(INTENTS))]}|general_inquiry|review account, check logs|Support Team"
+    if "sentiment|urgency|key_phrases" in prompt:
+        return (f"{SENTIMENTS[pick(len(SENTIMENTS))]}|{URGENCIES[priority - 1]}|"
+                "cannot log in, error message|login, password")
+    if "priority_level|sla_requirement" in prompt:
+        return (f"{priority}|{SLAS[priority]}|Customer is blocked from using the product|"
+                f"{URGENCIES[min(priority, 3) - 1]}")
+    if "can_automate|automation_steps" in prompt:
+        if pick(2):
+            return "yes|reset password, send confirmation email|85|/api/users/reset, /api/notify"
+        return "no||0|"
+    if "primary_solution|alternative_approaches" in prompt:
+        return ("Reset the user's credentials and clear the session cache|Restore from backup, "
+                f"Escalate to engineering|{30 * priority}|{70 + pick(25)}")
+    if "single JSON object" in prompt:
+        return json.dumps({
+            "category": CATEGORIES[pick(len(CATEGORIES))],
+            "priority": priority,
+            "primary_intent": INTENTS[pick(len(INTENTS))],
+            "secondary_intents": [],
+            "required_actions": ["review account", "check logs"],
+            "routing": "Support Team",
+            "sentiment": SENTIMENTS[pick(len(SENTIMENTS))],
+            "urgency": URGENCIES[priority - 1],
+            "key_phrases": ["cannot log in"],
+            "technical_terms": ["login"],
+            "sla_requirement": SLAS[priority],
+            "business_impact": "Customer is blocked from using the product",
+            "user_frustration": URGENCIES[min(priority, 3) - 1]
+        })
+    if "NO_RELEVANT_SOLUTION" in prompt:
+        entries = re.findall(r"'([^']{20,})'", prompt)
+        return entries[0] if entries else "NO_RELEVANT_SOLUTION"
+    return ("Thank you for contacting support. We have looked into your request and "
+            "identified the likely cause. Please try the following steps: sign out of all sessions, "
+            "reset your password from the login page and sign in again. If the problem persists, "
+            "reply to this message and an engineer will follow up within one business day.")
+
+def _picker(text: str):
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    return lambda n: rng.randrange(n)
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def make_handler(config: MockConfig, stats: MockStats):
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+            with rng_lock:
+                outcome = rng.random()
+                delay = rng.lognormvariate(0, config.latency_sigma) * config.latency_ms / 1000
+
+            if outcome < config.error_rate:
+                time.sleep(delay)
+                stats.record(500)
+                return self._json(500, {"error": {"message": "mock internal error"}})
+            if outcome < config.error_rate + config.throttle_rate:
+                stats.record(429)
+                return self._json(429, {"error": {"message": "mock rate limit"}},
+                                  {"Retry-After": str(config.retry_after)})
+
+            reply = canned_reply(prompt)
+            max_tokens = body.get("max_tokens")
+            if max_tokens:
+                reply = reply[:max_tokens * 4]
+            for stop in body.get("stop") or ():
+                reply = reply.split(stop)[0]
+            usage = {"prompt_tokens": _tokens(prompt), "completion_tokens": _tokens(reply)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            time.sleep(delay + usage["completion_tokens"] * config.ms_per_token / 1000)
+            stats.record(200, usage["prompt_tokens"], usage["completion_tokens"])
+
+            if body.get("stream"):
+                return self._stream(body, reply, usage)
+            return self._json(200, {
+                "id": "mock", "object": "chat.completion", "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+        def _json(self, status: int, payload: dict, headers: Optional[dict] = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, body: dict, reply: str, usage: dict):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = re.findall(r"\S+\s*", reply)
+            for i, word in enumerate(words):
+                event = {"choices": [{"index": 0, "delta": {"content": word}}]}
+                if i == len(words) - 1:
+                    event["x_groq"] = {"usage": usage}
+                self._chunk(f"data: {json.dumps(event)}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self._chunk("")
+
+        def _chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+class MockGroqServer:
+    """
+    Mock server on a daemon thread. url is the chat completions endpoint
+    to use as GROQ_API_URL.
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self.stats = MockStats()
+        self.server = ThreadingHTTPServer((host, port), make_handler(self.config, self.stats))
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_port}/openai/v1/chat/completions"
+
+    def start(self) -> "MockGroqServer":
+        threading.Thread(target=self.server.serve_forever, name="mock-groq", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Median response latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal spread of the latency")
+    parser.add_argument("--ms-per-token", type=float, default=2.0, help="Extra latency per completion token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429")
+    parser.add_argument("--seed", type=int, help="Random seed for latencies and failures")
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(args.latency_ms, args.latency_sigma, args.ms_per_token, args.error_rate,
+                      args.throttle_rate, args.retry_after, args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock Groq chat completions endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    mock = MockGroqServer(config_from_args(args), args.host, args.port)
+    print(f"Mock Groq endpoint at {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(mock.stats.to_dict()))
+
+if __name__ == "__main__":
+    main()
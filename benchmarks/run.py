@@ -0,0 +1,324 @@
+"""
+Load test the ticket pipeline against the mock Groq server.
+
+    python -m benchmarks.run --rate 5 --tickets 500 --output reports/baseline.json
+    python -m benchmarks.run --rate 5 --tickets 500 --output reports/change.json --baseline reports/baseline.json
+
+Tickets arrive as a Poisson process at --rate per second, so bursts and
+queueing show up in the latencies the way they do in production. They are
+synthetic by default, or replayed from a JSONL/CSV file (--input) in the
+format batch_process.py reads. End-to-end latency is measured from each
+ticket's scheduled arrival, so time spent waiting for a worker counts.
+
+The report (JSON) has p50/p95/p99 end-to-end and per-agent latency,
+throughput, LLM calls and tokens per ticket and database time. With
+--baseline, the key figures are printed next to those of an earlier report.
+
+The pipeline still needs the PostgreSQL database for the knowledge base.
+Unless --api-url points elsewhere, an in-process mock server is started and
+the Groq rate limits are lifted so that the pipeline itself is measured.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence
+from benchmarks.mock_groq import MockGroqServer, add_arguments, config_from_args
+
+SUBJECTS = ["login page", "password reset", "invoice", "mobile app", "API key", "dashboard", "export to CSV",
+            "two-factor authentication", "subscription", "email notifications", "data sync", "search"]
+PROBLEMS = [
+    ("{subject} not working", "Since this morning the {subject} fails with an error every time I try. "
+                              "I have cleared my cache and tried another browser with the same result."),
+    ("Charged twice for {subject}", "My card was charged twice this month for the {subject}. "
+                                   "Please refund the duplicate payment."),
+    ("How do I change the {subject}?", "I could not find where to change the {subject} in the settings. "
+                                      "Is there documentation for this?"),
+    ("Feature request: {subject} improvements", "It would help our team a lot if the {subject} supported "
+                                               "bulk operations and scheduling."),
+    ("URGENT: {subject} down for all users", "None of our users can use the {subject}. "
+                                             "This is blocking our whole company, please help ASAP."),
+]
+
+def synthetic_tickets(count: int, duplicate_rate: float = 0.2, seed: int = 0) -> List[Dict]:
+    """
+    Generate tickets from templates. duplicate_rate of them repeat an earlier
+    ticket with a small edit, as repeated reports of one incident do.
+    """
+    rng = random.Random(seed)
+    tickets = []
+    for number in range(1, count + 1):
+        if tickets and rng.random() < duplicate_rate:
+            original = rng.choice(tickets)
+            title, description = original['title'], original['description'] + rng.choice(
+                ["", " Thanks.", " Any update?", " This is still happening."])
+        else:
+            title_template, description_template = rng.choice(PROBLEMS)
+            subject = rng.choice(SUBJECTS)
+            title = title_template.format(subject=subject)
+            description = f"{description_template.format(subject=subject)} Account #{rng.randint(1000, 99999)}."
+        tickets.append({'id': str(number), 'title': title, 'description': description})
+    return tickets
+
+def poisson_arrivals(rate: float, count: int, seed: int = 0) -> Iterator[float]:
+    """
+    Arrival offsets in seconds from the start of the run
+    """
+    rng = random.Random(seed)
+    offset = 0.0
+    for _ in range(count):
+        offset += rng.expovariate(rate)
+        yield offset
+
+def percentiles(samples: Sequence[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    ordered = sorted(samples)
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 4),
+        'p50': at(0.50),
+        'p95': at(0.95),
+        'p99': at(0.99),
+        'max': round(ordered[-1], 4)
+    }
+
+class AgentTimer:
+    """
+    Records the duration of every process() call of the pipeline's agents.
+    The pipeline must be warmed up so that all of them are built.
+    """
+
+    def __init__(self, pipeline):
+        self.samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        for agent in pipeline.agents.built().values():
+            agent.process = self._wrap(type(agent).__name__, agent.process)
+
+    def _wrap(self, name: str, process):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return process(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.samples.setdefault(name, []).append(elapsed)
+        return timed
+
+    def report(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: percentiles(samples) for name, samples in sorted(self.samples.items())}
+
+def _snapshot() -> Dict:
+    from database.db import DB_QUERY_SECONDS
+    from services.groq_service import LLM_ERRORS, LLM_HTTP_SECONDS, LLM_TOKENS
+    from services.llm_cache import CACHE_LOOKUPS
+    return {
+        'http_requests': LLM_HTTP_SECONDS.totals()[0],
+        'http_ok': LLM_HTTP_SECONDS.totals(status="200")[0],
+        'http_throttled': LLM_HTTP_SECONDS.totals(status="429")[0],
+        'prompt_tokens': LLM_TOKENS.total(kind="prompt"),
+        'completion_tokens': LLM_TOKENS.total(kind="completion"),
+        'llm_errors': LLM_ERRORS.total(),
+        'cache_hits': CACHE_LOOKUPS.total(result="hit") + CACHE_LOOKUPS.total(result="disk_hit"),
+        'cache_misses': CACHE_LOOKUPS.total(result="miss"),
+        'db_queries': DB_QUERY_SECONDS.totals()[0],
+        'db_seconds': DB_QUERY_SECONDS.totals()[1],
+    }
+
+def run_benchmark(tickets: List[Dict], rate: float, concurrency: int = 32, save_to_db: bool = False,
+                  pipeline=None, seed: int = 0) -> Dict:
+    """
+    Replay tickets through the pipeline with Poisson arrivals at rate per
+    second and return the report (without configuration details)
+    """
+    from database.db import db
+    from pipeline.ticket_pipeline import TicketPipeline
+
+    pipeline = pipeline or TicketPipeline(database=db if save_to_db else None)
+    timer = AgentTimer(pipeline)
+    end_to_end, service, lock = [], [], threading.Lock()
+    outcomes = {'completed': 0, 'failed': 0, 'reused_analysis': 0, 'degraded': 0}
+
+    def process(ticket: Dict, arrival: float):
+        started = time.perf_counter()
+        try:
+            results = pipeline.process(ticket['title'], ticket['description'])
+            if save_to_db:
+                ticket_id = db.save_ticket(ticket['title'], ticket['description'], results['category'],
+                                           results['priority'], results['intent_info']['primary_intent'],
+                                           results['cluster_id'])
+                if ticket_id is not None:
+                    pipeline.link_ticket(ticket['title'], ticket['description'], ticket_id, results)
+                    pipeline.save_analysis(ticket_id, results)
+        except Exception:
+            logging.getLogger(__name__).exception("Ticket %s failed", ticket['id'])
+            with lock:
+                outcomes['failed'] += 1
+            return
+        finished = time.perf_counter()
+        with lock:
+            outcomes['completed'] += 1
+            outcomes['reused_analysis'] += results['reused_analysis']
+            outcomes['degraded'] += bool(results['degraded'])
+            end_to_end.append(finished - arrival)
+            service.append(finished - started)
+
+    before = _snapshot()
+    run_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for ticket, offset in zip(tickets, poisson_arrivals(rate, len(tickets), seed)):
+            arrival = run_started + offset
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(process, ticket, arrival)
+    duration = time.perf_counter() - run_started
+    # Analyses are written behind; count their database time too
+    if pipeline.analysis_store is not None:
+        pipeline.analysis_store.flush()
+    after = _snapshot()
+
+    delta = {key: after[key] - before[key] for key in after}
+    completed = outcomes['completed'] or 1
+    cache_lookups = delta['cache_hits'] + delta['cache_misses']
+    return {
+        'tickets': dict(outcomes, submitted=len(tickets)),
+        'duration_seconds': round(duration, 3),
+        'throughput_per_second': round(outcomes['completed'] / duration, 3) if duration else None,
+        'latency_seconds': {
+            'end_to_end': percentiles(end_to_end),
+            'service': percentiles(service),
+            'agents': timer.report()
+        },
+        'llm': {
+            'http_requests': delta['http_requests'],
+            'throttled': delta['http_throttled'],
+            'errors': delta['llm_errors'],
+            'calls_per_ticket': round(delta['http_ok'] / completed, 3),
+            'prompt_tokens_per_ticket': round(delta['prompt_tokens'] / completed, 1),
+            'completion_tokens_per_ticket': round(delta['completion_tokens'] / completed, 1),
+            'cache_hit_rate': round(delta['cache_hits'] / cache_lookups, 3) if cache_lookups else None
+        },
+        'db': {
+            'queries': delta['db_queries'],
+            'seconds': round(delta['db_seconds'], 4),
+            'seconds_per_ticket': round(delta['db_seconds'] / completed, 4)
+        }
+    }
+
+# Figures printed side by side with --baseline: (label, path into the report)
+COMPARED = [
+    ("throughput/s", ("throughput_per_second",)),
+    ("e2e p50 s", ("latency_seconds", "end_to_end", "p50")),
+    ("e2e p95 s", ("latency_seconds", "end_to_end", "p95")),
+    ("e2e p99 s", ("latency_seconds", "end_to_end", "p99")),
+    ("LLM calls/ticket", ("llm", "calls_per_ticket")),
+    ("prompt tokens/ticket", ("llm", "prompt_tokens_per_ticket")),
+    ("completion tokens/ticket", ("llm", "completion_tokens_per_ticket")),
+    ("DB s/ticket", ("db", "seconds_per_ticket")),
+]
+
+def compare(baseline: Dict, report: Dict) -> List[str]:
+    def get(data, path):
+        for key in path:
+            data = (data or {}).get(key)
+        return data
+
+    lines = [f"{'':26}{'baseline':>12}{'current':>12}{'change':>10}"]
+    for label, path in COMPARED:
+        old, new = get(baseline, path), get(report, path)
+        change = f"{(new - old) / old:+.1%}" if old and new is not None else "n/a"
+        lines.append(f"{label:26}{_fmt(old):>12}{_fmt(new):>12}{change:>10}")
+    return lines
+
+def _fmt(value) -> str:
+    return "n/a" if value is None else f"{value:g}"
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ticket pipeline against a mock Groq server")
+    parser.add_argument("--rate", type=float, default=2.0, help="Mean ticket arrivals per second")
+    parser.add_argument("--tickets", type=int, default=200, help="Number of tickets to send")
+    parser.add_argument("--input", help="JSONL or CSV tickets to replay instead of synthetic ones")
+    parser.add_argument("--duplicate-rate", type=float, default=0.2, help="Share of synthetic near-duplicates")
+    parser.add_argument("--concurrency", type=int, default=32, help="Tickets processed in parallel at most")
+    parser.add_argument("--save-to-db", action="store_true", help="Save each ticket like the app does")
+    parser.add_argument("--api-url", help="Benchmark this endpoint instead of starting the mock server")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--log-level", default="WARNING")
+    add_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    mock = None
+    if args.api_url:
+        os.environ["GROQ_API_URL"] = args.api_url
+    else:
+        mock = MockGroqServer(config_from_args(args)).start()
+        os.environ["GROQ_API_URL"] = mock.url
+        # Measure the pipeline, not the free-tier quota
+        os.environ.setdefault("GROQ_RPM", "1000000")
+        os.environ.setdefault("GROQ_TPM", "1000000000")
+
+    if args.input:
+        from batch_process import read_tickets
+        tickets = list(read_tickets(args.input))[:args.tickets]
+    else:
+        tickets = synthetic_tickets(args.tickets, args.duplicate_rate, seed=args.seed or 0)
+
+    results = run_benchmark(tickets, args.rate, args.concurrency, args.save_to_db, seed=args.seed or 0)
+    report = {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'revision': _git_revision(),
+        'config': {
+            'rate': args.rate,
+            'tickets': len(tickets),
+            'input': args.input or "synthetic",
+            'concurrency': args.concurrency,
+            'save_to_db': args.save_to_db,
+            'mock': vars(mock.config) if mock else None,
+            'env': {name: os.environ[name] for name in sorted(os.environ)
+                    if name.startswith(("GROQ_", "PIPELINE_", "FUSED_", "NEAR_DUPLICATE", "LLM_CACHE", "LOCAL_MODEL"))
+                    and name != "GROQ_API_KEY"}
+        },
+        **results,
+        'mock_server': mock.stats.to_dict() if mock else None
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    latency = report['latency_seconds']['end_to_end']
+    print(f"{report['tickets']['completed']} tickets in {report['duration_seconds']}s "
+          f"({report['throughput_per_second']}/s); end-to-end p50 {latency['p50']}s, "
+          f"p95 {latency['p95']}s, p99 {latency['p99']}s; "
+          f"{report['llm']['calls_per_ticket']} LLM calls per ticket")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print("\n".join(compare(json.load(f), report)))
+    if mock:
+        mock.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import atexit
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from database.db import db
+from models.ticket import TicketAnalysis
+from services.generation_profiles import PROMPT_VERSION
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WRITES = metrics.counter("analysis_store_writes_total",
+                                  "Ticket analyses handed to the write-behind store, by outcome", ["result"])
+ANALYSIS_PENDING = metrics.gauge("analysis_store_pending", "Ticket analyses waiting to be written")
+
+class AnalysisStore:
+    """
+    Write-behind store for complete ticket analyses. put() only queues the
+    analysis; a background thread writes queued analyses in batches of up
+    to batch_size every flush_interval seconds, so saving never adds to the
+    time a ticket takes. Lookups see queued analyses before they reach the
+    database.
+
+    A batch that fails is retried max_retries times and then dropped. When
+    max_pending analyses are queued, further ones are dropped rather than
+    slowing the caller down; both are logged and counted.
+    """
+
+    def __init__(self, database=db, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_pending: int = 10000, max_retries: int = 3):
+        self.db = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        # ticket id -> analysis, queued and being written; readers check both
+        self._pending: Dict[int, TicketAnalysis] = {}
+        self._writing: Dict[int, TicketAnalysis] = {}
+        self._changed = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def put(self, analysis: TicketAnalysis) -> bool:
+        """
+        Queue analysis to be written. Returns False if it was dropped because
+        the queue is full or the store is closed.
+        """
+        with self._changed:
+            if self._closed:
+                ANALYSIS_WRITES.inc(result="dropped")
+                logger.warning("Analysis store is closed, dropping the analysis of ticket %s", analysis.ticket_id)
+                return False
+            if len(self._pending) >= self.max_pending and analysis.ticket_id not in self._pending:
+                ANALYSIS_WRITES.inc(result="dropped")
+                logger.warning("Analysis store queue is full, dropping the analysis of ticket %s",
+                               analysis.ticket_id)
+                return False
+            self._pending[analysis.ticket_id] = analysis
+            ANALYSIS_PENDING.set(len(self._pending))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="analysis-store", daemon=True)
+                self._thread.start()
+                # Write whatever is still queued when the interpreter exits
+                atexit.register(self.close)
+            self._changed.notify_all()
+        return True
+
+    def get(self, ticket_id: int, prompt_version: Optional[str] = PROMPT_VERSION) -> Optional[TicketAnalysis]:
+        """
+        Stored analysis of a ticket, if one was produced with prompt_version
+        (any version if None)
+        """
+        return self.get_many([ticket_id], prompt_version).get(ticket_id)
+
+    def get_many(self, ticket_ids: Iterable[int],
+                 prompt_version: Optional[str] = PROMPT_VERSION) -> Dict[int, TicketAnalysis]:
+        found, missing = {}, []
+        with self._changed:
+            for ticket_id in ticket_ids:
+                analysis = self._pending.get(ticket_id) or self._writing.get(ticket_id)
+                if analysis is not None:
+                    if prompt_version is None or analysis.prompt_version == prompt_version:
+                        found[ticket_id] = analysis
+                else:
+                    missing.append(ticket_id)
+        if missing:
+            found.update(self.db.get_ticket_analyses(missing, prompt_version))
+        return found
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything queued so far has been written (or dropped).
+        Returns False on timeout.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._changed:
+            self._changed.notify_all()
+            while self._pending or self._writing:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = 10):
+        """
+        Write what is queued and stop the background thread
+        """
+        if not self.flush(timeout):
+            logger.warning("Analysis store closed with %s analyses unwritten", len(self._pending))
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                if len(self._pending) < self.batch_size and not self._closed:
+                    self._changed.wait(self.flush_interval)
+                while not self._pending and not self._closed:
+                    self._changed.wait()
+                if self._closed and not self._pending:
+                    return
+                ticket_ids = list(self._pending)[:self.batch_size]
+                self._writing = {ticket_id: self._pending.pop(ticket_id) for ticket_id in ticket_ids}
+                ANALYSIS_PENDING.set(len(self._pending))
+            self._write(list(self._writing.values()))
+            with self._changed:
+                self._writing = {}
+                self._changed.notify_all()
+
+    def _write(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.db.save_ticket_analyses(batch)
+                ANALYSIS_WRITES.inc(len(batch), result="written")
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    ANALYSIS_WRITES.inc(len(batch), result="failed")
+                    logger.warning("Dropping %s ticket analyses after %s attempts: %s", len(batch), attempt + 1, e)
+                    return
+                time.sleep(min(2 ** attempt, 10))
@@ -1,39 +1,290 @@
+import functools
+import gzip
+import json
+import logging
 import os
+import re
+import threading
 import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from models.ticket import Ticket, TicketAnalysis
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Monthly partitions of a partitioned tickets table; rows outside every
+# partition's range land in tickets_default
+TICKET_PARTITION_PREFIX = "tickets_p"
+TICKET_DEFAULT_PARTITION = "tickets_default"
+_TICKET_PARTITION_NAME = re.compile(r"^tickets_p(\d{4})_(\d{2})$")
+# Months of partitions the application itself keeps ahead of the current one
+TICKET_PARTITION_MONTHS_AHEAD = int(os.getenv("TICKET_PARTITION_MONTHS_AHEAD", "3"))
+# Serializes partition creation across processes
+_PARTITION_LOCK_KEY = 7341120
+
+# Each dashboard counter is split over this many rows, summed on read, so
+# concurrent writers rarely wait on the same row lock; a statement writes
+# to the shard of its session (backend pid % shards)
+DASHBOARD_COUNT_SHARDS = 16
+_DASHBOARD_SHARD = f"pg_backend_pid() % {DASHBOARD_COUNT_SHARDS}"
+
+# Agent results can carry values json does not know, such as datetimes
+_json_dumps = functools.partial(json.dumps, default=str)
+
+DB_QUERY_SECONDS = metrics.histogram("db_query_seconds", "Duration of database operations", ["query"])
+DB_POOL_MAX = metrics.gauge("db_pool_max_connections", "Size limit of the database connection pool")
+DB_POOL_IN_USE = metrics.gauge("db_pool_connections_in_use", "Database connections checked out of the pool")
+DB_POOL_WAITING = metrics.gauge("db_pool_waiting", "Callers blocked waiting for a free database connection")
+DB_POOL_WAIT_SECONDS = metrics.histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection")
+DB_POOL_RECONNECTS = metrics.counter("db_pool_reconnects_total", "Broken pooled connections replaced")
+
+def _timed_query(method):
+    return metrics.timed(DB_QUERY_SECONDS, query=method.__name__)(method)
+
+@dataclass
+class BatchFailure:
+    start: int  # index of the first ticket of the batch in the input
+    end: int    # index one past the last ticket of the batch
+    error: str
+
+@dataclass
+class BulkSaveResult:
+    ids: List[Optional[int]] = field(default_factory=list)  # input order, None where the batch failed
+    failures: List[BatchFailure] = field(default_factory=list)
+
+    @property
+    def saved(self):
+        return sum(1 for ticket_id in self.ids if ticket_id is not None)
+
+    @property
+    def failed(self):
+        return len(self.ids) - self.saved
+
+@dataclass
+class TicketPage:
+    tickets: List[dict]
+    # Pass back as cursor to get the next page; None on the last page
+    next_cursor: Optional[Tuple[datetime, int]] = None
+
+@dataclass
+class DashboardStats:
+    total: int = 0
+    by_category: Dict[Optional[str], int] = field(default_factory=dict)
+    by_priority: Dict[Optional[int], int] = field(default_factory=dict)
+    knowledge_base_entries: int = 0
+    hourly: List[Tuple[datetime, int]] = field(default_factory=list)  # oldest hour first
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+def _json_or_null(value):
+    return None if value is None else Json(value)
+
+def _ticket_partition_name(month: datetime) -> str:
+    return f"{TICKET_PARTITION_PREFIX}{month:%Y_%m}"
+
+def _count_changes(source: str, command: str = "SELECT") -> str:
+    """
+    SQL adding the rows of source (category, priority, created_at and n, the
+    change in count for the row) to the dashboard aggregates
+    """
+    return f"""{command} dashboard_counts_add(array_agg(category), array_agg(priority), array_agg(hour), array_agg(n))
+               FROM (SELECT category, priority, date_trunc('hour', created_at) AS hour, sum(n) AS n
+                     FROM {source} GROUP BY 1, 2, 3) AS grouped"""
 
 class Database:
-    def __init__(self, max_retries=3):
+    """
+    Pooled PostgreSQL access. Nothing touches the database until the first
+    query, which opens the pool; the schema is created or upgraded by the
+    explicit migrate() step (python -m database.migrate), not on import.
+    """
+
+    def __init__(self, max_retries=3, min_connections=None, max_connections=None,
+                 health_check_interval=30):
         self.max_retries = max_retries
-        self.conn = None
-        self._connect()
-        self._create_tables()
+        self.min_connections = min_connections or int(os.getenv("DB_POOL_MIN", "1"))
+        self.max_connections = max_connections or int(os.getenv("DB_POOL_MAX", "10"))
+        # Connections idle for longer than this are pinged before being handed out
+        self.health_check_interval = health_check_interval
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._stats_lock = threading.Lock()
+        self._last_used = {}
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._reconnects = 0
+        self._partitions_checked = None
+        self._partitions_lock = threading.Lock()
+        DB_POOL_MAX.set(self.max_connections)
+        DB_POOL_IN_USE.set(0)
+        DB_POOL_WAITING.set(0)
+
+    def _ensure_pool(self):
+        if self.pool is None:
+            with self._pool_lock:
+                if self.pool is None:
+                    self._connect()
 
     def _connect(self):
         retry_count = 0
         while retry_count < self.max_retries:
             try:
-                print("[DEBUG] Attempting database connection...")
-                self.conn = psycopg2.connect(
+                logger.debug("Attempting database connection...")
+                pool = ThreadedConnectionPool(
+                    self.min_connections,
+                    self.max_connections,
                     host=os.environ['PGHOST'],
                     database=os.environ['PGDATABASE'],
                     user=os.environ['PGUSER'],
                     password=os.environ['PGPASSWORD'],
                     port=os.environ['PGPORT']
                 )
-                print("[DEBUG] Successfully connected to database")
+                logger.info("Successfully connected to database (pool %s-%s)",
+                            self.min_connections, self.max_connections)
+                self.pool = pool
                 return
             except psycopg2.Error as e:
                 retry_count += 1
-                print(f"[DEBUG] Database connection attempt {retry_count} failed: {str(e)}")
+                logger.warning("Database connection attempt %s failed: %s", retry_count, e)
                 if retry_count < self.max_retries:
                     time.sleep(2)  # Wait before retrying
                 else:
                     raise Exception("Failed to connect to database after maximum retries")
 
-    def _create_tables(self):
-        with self.conn.cursor() as cur:
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        conn = self.pool.getconn()
+        if not self._is_healthy(conn):
+            logger.debug("Discarding broken database connection and reconnecting")
+            self._last_used.pop(id(conn), None)
+            self.pool.putconn(conn, close=True)
+            with self._stats_lock:
+                self._reconnects += 1
+            DB_POOL_RECONNECTS.inc()
+            conn = self.pool.getconn()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        Check a connection out of the pool for the duration of the block.
+        Blocks while all connections are in use; rolls back on error and
+        returns broken connections to the pool closed so they get replaced.
+        """
+        self._ensure_pool()
+        started = time.monotonic()
+        with self._stats_lock:
+            self._waiting += 1
+            DB_POOL_WAITING.set(self._waiting)
+        self._slots.acquire()
+        waited = time.monotonic() - started
+        with self._stats_lock:
+            self._waiting -= 1
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_time += waited
+            DB_POOL_WAITING.set(self._waiting)
+            DB_POOL_IN_USE.set(self._in_use)
+        DB_POOL_WAIT_SECONDS.observe(waited)
+
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except Exception:
+            if conn is not None and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            if conn is not None:
+                self._last_used[id(conn)] = time.monotonic()
+                if conn.closed:
+                    self._last_used.pop(id(conn), None)
+                self.pool.putconn(conn, close=bool(conn.closed))
+            with self._stats_lock:
+                self._in_use -= 1
+                DB_POOL_IN_USE.set(self._in_use)
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self, cursor_factory=None):
+        """
+        Pooled cursor that commits when the block completes
+        """
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cur:
+                yield cur
+            conn.commit()
+
+    def pool_stats(self):
+        with self._stats_lock:
+            return {
+                'max_connections': self.max_connections,
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'total_wait_seconds': self._wait_time,
+                'avg_wait_seconds': self._wait_time / self._checkouts if self._checkouts else 0.0,
+                'reconnects': self._reconnects
+            }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.closeall()
+
+    def _read(self, query, params=None, cursor_factory=None):
+        """
+        Run a read-only query, retrying once on a fresh connection if the
+        connection dropped underneath it
+        """
+        for attempt in range(2):
+            try:
+                with self.cursor(cursor_factory=cursor_factory) as cur:
+                    cur.execute(query, params)
+                    return cur.fetchall()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                if attempt:
+                    raise
+                logger.debug("Database connection lost, retrying query: %s", e)
+                with self._stats_lock:
+                    self._reconnects += 1
+
+    def migrate(self, partition_tickets=False, months_ahead=3):
+        """
+        Create or upgrade the schema. Idempotent; run it once per deployment
+        before starting the app. With partition_tickets, tickets becomes a
+        table partitioned by month of created_at (converting an existing one
+        in place). A partitioned table gets partitions up to months_ahead
+        months from now on every run.
+        """
+        with self.cursor() as cur:
             # Create tickets table
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS tickets (
@@ -46,6 +297,22 @@ class Database:
                 )
             """)
             
+            # Primary intent is kept as a training label for the local intent model
+            cur.execute("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS intent TEXT")
+            # Near-duplicates point at the first ticket of their cluster
+            cur.execute("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS cluster_id INTEGER")
+            # Labels the LLM assigned, the only ones the local classifiers are trained on
+            cur.execute("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS training_labels JSONB")
+            if partition_tickets:
+                self._partition_tickets(cur)
+            if self._tickets_partitioned(cur):
+                self._create_ticket_partitions(cur, months_ahead)
+            cur.execute("CREATE INDEX IF NOT EXISTS tickets_cluster_id_idx ON tickets (cluster_id)")
+            # Recent-ticket listings page by (created_at, id), optionally within a category or priority
+            cur.execute("CREATE INDEX IF NOT EXISTS tickets_created_at_idx ON tickets (created_at, id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS tickets_category_idx ON tickets (category, created_at, id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS tickets_priority_idx ON tickets (priority, created_at, id)")
+
             # Create knowledge_base table
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS knowledge_base (
@@ -56,37 +323,675 @@ class Database:
                     tags TEXT[]
                 )
             """)
-            self.conn.commit()
 
-    def save_ticket(self, title, description, category=None, priority=None):
+            # Track modification time so cached KB snapshots can refresh incrementally
+            cur.execute("""
+                ALTER TABLE knowledge_base
+                ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS knowledge_base_updated_at_idx ON knowledge_base (updated_at)
+            """)
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION knowledge_base_touch() RETURNS trigger AS $$
+                BEGIN
+                    NEW.updated_at := CURRENT_TIMESTAMP;
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+            cur.execute("""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'knowledge_base_touch') THEN
+                        CREATE TRIGGER knowledge_base_touch BEFORE UPDATE ON knowledge_base
+                        FOR EACH ROW EXECUTE FUNCTION knowledge_base_touch();
+                    END IF;
+                END
+                $$
+            """)
+
+            # Complete pipeline output per ticket, so it can be looked up instead
+            # of recomputed. No foreign key: a partitioned tickets table's
+            # primary key is (id, created_at).
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS ticket_analysis (
+                    ticket_id INTEGER PRIMARY KEY,
+                    analysis JSONB NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    models JSONB NOT NULL DEFAULT '{}',
+                    timings JSONB NOT NULL DEFAULT '{}',
+                    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            self._migrate_dashboard_counts(cur)
+
+    def _tickets_partitioned(self, cur):
+        cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('tickets')")
+        row = cur.fetchone()
+        return bool(row and row[0])
+
+    def _partition_tickets(self, cur):
+        """
+        Replace an unpartitioned tickets table by one partitioned on
+        created_at, copying the rows over. The primary key of a partitioned
+        table has to include the partition key, so it becomes (id, created_at);
+        ids still come from the same sequence and stay unique.
+        """
+        if self._tickets_partitioned(cur):
+            return
+        logger.info("Converting tickets to a partitioned table")
+        cur.execute("LOCK TABLE tickets IN ACCESS EXCLUSIVE MODE")
+        cur.execute("ALTER TABLE tickets RENAME TO tickets_unpartitioned")
+        cur.execute("ALTER INDEX IF EXISTS tickets_pkey RENAME TO tickets_unpartitioned_pkey")
+        cur.execute("SELECT pg_get_serial_sequence('tickets_unpartitioned', 'id')")
+        sequence = cur.fetchone()[0]
+        cur.execute("""
+            CREATE TABLE tickets (
+                id INTEGER NOT NULL DEFAULT nextval(%s::regclass),
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                category TEXT,
+                priority INTEGER,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                intent TEXT,
+                cluster_id INTEGER,
+                training_labels JSONB,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """, (sequence,))
+        # The sequence has to change hands before the old table is dropped
+        cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY tickets.id")
+        cur.execute(f"CREATE TABLE {TICKET_DEFAULT_PARTITION} PARTITION OF tickets DEFAULT")
+
+        cur.execute("SELECT min(created_at) FROM tickets_unpartitioned")
+        oldest = cur.fetchone()[0]
+        if oldest is not None:
+            month = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            current = self._current_month(cur)
+            while month <= current:
+                self._create_ticket_partition(cur, month)
+                month = _add_months(month, 1)
+
+        # Rows without a timestamp predate the column default; they go to the
+        # default partition at the epoch
+        cur.execute("""
+            INSERT INTO tickets (id, title, description, category, priority, created_at, intent, cluster_id,
+                                 training_labels)
+            SELECT id, title, description, category, priority, coalesce(created_at, 'epoch'), intent, cluster_id,
+                   training_labels
+            FROM tickets_unpartitioned
+        """)
+        cur.execute("DROP TABLE tickets_unpartitioned")
+
+    def _current_month(self, cur) -> datetime:
+        # created_at defaults to the server's local time, so months follow it too
+        cur.execute("SELECT date_trunc('month', LOCALTIMESTAMP)")
+        return cur.fetchone()[0]
+
+    def _ticket_partitions(self, cur) -> List[Tuple[str, datetime]]:
+        """
+        (name, first day) of the monthly partitions of tickets, oldest first
+        """
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'tickets'::regclass
+        """)
+        partitions = []
+        for (name,) in cur.fetchall():
+            match = _TICKET_PARTITION_NAME.match(name)
+            if match:
+                partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    def _create_ticket_partition(self, cur, month: datetime):
+        """
+        Add the partition for month. Rows of that month already in the
+        default partition are moved into it first, as attaching would fail
+        otherwise.
+        """
+        name = _ticket_partition_name(month)
+        bounds = (month, _add_months(month, 1))
+        cur.execute(f"CREATE TABLE {name} (LIKE tickets INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        # Statements on a partition itself do not fire the triggers of tickets,
+        # so moving rows leaves the dashboard counts alone
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM {TICKET_DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, bounds)
+        cur.execute(f"ALTER TABLE tickets ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+        logger.info("Created ticket partition %s", name)
+
+    def _create_ticket_partitions(self, cur, months_ahead):
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (_PARTITION_LOCK_KEY,))
+        existing = {name for name, _ in self._ticket_partitions(cur)}
+        month = self._current_month(cur)
+        for _ in range(months_ahead + 1):
+            if _ticket_partition_name(month) not in existing:
+                self._create_ticket_partition(cur, month)
+            month = _add_months(month, 1)
+
+    def create_ticket_partitions(self, months_ahead=3):
+        """
+        Make sure tickets has partitions for this month and the next
+        months_ahead months. python -m database.migrate does this, and the
+        application before its first insert of every day; tickets past the
+        last partition still go to the default one.
+        """
+        with self.cursor() as cur:
+            if self._tickets_partitioned(cur):
+                self._create_ticket_partitions(cur, months_ahead)
+
+    def _ensure_ticket_partitions(self):
+        """
+        Create upcoming ticket partitions once a day, so inserts do not rely
+        on a scheduled migrate run to have a partition for the new month
+        """
+        today = datetime.now().date()
+        if self._partitions_checked == today:
+            return
+        with self._partitions_lock:
+            if self._partitions_checked == today:
+                return
+            try:
+                self.create_ticket_partitions(TICKET_PARTITION_MONTHS_AHEAD)
+            except psycopg2.Error as e:
+                # The default partition still takes the rows
+                logger.warning("Unable to create upcoming ticket partitions: %s", e)
+            self._partitions_checked = today
+
+    def expire_ticket_partitions(self, keep_months, drop=False, archive_dir=None) -> List[str]:
+        """
+        Detach the monthly ticket partitions that ended more than keep_months
+        months before the current month, and return their names. A detached
+        partition stays in the database as a standalone table until it is
+        dropped (drop), which also deletes the stored analyses of its
+        tickets. With archive_dir, each one is first written to
+        <archive_dir>/<partition>.csv.gz and its analyses to
+        <archive_dir>/<partition>_analysis.csv.gz.
+        """
+        with self.cursor() as cur:
+            if not self._tickets_partitioned(cur):
+                return []
+            cutoff = _add_months(self._current_month(cur), -keep_months)
+            expired = [name for name, month in self._ticket_partitions(cur) if _add_months(month, 1) <= cutoff]
+
+        for name in expired:
+            with self.cursor() as cur:
+                # Detaching removes the rows from tickets without firing its
+                # delete trigger, so take them out of the counts here
+                cur.execute(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE")
+                cur.execute(_count_changes(f"(SELECT category, priority, created_at, -1 AS n FROM {name}) AS c"))
+                cur.execute(f"ALTER TABLE tickets DETACH PARTITION {name}")
+            logger.info("Detached ticket partition %s", name)
+            analyses = f"SELECT a.* FROM ticket_analysis a JOIN {name} t ON a.ticket_id = t.id"
+            if archive_dir:
+                self.archive_table(name, archive_dir)
+                self.archive_query(analyses, f"{name}_analysis", archive_dir)
+            if drop:
+                with self.cursor() as cur:
+                    cur.execute(f"DELETE FROM ticket_analysis WHERE ticket_id IN (SELECT id FROM {name})")
+                    cur.execute(f"DROP TABLE {name}")
+                logger.info("Dropped ticket partition %s", name)
+        return expired
+
+    def archive_table(self, table, archive_dir) -> str:
+        """
+        Write table as gzip-compressed CSV with a header row to
+        <archive_dir>/<table>.csv.gz and return the path
+        """
+        return self.archive_query(f"SELECT * FROM {table}", table, archive_dir)
+
+    def archive_query(self, query, name, archive_dir) -> str:
+        """
+        Write the rows of query as gzip-compressed CSV with a header row to
+        <archive_dir>/<name>.csv.gz and return the path
+        """
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"{name}.csv.gz")
+        tmp_path = f"{path}.tmp"
+        with self.cursor() as cur, gzip.open(tmp_path, "wb") as f:
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+        os.replace(tmp_path, path)
+        logger.info("Archived %s to %s", name, path)
+        return path
+
+    def _migrate_dashboard_counts(self, cur):
+        """
+        Dashboard aggregates kept up to date by statement-level triggers, so
+        reading them costs a few index lookups however many tickets there
+        are. A bulk insert updates each affected counter once per statement,
+        in its session's shard of the counter.
+        """
+        cur.execute("SELECT to_regclass('dashboard_counts') IS NULL")
+        first_install = cur.fetchone()[0]
+        if first_install:
+            # Keep writers out until the triggers exist and the backfill is done
+            cur.execute("LOCK TABLE tickets, knowledge_base IN SHARE ROW EXCLUSIVE MODE")
+
+        # Counts per dimension: 'total' and 'kb_entries' (bucket ''), 'category'
+        # and 'priority' (bucket '' for unset values)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS dashboard_counts (
+                dimension TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                shard SMALLINT NOT NULL DEFAULT 0,
+                count BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, bucket, shard)
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ticket_volume_hourly (
+                hour TIMESTAMP NOT NULL,
+                shard SMALLINT NOT NULL DEFAULT 0,
+                count BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (hour, shard)
+            )
+        """)
+        # Takes counts already grouped by (category, priority, hour), so a
+        # statement touching millions of rows passes only a few thousand
+        cur.execute(f"""
+            CREATE OR REPLACE FUNCTION dashboard_counts_add(
+                categories TEXT[], priorities INTEGER[], hours TIMESTAMP[], counts BIGINT[]
+            ) RETURNS void AS $$
+                INSERT INTO dashboard_counts (dimension, bucket, shard, count)
+                SELECT dimension, bucket, {_DASHBOARD_SHARD}, sum(n)
+                FROM unnest(categories, priorities, counts) AS t(category, priority, n),
+                     LATERAL (VALUES ('total', ''),
+                                     ('category', coalesce(category, '')),
+                                     ('priority', coalesce(priority::text, ''))) AS d(dimension, bucket)
+                GROUP BY dimension, bucket
+                HAVING sum(n) <> 0
+                ON CONFLICT (dimension, bucket, shard)
+                DO UPDATE SET count = dashboard_counts.count + EXCLUDED.count;
+
+                INSERT INTO ticket_volume_hourly (hour, shard, count)
+                SELECT hour, {_DASHBOARD_SHARD}, sum(n)
+                FROM unnest(hours, counts) AS t(hour, n)
+                WHERE hour IS NOT NULL
+                GROUP BY hour
+                HAVING sum(n) <> 0
+                ON CONFLICT (hour, shard)
+                DO UPDATE SET count = ticket_volume_hourly.count + EXCLUDED.count;
+            $$ LANGUAGE sql
+        """)
+        cur.execute(f"""
+            CREATE OR REPLACE FUNCTION tickets_count_changes() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    {_count_changes("(SELECT category, priority, created_at, 1 AS n FROM new_rows) AS c", "PERFORM")};
+                ELSIF TG_OP = 'DELETE' THEN
+                    {_count_changes("(SELECT category, priority, created_at, -1 AS n FROM old_rows) AS c", "PERFORM")};
+                ELSE
+                    -- Unchanged rows cancel out and leave the counters untouched
+                    {_count_changes("(SELECT category, priority, created_at, -1 AS n FROM old_rows UNION ALL "
+                                    "SELECT category, priority, created_at, 1 AS n FROM new_rows) AS c", "PERFORM")};
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        cur.execute(f"""
+            CREATE OR REPLACE FUNCTION knowledge_base_count_changes() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO dashboard_counts (dimension, bucket, shard, count)
+                    SELECT 'kb_entries', '', {_DASHBOARD_SHARD}, count(*) FROM new_rows
+                    ON CONFLICT (dimension, bucket, shard)
+                    DO UPDATE SET count = dashboard_counts.count + EXCLUDED.count;
+                ELSE
+                    INSERT INTO dashboard_counts (dimension, bucket, shard, count)
+                    SELECT 'kb_entries', '', {_DASHBOARD_SHARD}, -count(*) FROM old_rows
+                    ON CONFLICT (dimension, bucket, shard)
+                    DO UPDATE SET count = dashboard_counts.count + EXCLUDED.count;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        # Transition tables rule out a single trigger for several events
+        for table, function, event, tables in [
+            ("tickets", "tickets_count_changes", "INSERT", "NEW TABLE AS new_rows"),
+            ("tickets", "tickets_count_changes", "UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+            ("tickets", "tickets_count_changes", "DELETE", "OLD TABLE AS old_rows"),
+            ("knowledge_base", "knowledge_base_count_changes", "INSERT", "NEW TABLE AS new_rows"),
+            ("knowledge_base", "knowledge_base_count_changes", "DELETE", "OLD TABLE AS old_rows"),
+        ]:
+            trigger = f"{table}_count_{event.lower()}"
+            cur.execute(f"""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = '{trigger}') THEN
+                        CREATE TRIGGER {trigger} AFTER {event} ON {table}
+                        REFERENCING {tables} FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+                    END IF;
+                END
+                $$
+            """)
+
+        if first_install:
+            self._rebuild_dashboard_counts(cur)
+
+    def _rebuild_dashboard_counts(self, cur):
+        cur.execute("LOCK TABLE tickets, knowledge_base IN SHARE ROW EXCLUSIVE MODE")
+        cur.execute("TRUNCATE dashboard_counts, ticket_volume_hourly")
+        cur.execute(_count_changes("(SELECT category, priority, created_at, 1 AS n FROM tickets) AS c"))
+        cur.execute("""
+            INSERT INTO dashboard_counts (dimension, bucket, count)
+            SELECT 'kb_entries', '', count(*) FROM knowledge_base
+        """)
+
+    @_timed_query
+    def rebuild_dashboard_counts(self):
+        """
+        Recount the dashboard aggregates from scratch. migrate() does this
+        when it installs them; afterwards the triggers keep them exact, so
+        this is only needed after changes made with the triggers disabled.
+        """
+        with self.cursor() as cur:
+            self._rebuild_dashboard_counts(cur)
+
+    @_timed_query
+    def save_ticket(self, title, description, category=None, priority=None, intent=None, cluster_id=None,
+                    training_labels=None):
+        self._ensure_ticket_partitions()
         try:
-            with self.conn.cursor() as cur:
+            with self.cursor() as cur:
                 cur.execute(
-                    """INSERT INTO tickets (title, description, category, priority)
-                       VALUES (%s, %s, %s, %s) RETURNING id""",
-                    (title, description, category, priority)
+                    """INSERT INTO tickets (title, description, category, priority, intent, cluster_id, training_labels)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
+                    (title, description, category, priority, intent, cluster_id, _json_or_null(training_labels))
                 )
                 ticket_id = cur.fetchone()[0]
-                self.conn.commit()
-                print(f"[DEBUG] Successfully saved ticket with ID: {ticket_id}")
-                return ticket_id
+            logger.debug("Successfully saved ticket with ID: %s", ticket_id)
+            return ticket_id
+        except psycopg2.Error as e:
+            logger.warning("Error saving ticket to database: %s", e)
+            raise
+
+    @_timed_query
+    def save_tickets_bulk(self, tickets: Iterable[Ticket], batch_size: int = 1000) -> BulkSaveResult:
+        """
+        Insert tickets in batches of batch_size, committing each batch on its
+        own. Ids are reserved from the sequence up front so they can be
+        returned in input order; a failed batch is rolled back and reported
+        without stopping the remaining batches.
+        """
+        self._ensure_ticket_partitions()
+        result = BulkSaveResult()
+        tickets = iter(tickets)
+        while True:
+            batch = list(islice(tickets, batch_size))
+            if not batch:
+                break
+            start = len(result.ids)
+            try:
+                with self.cursor() as cur:
+                    cur.execute(
+                        "SELECT nextval(pg_get_serial_sequence('tickets', 'id')) FROM generate_series(1, %s)",
+                        (len(batch),)
+                    )
+                    ids = sorted(row[0] for row in cur.fetchall())
+                    execute_values(
+                        cur,
+                        """INSERT INTO tickets (id, title, description, category, priority, intent, cluster_id,
+                                               training_labels, created_at)
+                           VALUES %s""",
+                        [(ticket_id, t.title, t.description, t.category, t.priority, t.intent, t.cluster_id,
+                          _json_or_null(t.training_labels), t.created_at)
+                         for ticket_id, t in zip(ids, batch)],
+                        # A missing created_at gets the column default rather than NULL
+                        template="(%s, %s, %s, %s, %s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))",
+                        page_size=len(batch)
+                    )
+                for ticket_id, ticket in zip(ids, batch):
+                    ticket.id = ticket_id
+                result.ids.extend(ids)
+            except psycopg2.Error as e:
+                logger.warning("Error saving tickets %s-%s: %s", start, start + len(batch) - 1, e)
+                result.ids.extend([None] * len(batch))
+                result.failures.append(BatchFailure(start, start + len(batch), str(e)))
+
+        logger.info("Bulk saved %s tickets (%s failed)", result.saved, result.failed)
+        return result
+
+    @_timed_query
+    def get_training_tickets(self, limit=100000):
+        """
+        Return the most recent tickets with LLM-assigned labels (title,
+        description, category, priority, intent) for training the local
+        classifiers. Labels missing from training_labels are None.
+        """
+        try:
+            return self._read(
+                """SELECT title, description, training_labels->>'category' AS category,
+                          (training_labels->>'priority')::integer AS priority,
+                          training_labels->>'intent' AS intent
+                   FROM tickets WHERE training_labels IS NOT NULL
+                   ORDER BY id DESC LIMIT %s""",
+                (limit,), cursor_factory=RealDictCursor
+            )
+        except psycopg2.Error as e:
+            logger.warning("Error fetching training tickets: %s", e)
+            raise
+
+    @_timed_query
+    def get_cluster_representatives(self, limit=5000):
+        """
+        Return id, title and description of the most recent tickets that
+        started their own near-duplicate cluster
+        """
+        try:
+            return self._read(
+                """SELECT id, title, description FROM tickets
+                   WHERE cluster_id IS NULL ORDER BY id DESC LIMIT %s""",
+                (limit,), cursor_factory=RealDictCursor
+            )
+        except psycopg2.Error as e:
+            logger.warning("Error fetching cluster representatives: %s", e)
+            raise
+
+    @_timed_query
+    def set_cluster_id(self, ticket_ids: Iterable[int], cluster_id: int):
+        """
+        Move already saved tickets into a near-duplicate cluster
+        """
+        try:
+            with self.cursor() as cur:
+                cur.execute("UPDATE tickets SET cluster_id = %s WHERE id = ANY(%s)", (cluster_id, list(ticket_ids)))
+        except psycopg2.Error as e:
+            logger.warning("Error linking tickets to cluster %s: %s", cluster_id, e)
+            raise
+
+    @_timed_query
+    def get_cluster(self, cluster_id):
+        """
+        Return the tickets in a near-duplicate cluster, representative first
+        """
+        try:
+            return self._read(
+                """SELECT * FROM tickets WHERE id = %s OR cluster_id = %s ORDER BY id""",
+                (cluster_id, cluster_id), cursor_factory=RealDictCursor
+            )
+        except psycopg2.Error as e:
+            logger.warning("Error fetching ticket cluster %s: %s", cluster_id, e)
+            raise
+
+    @_timed_query
+    def save_ticket_analyses(self, analyses: Iterable[TicketAnalysis]):
+        """
+        Insert the analyses in one statement, replacing any stored earlier for
+        the same tickets
+        """
+        # One row per ticket: a statement cannot upsert the same row twice
+        analyses = list({analysis.ticket_id: analysis for analysis in analyses}.values())
+        if not analyses:
+            return
+        try:
+            with self.cursor() as cur:
+                execute_values(
+                    cur,
+                    """INSERT INTO ticket_analysis (ticket_id, analysis, prompt_version, models, timings, created_at)
+                       VALUES %s
+                       ON CONFLICT (ticket_id) DO UPDATE SET
+                           analysis = EXCLUDED.analysis, prompt_version = EXCLUDED.prompt_version,
+                           models = EXCLUDED.models, timings = EXCLUDED.timings, created_at = EXCLUDED.created_at""",
+                    [(a.ticket_id, Json(a.analysis, dumps=_json_dumps), a.prompt_version,
+                      Json(a.models), Json(a.timings), a.created_at) for a in analyses],
+                    page_size=len(analyses)
+                )
+            logger.debug("Saved %s ticket analyses", len(analyses))
+        except psycopg2.Error as e:
+            logger.warning("Error saving ticket analyses: %s", e)
+            raise
+
+    @_timed_query
+    def get_ticket_analyses(self, ticket_ids: Iterable[int], prompt_version=None) -> Dict[int, TicketAnalysis]:
+        """
+        Return the stored analyses of the given tickets by ticket id, only
+        those produced with prompt_version if it is given
+        """
+        query = """SELECT ticket_id, analysis, prompt_version, models, timings, created_at
+                   FROM ticket_analysis WHERE ticket_id = ANY(%s)"""
+        params = [list(ticket_ids)]
+        if prompt_version is not None:
+            query += " AND prompt_version = %s"
+            params.append(prompt_version)
+        try:
+            rows = self._read(query, params, cursor_factory=RealDictCursor)
+        except psycopg2.Error as e:
+            logger.warning("Error fetching ticket analyses: %s", e)
+            raise
+        return {row['ticket_id']: TicketAnalysis(**row) for row in rows}
+
+    @_timed_query
+    def get_recent_tickets(self, limit=20, cursor: Optional[Tuple[datetime, int]] = None,
+                           category=None, priority=None) -> TicketPage:
+        """
+        Newest tickets first, optionally of one category or priority. Pages
+        continue from the (created_at, id) cursor of the previous page, so
+        every page is an index range scan however deep it is.
+        """
+        conditions, params = ["created_at IS NOT NULL"], []
+        if category is not None:
+            conditions.append("category = %s")
+            params.append(category)
+        if priority is not None:
+            conditions.append("priority = %s")
+            params.append(priority)
+        if cursor is not None:
+            conditions.append("(created_at, id) < (%s, %s)")
+            params.extend(cursor)
+        try:
+            rows = self._read(
+                f"""SELECT id, title, category, priority, intent, cluster_id, created_at FROM tickets
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY created_at DESC, id DESC LIMIT %s""",
+                params + [limit + 1], cursor_factory=RealDictCursor
+            )
+        except psycopg2.Error as e:
+            logger.warning("Error fetching recent tickets: %s", e)
+            raise
+        page = TicketPage(rows[:limit])
+        if len(rows) > limit:
+            last = page.tickets[-1]
+            page.next_cursor = (last['created_at'], last['id'])
+        return page
+
+    @_timed_query
+    def get_dashboard_stats(self, hours=24) -> DashboardStats:
+        """
+        Ticket counts per category and priority, knowledge base size and
+        ticket volume per hour over the last `hours` hours, read from the
+        trigger-maintained aggregates
+        """
+        try:
+            counts = self._read(
+                """SELECT dimension, bucket, sum(count)::bigint FROM dashboard_counts
+                   GROUP BY dimension, bucket HAVING sum(count) <> 0"""
+            )
+            hourly = self._read(
+                """SELECT hour, sum(count)::bigint FROM ticket_volume_hourly
+                   WHERE hour > date_trunc('hour', LOCALTIMESTAMP) - make_interval(hours => %s)
+                   GROUP BY hour HAVING sum(count) <> 0 ORDER BY hour""",
+                (hours,)
+            )
         except psycopg2.Error as e:
-            print(f"[DEBUG] Error saving ticket to database: {str(e)}")
-            self.conn.rollback()
+            logger.warning("Error fetching dashboard stats: %s", e)
             raise
+        stats = DashboardStats(hourly=[(hour, count) for hour, count in hourly])
+        for dimension, bucket, count in counts:
+            if dimension == 'total':
+                stats.total = count
+            elif dimension == 'kb_entries':
+                stats.knowledge_base_entries = count
+            elif dimension == 'category':
+                stats.by_category[bucket or None] = count
+            elif dimension == 'priority':
+                stats.by_priority[int(bucket) if bucket else None] = count
+        return stats
 
     def get_knowledge_base_entries(self, category=None):
+        """
+        Knowledge base rows, optionally of one category. The shared database
+        serves them from the in-process snapshot (database/kb_cache.py)
+        instead of querying on every call.
+        """
+        # Imported here: kb_cache builds on this module
+        from database.kb_cache import kb_cache
+        if kb_cache.db is self:
+            return [asdict(entry) for entry in kb_cache.get_entries(category)]
+        return self._query_knowledge_base_entries(category)
+
+    @_timed_query
+    def _query_knowledge_base_entries(self, category=None):
         try:
-            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                if category:
-                    cur.execute("SELECT * FROM knowledge_base WHERE category = %s", (category,))
-                else:
-                    cur.execute("SELECT * FROM knowledge_base")
-                entries = cur.fetchall()
-                print(f"[DEBUG] Retrieved {len(entries)} knowledge base entries")
-                return entries
+            if category:
+                entries = self._read("SELECT * FROM knowledge_base WHERE category = %s", (category,),
+                                     cursor_factory=RealDictCursor)
+            else:
+                entries = self._read("SELECT * FROM knowledge_base", cursor_factory=RealDictCursor)
+            logger.debug("Retrieved %s knowledge base entries", len(entries))
+            return entries
+        except psycopg2.Error as e:
+            logger.warning("Error fetching knowledge base entries: %s", e)
+            raise
+
+    @_timed_query
+    def get_knowledge_base_changes(self, since=None):
+        """
+        Return knowledge base rows modified after `since`, or all rows when
+        `since` is None
+        """
+        try:
+            if since is None:
+                return self._read("SELECT * FROM knowledge_base", cursor_factory=RealDictCursor)
+            return self._read("SELECT * FROM knowledge_base WHERE updated_at > %s", (since,),
+                              cursor_factory=RealDictCursor)
+        except psycopg2.Error as e:
+            logger.warning("Error fetching knowledge base changes: %s", e)
+            raise
+
+    @_timed_query
+    def get_knowledge_base_state(self):
+        """
+        Return (row count, latest updated_at) as a cheap change check
+        """
+        try:
+            return self._read("SELECT count(*), max(updated_at) FROM knowledge_base")[0]
+        except psycopg2.Error as e:
+            logger.warning("Error fetching knowledge base state: %s", e)
+            raise
+
+    @_timed_query
+    def get_knowledge_base_ids(self):
+        try:
+            return {row[0] for row in self._read("SELECT id FROM knowledge_base")}
         except psycopg2.Error as e:
-            print(f"[DEBUG] Error fetching knowledge base entries: {str(e)}")
+            logger.warning("Error fetching knowledge base ids: %s", e)
             raise
 
 db = Database()
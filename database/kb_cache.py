@@ -0,0 +1,162 @@
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from database.db import db
+from models.ticket import KnowledgeBaseEntry
+
+logger = logging.getLogger(__name__)
+
+# Rows committed by slow transactions can carry an updated_at slightly older
+# than the newest row already seen, so each refresh re-reads this window
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+class KnowledgeBaseCache:
+    """
+    In-process snapshot of the knowledge base, indexed by id and by
+    category. Entries are loaded and validated once; later refreshes only
+    fetch rows whose updated_at is within REFRESH_OVERLAP of the newest row
+    seen, prune deleted ids and rebuild the category lists they touched.
+    Only the first lookup waits for the database; after that, lookups
+    return the current snapshot and a stale one is refreshed by a
+    background thread. A failed background refresh is logged and the
+    previous snapshot kept.
+    """
+
+    def __init__(self, database=db, refresh_interval: float = 30):
+        self.db = database
+        self.refresh_interval = refresh_interval
+        # (version, entries by id, entries by category), replaced as a whole
+        self._snapshot: Tuple[int, Dict[int, KnowledgeBaseEntry], Dict[str, List[KnowledgeBaseEntry]]] = (0, {}, {})
+        self._high_water = None
+        # Ids of every row seen, including ones whose content was invalid
+        self._ids = set()
+        self._state = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Apply changes made since the last refresh, waiting for the database.
+        Returns True if the snapshot changed.
+        """
+        with self._lock:
+            return self._refresh(force)
+
+    @property
+    def version(self) -> int:
+        return self._snapshot[0]
+
+    def _stale(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.refresh_interval
+
+    def _refresh(self, force: bool = False) -> bool:
+        if not force and not self._stale():
+            return False
+        self._checked_at = time.monotonic()
+
+        # Always re-read the overlap window: a late commit can leave count and
+        # max(updated_at) unchanged while still editing a row
+        state = self.db.get_knowledge_base_state()
+        count, _ = state
+
+        version, current, current_by_category = self._snapshot
+        entries = dict(current)
+        if self._high_water is None:
+            rows = self.db.get_knowledge_base_changes()
+            entries = {}
+            self._ids = set()
+        else:
+            rows = self.db.get_knowledge_base_changes(self._high_water - REFRESH_OVERLAP)
+
+        for row in rows:
+            if self._high_water is None or row['updated_at'] > self._high_water:
+                self._high_water = row['updated_at']
+            self._ids.add(row['id'])
+            entry = _to_entry(row)
+            if entry is None:
+                entries.pop(row['id'], None)
+            else:
+                entries[entry.id] = entry
+
+        # Deletions leave no row behind, so reconcile ids when counts disagree
+        if len(self._ids) != count:
+            live_ids = self.db.get_knowledge_base_ids()
+            self._ids &= live_ids
+            entries = {entry_id: entry for entry_id, entry in entries.items() if entry_id in live_ids}
+
+        self._state = state
+        if entries == current:
+            return False
+
+        # Only the categories of added, changed or removed entries are rebuilt
+        touched = {entry_id for entry_id in current.keys() | entries.keys()
+                   if current.get(entry_id) != entries.get(entry_id)}
+        categories = {entry.category for entry_id in touched
+                      for entry in (current.get(entry_id), entries.get(entry_id)) if entry is not None}
+        by_category = dict(current_by_category)
+        for category in categories:
+            members = [entry for entry in current_by_category.get(category, []) if entry.id not in touched]
+            members += [entries[entry_id] for entry_id in touched
+                        if entry_id in entries and entries[entry_id].category == category]
+            if members:
+                by_category[category] = members
+            else:
+                by_category.pop(category, None)
+
+        self._snapshot = (version + 1, entries, by_category)
+        logger.debug("Knowledge base snapshot v%s: %s entries (%s rows read)",
+                     version + 1, len(entries), len(rows))
+        return True
+
+    def _current(self):
+        """
+        The current snapshot, starting a background refresh when it is stale
+        """
+        if self._state is None:
+            # Nothing loaded yet, so there is nothing to serve without waiting
+            self.refresh()
+        elif self._stale() and self._lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh_in_background, name="kb-cache-refresh", daemon=True).start()
+        return self._snapshot
+
+    def _refresh_in_background(self):
+        # Runs holding the lock its starter acquired
+        try:
+            self._refresh()
+        except Exception as e:
+            logger.warning("Knowledge base refresh failed, keeping snapshot v%s: %s", self.version, e)
+        finally:
+            self._lock.release()
+
+    def snapshot(self) -> Tuple[int, Dict[int, KnowledgeBaseEntry]]:
+        """
+        Return (version, {entry id: entry}) for the current knowledge base
+        """
+        version, entries, _ = self._current()
+        return version, entries
+
+    def get_entries(self, category: Optional[str] = None) -> List[KnowledgeBaseEntry]:
+        _, entries, by_category = self._current()
+        if category:
+            return list(by_category.get(category, []))
+        return list(entries.values())
+
+    def get_entry(self, entry_id: int) -> Optional[KnowledgeBaseEntry]:
+        return self._current()[1].get(entry_id)
+
+def _to_entry(row) -> Optional[KnowledgeBaseEntry]:
+    if not row.get('content') or not isinstance(row['content'], str):
+        logger.warning("Invalid KB entry content: %s", row.get('id'))
+        return None
+    return KnowledgeBaseEntry(
+        title=row.get('title') or "",
+        content=row['content'],
+        category=row.get('category'),
+        tags=list(row.get('tags') or []),
+        id=row['id']
+    )
+
+kb_cache = KnowledgeBaseCache(refresh_interval=float(os.getenv("KB_CACHE_REFRESH_SECONDS", "30")))
@@ -0,0 +1,41 @@
+"""
+Create or upgrade the database schema:
+
+    python -m database.migrate
+
+The app no longer changes the schema on start-up, so run this once per
+deployment (and after upgrades) before starting it.
+
+Large deployments can partition tickets by month and expire old months,
+e.g. from a daily cron job:
+
+    python -m database.migrate --partition-tickets --retention-months 12 --archive-dir /var/archive/tickets --drop
+
+Every run also creates the partitions for the coming --months-ahead months;
+the application does the same before its first insert of each day.
+"""
+import argparse
+import logging
+from database.db import db
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or upgrade the database schema")
+    parser.add_argument("--partition-tickets", action="store_true",
+                        help="Partition the tickets table by month of created_at (converts it once)")
+    parser.add_argument("--months-ahead", type=int, default=3,
+                        help="Months of partitions to create ahead of the current one")
+    parser.add_argument("--retention-months", type=int,
+                        help="Detach partitions of tickets older than this many months")
+    parser.add_argument("--archive-dir", help="Write detached partitions to <dir>/<partition>.csv.gz")
+    parser.add_argument("--drop", action="store_true", help="Drop detached partitions instead of keeping them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level="INFO", format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    db.migrate(partition_tickets=args.partition_tickets, months_ahead=args.months_ahead)
+    print("Database schema is up to date")
+    if args.retention_months is not None:
+        expired = db.expire_ticket_partitions(args.retention_months, drop=args.drop, archive_dir=args.archive_dir)
+        print(f"Expired {len(expired)} ticket partitions: {', '.join(expired) or '-'}")
+
+if __name__ == "__main__":
+    main()
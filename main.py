@@ -1,33 +1,66 @@
+import logging
+import os
+import threading
 import streamlit as st
 import io
 from datetime import datetime
-from PIL import Image
-from agents.ticket_classification import TicketClassificationAgent
-from agents.priority_understanding import PriorityUnderstandingAgent
-from agents.language_semantics import LanguageSemanticsAgent
-from agents.knowledge_base import KnowledgeBaseAgent
-from agents.content_generation import ContentGenerationAgent
-from agents.intent_extraction import IntentExtractionAgent
-from agents.solution_recommendation import SolutionRecommendationAgent
-from agents.automated_resolution import AutomatedResolutionAgent
+from pipeline.ticket_pipeline import TicketPipeline
 from database.db import db
+from utils import metrics
 
-# Initialize agents
-tca = TicketClassificationAgent()
-pua = PriorityUnderstandingAgent()
-lsa = LanguageSemanticsAgent()
-kba = KnowledgeBaseAgent()
-cga = ContentGenerationAgent()
-iea = IntentExtractionAgent()
-ara = AutomatedResolutionAgent()
-sra = SolutionRecommendationAgent()
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+def _warm_up(pipeline: TicketPipeline):
+    try:
+        pipeline.warm_up()
+    except Exception:
+        logger.exception("Pipeline warm-up failed; agents will be built on first use")
+
+# Initialize agent pipeline once per server process; Streamlit reruns this
+# script on every interaction, and the near-duplicate index must persist.
+# Agents are built in the background so the page renders without waiting
+# for them (or for the database).
+@st.cache_resource
+def get_pipeline():
+    metrics.serve_from_env()
+    pipeline = TicketPipeline(database=db, warm_up=False)
+    threading.Thread(target=_warm_up, args=(pipeline,), name="pipeline-warm-up", daemon=True).start()
+    return pipeline
+
+pipeline = get_pipeline()
+
+# The aggregates are cheap to read, but there is no need to do it on every rerun
+@st.cache_data(ttl=15)
+def get_dashboard_stats():
+    return db.get_dashboard_stats(hours=24)
 
 st.title("AI Customer Support System")
 
 # Sidebar for system statistics
 st.sidebar.title("System Overview")
-st.sidebar.metric("Active Agents", "3")
-st.sidebar.metric("Knowledge Base Entries", "100+")
+st.sidebar.metric("Active Agents", len(pipeline.agents.built()))
+try:
+    stats = get_dashboard_stats()
+    st.sidebar.metric("Knowledge Base Entries", stats.knowledge_base_entries)
+    st.sidebar.metric("Total Tickets", stats.total)
+    st.sidebar.metric("Tickets (last 24h)", sum(count for _, count in stats.hourly))
+    if stats.by_category:
+        st.sidebar.subheader("Tickets by Category")
+        st.sidebar.bar_chart({"Tickets": {category or "Unclassified": count
+                                          for category, count in stats.by_category.items()}})
+    if stats.by_priority:
+        st.sidebar.subheader("Tickets by Priority")
+        st.sidebar.bar_chart({"Tickets": {str(priority or "Unset"): count
+                                          for priority, count in sorted(stats.by_priority.items(),
+                                                                        key=lambda item: item[0] or 0)}})
+    if stats.hourly:
+        st.sidebar.subheader("Tickets per Hour")
+        st.sidebar.line_chart({"Tickets": {hour: count for hour, count in stats.hourly}})
+except Exception as e:
+    logger.warning("Unable to load dashboard statistics: %s", e)
+    st.sidebar.warning("Statistics are currently unavailable")
 
 # Main ticket submission form
 st.header("Submit Support Ticket")
@@ -39,181 +72,195 @@ with st.form("ticket_form"):
 
 if submitted and title and description:
     with st.spinner("Processing ticket..."):
+        ticket_id = None
         try:
-            print("[DEBUG] Starting ticket processing pipeline...")
-            
-            # Step 1: Extract intent
-            print("[DEBUG] Extracting ticket intent...")
-            intent_info = iea.process(title, description)
-            print(f"[DEBUG] Intent analysis: {intent_info}")
-
-            # Step 2: Classify ticket
-            print("[DEBUG] Classifying ticket...")
-            category, initial_priority = tca.process(title, description)
-            print(f"[DEBUG] Ticket classified as {category} with initial priority {initial_priority}")
-            
-            # Step 3: Analyze language semantics
-            print("[DEBUG] Analyzing language semantics...")
-            semantics = lsa.process(title, description)
-            print(f"[DEBUG] Language analysis: {semantics}")
-            
-            # Step 3: Determine final priority and SLA
-            print("[DEBUG] Determining priority and SLA...")
-            priority_info = pua.process(title, description, initial_priority)
-            priority = priority_info['priority']
-            print(f"[DEBUG] Final priority: {priority}, SLA: {priority_info['sla_requirement']}")
-            
-            # Step 4: Search knowledge base
-            print("[DEBUG] Searching knowledge base...")
-            kb_solution = kba.process(title, description)
-            
-            # Validate knowledge base response
-            if kb_solution and isinstance(kb_solution, str) and len(kb_solution.strip()) > 0:
-                print("[DEBUG] Valid knowledge base solution found")
-            else:
-                print("[DEBUG] No valid knowledge base solution found")
-                kb_solution = None
-                
-            # Step 5: Get solution recommendations
-            print("[DEBUG] Generating solution recommendations...")
-            solution_info = sra.process(title, description, kb_solution, category)
-            print(f"[DEBUG] Solution recommendations: {solution_info}")
-            
-            # Step 6: Check for automation possibilities
-            print("[DEBUG] Checking automation possibilities...")
-            automation_info = ara.process(title, description, category, priority)
-            print(f"[DEBUG] Automation analysis: {automation_info}")
-            
-            # Step 7: Generate response
-            print("[DEBUG] Generating response...")
-            response = cga.process(title, description, kb_solution)
+            results = pipeline.process(title, description, stream_response=True)
+            intent_info = results['intent_info']
+            category = results['category']
+            semantics = results['semantics']
+            priority_info = results['priority_info']
+            priority = results['priority']
+            kb_solution = results['kb_solution']
+            solution_info = results['solution_info']
+            automation_info = results['automation_info']
+            logger.debug("Ticket classified as %s with priority %s, SLA: %s",
+                         category, priority, priority_info['sla_requirement'])
             
             # Save ticket to database
-            print("[DEBUG] Saving ticket to database...")
-            ticket_id = db.save_ticket(title, description, category, priority)
+            logger.debug("Saving ticket to database...")
+            ticket_id = db.save_ticket(title, description, category, priority, intent_info['primary_intent'],
+                                       cluster_id=results['cluster_id'],
+                                       training_labels=results['training_labels'])
+            pipeline.link_ticket(title, description, ticket_id, results)
             
             # Display results
             st.success(f"Ticket processed successfully! ID: {ticket_id}")
-            print(f"[DEBUG] Ticket processing completed for ID: {ticket_id}")
+            if results['reused_analysis']:
+                representative = results['cluster_id'] or "that is still being saved"
+                st.info(f"Near-duplicate of ticket {representative} "
+                        f"({results['similarity']:.0%} similar); its analysis was reused")
+            if results['degraded']:
+                st.warning("Some results could not be computed and show default values: "
+                           f"{', '.join(results['degraded'])}")
+            logger.debug("Ticket processing completed for ID: %s", ticket_id)
         
         except Exception as e:
             error_message = f"An error occurred while processing the ticket: {str(e)}"
-            print(f"[DEBUG] Error: {error_message}")
+            logger.exception("Error processing ticket")
             st.error(error_message)
         
-        col1, col2, col3, col4, col5, col6 = st.columns(6)
-        with col1:
-            st.subheader("Ticket Classification")
-            st.write(f"Category: {category}")
-            st.write(f"Priority: {priority}")
-            st.write(f"SLA: {priority_info['sla_requirement']}")
+        # Nothing to show when processing or saving failed; the error is already displayed
+        if ticket_id is not None:
+            col1, col2, col3, col4, col5, col6 = st.columns(6)
+            with col1:
+                st.subheader("Ticket Classification")
+                st.write(f"Category: {category}")
+                st.write(f"Priority: {priority}")
+                st.write(f"SLA: {priority_info['sla_requirement']}")
         
-        with col2:
-            st.subheader("Language Analysis")
-            st.write(f"Sentiment: {semantics['sentiment']}")
-            st.write(f"Urgency: {semantics['urgency']}")
-            st.write("Key Phrases:", ", ".join(semantics['key_phrases']))
+            with col2:
+                st.subheader("Language Analysis")
+                st.write(f"Sentiment: {semantics['sentiment']}")
+                st.write(f"Urgency: {semantics['urgency']}")
+                st.write("Key Phrases:", ", ".join(semantics['key_phrases']))
         
-        with col3:
-            st.subheader("Intent Analysis")
-            st.write(f"Primary Intent: {intent_info['primary_intent']}")
-            st.write("Secondary Intents:", ", ".join(intent_info['secondary_intents']))
-            st.write("Required Actions:", ", ".join(intent_info['required_actions']))
-            st.write(f"Routing: {intent_info['routing']}")
-
-        with col4:
-            st.subheader("Solution Recommendations")
-            st.write(f"Primary Solution: {solution_info['primary_solution']}")
-            st.write("Alternative Approaches:", ", ".join(solution_info['alternative_approaches']))
-            st.write(f"Est. Resolution Time: {solution_info['estimated_resolution_time']} mins")
-            st.write(f"Confidence Level: {solution_info['confidence_level']}%")
-
-        with col5:
-            st.subheader("Automation Analysis")
-            st.write(f"Can Automate: {'Yes' if automation_info['can_automate'] else 'No'}")
-            if automation_info['can_automate']:
-                st.write("Steps:", ", ".join(automation_info['automation_steps']))
-                st.write(f"Success Probability: {automation_info['success_probability']}%")
-                st.write("Required APIs:", ", ".join(automation_info['required_apis']))
-
-        with col6:
-            st.subheader("Knowledge Base Match")
-            if kb_solution:
-                st.write(kb_solution)
-            else:
-                st.write("No direct knowledge base match found.")
+            with col3:
+                st.subheader("Intent Analysis")
+                st.write(f"Primary Intent: {intent_info['primary_intent']}")
+                st.write("Secondary Intents:", ", ".join(intent_info['secondary_intents']))
+                st.write("Required Actions:", ", ".join(intent_info['required_actions']))
+                st.write(f"Routing: {intent_info['routing']}")
+
+            with col4:
+                st.subheader("Solution Recommendations")
+                st.write(f"Primary Solution: {solution_info['primary_solution']}")
+                st.write("Alternative Approaches:", ", ".join(solution_info['alternative_approaches']))
+                st.write(f"Est. Resolution Time: {solution_info['estimated_resolution_time']} mins")
+                st.write(f"Confidence Level: {solution_info['confidence_level']}%")
+
+            with col5:
+                st.subheader("Automation Analysis")
+                st.write(f"Can Automate: {'Yes' if automation_info['can_automate'] else 'No'}")
+                if automation_info['can_automate']:
+                    st.write("Steps:", ", ".join(automation_info['automation_steps']))
+                    st.write(f"Success Probability: {automation_info['success_probability']}%")
+                    st.write("Required APIs:", ", ".join(automation_info['required_apis']))
+
+            with col6:
+                st.subheader("Knowledge Base Match")
+                if kb_solution:
+                    st.write(kb_solution)
+                else:
+                    st.write("No direct knowledge base match found.")
         
-        st.subheader("Generated Response")
-        st.write(response)
+            st.subheader("Generated Response")
+            # Render the response as it is generated; the pipeline fills in results['response']
+            st.write_stream(results['response_stream'])
+            # Only now are the results complete
+            pipeline.save_analysis(ticket_id, results)
         
-        # Add screenshot functionality
-        try:
-            # Create a timestamp for the filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"ticket_{ticket_id}_{timestamp}.png"
+            # Add screenshot functionality
+            try:
+                # Create a timestamp for the filename
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                filename = f"ticket_{ticket_id}_{timestamp}.png"
             
-            with st.spinner("Preparing screenshot..."):
-                # Create an image with white background
-                width, height = 800, 600
-                img = Image.new('RGB', (width, height), 'white')
-                
-                # Setup for drawing text
-                from PIL import ImageDraw, ImageFont
-                draw = ImageDraw.Draw(img)
-                font = ImageFont.load_default()
+                with st.spinner("Preparing screenshot..."):
+                    # PIL is only imported once a screenshot is actually rendered
+                    from PIL import Image, ImageDraw, ImageFont
+
+                    # Create an image with white background
+                    width, height = 800, 600
+                    img = Image.new('RGB', (width, height), 'white')
                 
-                # Draw ticket information with improved layout
-                y_position = 40
-                padding = 40
-                line_height = 25
+                    # Setup for drawing text
+                    draw = ImageDraw.Draw(img)
+                    font = ImageFont.load_default()
                 
-                # Draw header
-                draw.text((width//2, 20), "Support Ticket Details", fill='black', font=font, anchor="mt")
+                    # Draw ticket information with improved layout
+                    y_position = 40
+                    padding = 40
+                    line_height = 25
                 
-                # Draw title
-                draw.text((padding, y_position), f"Ticket ID: {ticket_id}", fill='black', font=font)
-                y_position += line_height
+                    # Draw header
+                    draw.text((width//2, 20), "Support Ticket Details", fill='black', font=font, anchor="mt")
                 
-                draw.text((padding, y_position), f"Title: {title}", fill='black', font=font)
-                y_position += line_height
+                    # Draw title
+                    draw.text((padding, y_position), f"Ticket ID: {ticket_id}", fill='black', font=font)
+                    y_position += line_height
                 
-                draw.text((padding, y_position), f"Category: {category}", fill='black', font=font)
-                y_position += line_height
+                    draw.text((padding, y_position), f"Title: {title}", fill='black', font=font)
+                    y_position += line_height
                 
-                draw.text((padding, y_position), f"Priority: {priority}", fill='black', font=font)
-                y_position += line_height
+                    draw.text((padding, y_position), f"Category: {category}", fill='black', font=font)
+                    y_position += line_height
                 
-                # Draw description with word wrap
-                description_lines = [description[i:i+60] for i in range(0, len(description), 60)]
-                draw.text((padding, y_position), "Description:", fill='black', font=font)
-                y_position += line_height
+                    draw.text((padding, y_position), f"Priority: {priority}", fill='black', font=font)
+                    y_position += line_height
                 
-                for line in description_lines:
-                    draw.text((padding, y_position), line, fill='black', font=font)
+                    # Draw description with word wrap
+                    description_lines = [description[i:i+60] for i in range(0, len(description), 60)]
+                    draw.text((padding, y_position), "Description:", fill='black', font=font)
                     y_position += line_height
                 
-                # Convert image to bytes for download
-                img_buffer = io.BytesIO()
-                img.save(img_buffer, format='PNG')
-                img_bytes = img_buffer.getvalue()
+                    for line in description_lines:
+                        draw.text((padding, y_position), line, fill='black', font=font)
+                        y_position += line_height
                 
-                # Add download button
-                st.download_button(
-                    label="Download Ticket Screenshot",
-                    data=img_bytes,
-                    file_name=filename,
-                    mime="image/png"
-                )
-        except Exception as e:
-            error_message = f"Unable to generate screenshot: {str(e)}"
-            print(f"[DEBUG] Screenshot error: {error_message}")
-            st.warning("Screenshot functionality is currently unavailable")
+                    # Convert image to bytes for download
+                    img_buffer = io.BytesIO()
+                    img.save(img_buffer, format='PNG')
+                    img_bytes = img_buffer.getvalue()
+                
+                    # Add download button
+                    st.download_button(
+                        label="Download Ticket Screenshot",
+                        data=img_bytes,
+                        file_name=filename,
+                        mime="image/png"
+                    )
+            except Exception as e:
+                error_message = f"Unable to generate screenshot: {str(e)}"
+                logger.warning("Screenshot error: %s", error_message)
+                st.warning("Screenshot functionality is currently unavailable")
+
+# Recent tickets, newest first. Pages are fetched by keyset cursor; the
+# cursors of the pages seen so far are kept to be able to go back.
+RECENT_PAGE_SIZE = 20
 
-# Display sample tickets (for demonstration)
 st.header("Recent Tickets")
-st.dataframe({
-    "ID": [1, 2, 3],
-    "Title": ["Login Issue", "Billing Question", "Feature Request"],
-    "Category": ["Technical Issue", "Billing", "Feature Request"],
-    "Priority": ["High", "Medium", "Low"]
-})
+if 'ticket_cursors' not in st.session_state:
+    st.session_state.ticket_cursors = [None]
+
+def _newer_tickets():
+    st.session_state.ticket_cursors.pop()
+
+def _older_tickets(cursor):
+    st.session_state.ticket_cursors.append(cursor)
+
+try:
+    page = db.get_recent_tickets(limit=RECENT_PAGE_SIZE, cursor=st.session_state.ticket_cursors[-1])
+    st.dataframe({
+        "ID": [t['id'] for t in page.tickets],
+        "Title": [t['title'] for t in page.tickets],
+        "Category": [t['category'] for t in page.tickets],
+        "Priority": [t['priority'] for t in page.tickets],
+        "Created": [t['created_at'] for t in page.tickets]
+    }, hide_index=True)
+    newer, older = st.columns(2)
+    newer.button("Newer", on_click=_newer_tickets, disabled=len(st.session_state.ticket_cursors) == 1)
+    older.button("Older", on_click=_older_tickets, args=(page.next_cursor,), disabled=page.next_cursor is None)
+
+    # Show what the pipeline produced for a ticket without running it again
+    selected = st.selectbox("Stored analysis", [None] + [t['id'] for t in page.tickets],
+                            format_func=lambda i: "Select a ticket" if i is None else f"Ticket {i}")
+    if selected is not None:
+        stored = pipeline.analysis_store.get(selected, prompt_version=None)
+        if stored is None:
+            st.info("No stored analysis for this ticket")
+        else:
+            st.caption(f"Analyzed {stored.created_at:%Y-%m-%d %H:%M} with prompt version {stored.prompt_version}")
+            st.json(stored.analysis)
+except Exception as e:
+    logger.warning("Unable to load recent tickets: %s", e)
+    st.warning("Recent tickets are currently unavailable")
@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional
 
 @dataclass
 class Ticket:
@@ -8,8 +8,12 @@ class Ticket:
     description: str
     category: Optional[str] = None
     priority: Optional[int] = None
-    created_at: datetime = datetime.now()
+    created_at: datetime = field(default_factory=datetime.now)
     id: Optional[int] = None
+    intent: Optional[str] = None
+    cluster_id: Optional[int] = None
+    # Labels the LLM assigned (category, priority, intent), for training the local classifiers
+    training_labels: Optional[Dict[str, Any]] = None
 
 @dataclass
 class KnowledgeBaseEntry:
@@ -18,3 +22,12 @@ class KnowledgeBaseEntry:
     category: str
     tags: list[str]
     id: Optional[int] = None
+
+@dataclass
+class TicketAnalysis:
+    ticket_id: int
+    analysis: Dict[str, Any]          # complete pipeline results
+    prompt_version: str
+    models: Dict[str, str] = field(default_factory=dict)     # agent -> model
+    timings: Dict[str, float] = field(default_factory=dict)  # pipeline stage -> seconds
+    created_at: datetime = field(default_factory=datetime.now)
@@ -0,0 +1,169 @@
+import hashlib
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from utils.minhash import LSHIndex, MinHasher
+from utils.text_processing import preprocess_text
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ClusterEntry:
+    """
+    Representative ticket of a near-duplicate cluster. analysis holds the
+    pipeline results once known; entries loaded from the database start
+    without one. deadline is the time.monotonic() value by which a pending
+    representative's analysis ends, if it has a budget.
+    """
+    key: int
+    ticket_id: Optional[int] = None
+    analysis: Optional[Dict[str, Any]] = None
+    deadline: Optional[float] = None
+    ready: threading.Event = field(default_factory=threading.Event)
+    # Ids of near-duplicates saved before the representative had an id
+    unlinked: List[int] = field(default_factory=list)
+
+    def resolve(self, analysis: Optional[Dict[str, Any]]):
+        if analysis is not None and self.analysis is None:
+            self.analysis = analysis
+        self.ready.set()
+
+class DuplicateIndex:
+    """
+    In-memory MinHash/LSH index over the most recent cluster representatives.
+    A new ticket whose estimated similarity to a representative reaches
+    threshold joins that cluster instead of starting a new one.
+    """
+
+    def __init__(self, threshold: float = 0.8, max_entries: int = 5000, num_perm: int = 64, bands: int = 16):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.lsh = LSHIndex(num_perm=num_perm, bands=bands)
+        self._entries: "OrderedDict[int, ClusterEntry]" = OrderedDict()
+        self._by_text: Dict[str, ClusterEntry] = {}
+        self._text_keys: Dict[int, str] = {}
+        # Text key -> clusters of near-duplicates processed before their representative was saved
+        self._awaiting: "OrderedDict[str, List[ClusterEntry]]" = OrderedDict()
+        self._keys = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def rebuild(self, tickets):
+        """
+        Load representatives from stored tickets (mappings with id, title and
+        description), oldest first so the newest are kept
+        """
+        count = 0
+        for ticket in sorted(tickets, key=lambda t: t['id']):
+            entry = self.add(ticket['title'], ticket['description'], ticket_id=ticket['id'])
+            entry.ready.set()
+            count += 1
+        logger.debug("Near-duplicate index rebuilt with %s clusters from %s tickets", len(self), count)
+
+    def find_or_add(self, title: str, description: str,
+                    deadline: Optional[float] = None) -> Tuple[ClusterEntry, Optional[float]]:
+        """
+        Return (representative, similarity) when the ticket is a near-duplicate,
+        otherwise register it as a new pending representative, due by
+        deadline, and return (its entry, None). Call resolve() on a new entry
+        once it is analyzed.
+        """
+        signature = self.hasher.signature(f"{title} {description}")
+        with self._lock:
+            matches = self.lsh.query(signature, self.threshold)
+            if matches:
+                key, score = matches[0]
+                return self._entries[key], score
+            entry = self._add(title, description, signature, None)
+            entry.deadline = deadline
+            return entry, None
+
+    def add(self, title: str, description: str, ticket_id: Optional[int] = None) -> ClusterEntry:
+        signature = self.hasher.signature(f"{title} {description}")
+        with self._lock:
+            return self._add(title, description, signature, ticket_id)
+
+    def _add(self, title, description, signature, ticket_id) -> ClusterEntry:
+        text_key = _text_key(title, description)
+        entry = ClusterEntry(next(self._keys), ticket_id)
+        self._entries[entry.key] = entry
+        self._by_text[text_key] = entry
+        self._text_keys[entry.key] = text_key
+        self.lsh.add(entry.key, signature)
+        while len(self._entries) > self.max_entries:
+            self._evict()
+        return entry
+
+    def link_ticket(self, title: str, description: str, ticket_id: int) -> List[int]:
+        """
+        Record the database id of a representative added before it was saved.
+        Returns the ids of its near-duplicates saved in the meantime, which
+        still need it as their cluster id.
+        """
+        with self._lock:
+            entry = self._by_text.get(_text_key(title, description))
+            if entry is None or entry.ticket_id is not None:
+                return []
+            entry.ticket_id = ticket_id
+            unlinked, entry.unlinked = entry.unlinked, []
+            return unlinked
+
+    def expect_link(self, title: str, description: str, entry: ClusterEntry):
+        """
+        Note a near-duplicate of a representative that has no id yet, so
+        link_duplicate() can find its cluster once it is saved
+        """
+        text_key = _text_key(title, description)
+        with self._lock:
+            self._awaiting.setdefault(text_key, []).append(entry)
+            self._awaiting.move_to_end(text_key)
+            while len(self._awaiting) > self.max_entries:
+                self._awaiting.popitem(last=False)
+
+    def link_duplicate(self, title: str, description: str, ticket_id: int) -> Optional[int]:
+        """
+        Record the database id of a near-duplicate noted with expect_link().
+        Returns its cluster id if the representative has been saved since;
+        otherwise the representative's link_ticket() returns it.
+        """
+        text_key = _text_key(title, description)
+        with self._lock:
+            entries = self._awaiting.get(text_key)
+            if not entries:
+                return None
+            entry = entries.pop(0)
+            if not entries:
+                del self._awaiting[text_key]
+            if entry.ticket_id is None:
+                entry.unlinked.append(ticket_id)
+            return entry.ticket_id
+
+    def remove(self, entry: ClusterEntry):
+        """
+        Drop a representative whose analysis failed, releasing any waiters
+        """
+        with self._lock:
+            if self._entries.pop(entry.key, None) is not None:
+                self._forget(entry.key)
+        entry.ready.set()
+
+    def _evict(self):
+        key, entry = self._entries.popitem(last=False)
+        self._forget(key)
+        entry.ready.set()
+
+    def _forget(self, key: int):
+        self.lsh.remove(key)
+        text_key = self._text_keys.pop(key, None)
+        entry = self._by_text.get(text_key)
+        if entry is not None and entry.key == key:
+            del self._by_text[text_key]
+
+def _text_key(title: str, description: str) -> str:
+    return hashlib.sha1(preprocess_text(f"{title} {description}").encode("utf-8")).hexdigest()
@@ -0,0 +1,172 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from utils import metrics
+from utils.deadline import deadline_at
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = metrics.histogram("pipeline_stage_seconds", "Run time of pipeline stages", ["stage"])
+STAGE_FALLBACKS = metrics.counter("pipeline_stage_fallbacks_total",
+                                  "Stages answered by their fallback after running out of time", ["stage"])
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[Dict[str, Any]], Any]
+    deps: Tuple[str, ...] = ()
+    # Seconds the stage may run before its fallback result is used instead
+    timeout: Optional[float] = None
+    fallback: Optional[Callable[[Dict[str, Any]], Any]] = None
+
+@dataclass
+class _StageRun:
+    stage: Stage
+    context: Dict[str, Any]
+    budget_deadline: Optional[float]
+    # time.monotonic() when a worker picked the stage up; its own timeout starts then
+    started: Optional[float] = None
+
+    @property
+    def deadline(self) -> Optional[float]:
+        if self.stage.fallback is None:
+            return None
+        timeout = self.stage.timeout
+        return _earliest(self.budget_deadline, self.started is not None and timeout and self.started + timeout)
+
+    def next_check(self, now: float) -> Optional[float]:
+        """
+        Earliest time the stage can miss its deadline; a queued stage's
+        timeout could start right away
+        """
+        if self.started is None and self.stage.fallback is not None and self.stage.timeout:
+            return _earliest(self.budget_deadline, now + self.stage.timeout)
+        return self.deadline
+
+class PipelineExecutor:
+    """
+    Runs a set of stages as a dependency graph, starting each stage as soon
+    as all of its dependencies have produced a result.
+
+    A stage with a fallback that outlives its own timeout or the run's
+    overall budget is abandoned and its fallback result used instead. A
+    stage's timeout counts from when a worker starts it, so time spent
+    queued behind other runs in the shared pool only counts against the
+    budget. The thread cannot be killed, but LLM calls made under the stage
+    deadline give up on their own.
+    """
+
+    def __init__(self, stages: List[Stage], max_workers: Optional[int] = None,
+                 budget: Optional[float] = None):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate pipeline stage: {stage.name}")
+            self.stages[stage.name] = stage
+        self._validate()
+        self.budget = budget
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers or len(self.stages),
+            thread_name_prefix="pipeline"
+        )
+
+    def _validate(self):
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+            if stage.timeout is not None and stage.fallback is None:
+                raise ValueError(f"Stage '{stage.name}' has a timeout but no fallback")
+
+        # Kahn's algorithm: every stage must become runnable at some point
+        remaining = {name: set(stage.deps) for name, stage in self.stages.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Pipeline has a dependency cycle between: {', '.join(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def run(self, skip: Iterable[str] = (), timings: Optional[Dict[str, float]] = None,
+            given: Optional[Dict[str, Any]] = None, **inputs) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Execute all stages except those in skip and return (results keyed by
+        stage name, names of stages that fell back after missing their
+        deadline). Each stage function receives a dict with the pipeline
+        inputs and the results of the stages it depends on. Stages whose
+        results are already known can be passed in given (keyed by stage
+        name) and are not run. If timings is given, it receives the run time
+        in seconds of every stage that completed.
+        """
+        results: Dict[str, Any] = dict(given or {})
+        degraded: List[str] = []
+        pending = {name: stage for name, stage in self.stages.items() if name not in skip and name not in results}
+        for stage in pending.values():
+            missing = [dep for dep in stage.deps if dep not in pending and dep not in results]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on skipped stages: {', '.join(missing)}")
+        running = {}
+        started = time.monotonic()
+        budget_deadline = started + self.budget if self.budget is not None else None
+
+        try:
+            while pending or running:
+                for name in [n for n, s in pending.items() if all(d in results for d in s.deps)]:
+                    stage = pending.pop(name)
+                    context = dict(inputs)
+                    context.update({dep: results[dep] for dep in stage.deps})
+                    run = _StageRun(stage, context, budget_deadline)
+                    if run.deadline is not None and run.deadline <= time.monotonic():
+                        logger.debug("No time left for stage '%s', using its fallback", name)
+                        STAGE_FALLBACKS.inc(stage=name)
+                        results[name] = stage.fallback(context)
+                        degraded.append(name)
+                        continue
+                    running[self.pool.submit(_run_stage, run)] = run
+
+                if not running:
+                    continue
+                now = time.monotonic()
+                checks = [check for check in (run.next_check(now) for run in running.values()) if check is not None]
+                timeout = max(0.0, min(checks) - now) if checks else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future).stage.name
+                    results[name], elapsed = future.result()
+                    if timings is not None:
+                        timings[name] = round(elapsed, 4)
+
+                now = time.monotonic()
+                for future, run in list(running.items()):
+                    if run.deadline is not None and run.deadline <= now:
+                        name = run.stage.name
+                        logger.debug("Stage '%s' missed its deadline, using its fallback", name)
+                        STAGE_FALLBACKS.inc(stage=name)
+                        del running[future]
+                        future.cancel()
+                        results[name] = run.stage.fallback(run.context)
+                        degraded.append(name)
+        except Exception:
+            for future in running:
+                future.cancel()
+            raise
+
+        return results, degraded
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+def _run_stage(run: _StageRun):
+    started = time.perf_counter()
+    run.started = time.monotonic()
+    with deadline_at(run.deadline), STAGE_SECONDS.time(stage=run.stage.name):
+        result = run.stage.func(run.context)
+    return result, time.perf_counter() - started
+
+def _earliest(*deadlines):
+    deadlines = [d for d in deadlines if d]
+    return min(deadlines) if deadlines else None
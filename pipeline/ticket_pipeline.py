@@ -0,0 +1,465 @@
+import copy
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from agents.fast_path import track_llm_labels
+from agents.registry import AgentRegistry
+from database.analysis_store import AnalysisStore
+from models.ticket import TicketAnalysis
+from pipeline.dedup import ClusterEntry, DuplicateIndex
+from pipeline.executor import PipelineExecutor, Stage
+from services.generation_profiles import PROMPT_VERSION, get_profile
+from services.groq_service import track_failures
+from utils.deadline import deadline_at
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+TICKET_SECONDS = metrics.histogram("pipeline_ticket_seconds", "End-to-end analysis time of a ticket")
+TICKETS = metrics.counter("pipeline_tickets_total", "Tickets processed, by whether the analysis was reused",
+                          ["path"])
+
+class TicketPipeline:
+    """
+    Ticket processing pipeline. Intent, classification, language semantics
+    and knowledge base search only need the ticket text and run in parallel;
+    the remaining agents start as soon as the results they need are ready.
+
+    With fused_analysis enabled, classification, intent, semantics and
+    priority come from a single structured LLM request instead of four.
+
+    Every agent stage gets stage_timeout seconds (overridable per stage via
+    stage_timeouts) and the whole ticket gets budget seconds. A stage that
+    runs out of time, or whose LLM calls fail, contributes its agent's
+    default or local result, and the fields affected are listed under
+    'degraded' in the results.
+
+    With near_duplicates enabled, a ticket that closely matches a recent
+    cluster representative reuses that ticket's analysis without calling
+    the analysis agents, and its results carry the cluster_id (the
+    representative's ticket id) to save with it. While the representative
+    is not saved yet, cluster_id is None and link_ticket() sets it later.
+    The reply is never reused; it is always generated for the ticket at
+    hand. Only an analysis without degraded fields is shared: otherwise
+    the next near-duplicate is analyzed in full and its analysis is shared
+    instead. Pass the database to seed the index from recently stored
+    tickets.
+
+    save_analysis() hands a saved ticket's complete results to the analysis
+    store (write-behind, by default on the pipeline's database). Near-
+    duplicates of representatives loaded from the database reuse their
+    stored analysis when it was produced with the current PROMPT_VERSION.
+    results['timings'] has the run time of each stage of an analyzed ticket.
+    results['training_labels'] has the labels the LLM assigned to it, to be
+    saved with the ticket for training the local classifiers.
+
+    Agents are built on first use through the registry. warm_up() builds
+    them and seeds the near-duplicate index ahead of the first ticket; it
+    runs in the constructor unless warm_up=False, which lets a caller start
+    it in the background instead.
+    """
+
+    tca = property(lambda self: self.agents.get('ticket_classification'))
+    iea = property(lambda self: self.agents.get('intent_extraction'))
+    lsa = property(lambda self: self.agents.get('language_semantics'))
+    pua = property(lambda self: self.agents.get('priority_understanding'))
+    kba = property(lambda self: self.agents.get('knowledge_base'))
+    sra = property(lambda self: self.agents.get('solution_recommendation'))
+    ara = property(lambda self: self.agents.get('automated_resolution'))
+    cga = property(lambda self: self.agents.get('content_generation'))
+    faa = property(lambda self: self.agents.get('fused_analysis'))
+
+    def __init__(self, max_workers: int = 8, fused_analysis: bool = None,
+                 stage_timeout: Optional[float] = None, budget: Optional[float] = None,
+                 stage_timeouts: Optional[Dict[str, float]] = None, near_duplicates: bool = None,
+                 database=None, agents: Optional[AgentRegistry] = None, warm_up: bool = True,
+                 analysis_store: Optional[AnalysisStore] = None):
+        if fused_analysis is None:
+            fused_analysis = os.getenv("FUSED_ANALYSIS", "").lower() in ("1", "true", "yes")
+        self.fused_analysis = fused_analysis
+        if stage_timeout is None:
+            stage_timeout = float(os.getenv("PIPELINE_STAGE_TIMEOUT", "20"))
+        if budget is None:
+            budget = float(os.getenv("PIPELINE_BUDGET", "45"))
+        stage_timeouts = stage_timeouts or {}
+        if near_duplicates is None:
+            near_duplicates = os.getenv("NEAR_DUPLICATES", "1").lower() in ("1", "true", "yes")
+        self.agents = agents or AgentRegistry()
+        self.database = database
+        if analysis_store is None and database is not None:
+            analysis_store = AnalysisStore(database)
+        self.analysis_store = analysis_store
+        self.dedup = None
+        if near_duplicates:
+            self.dedup = DuplicateIndex(
+                threshold=float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8")),
+                max_entries=int(os.getenv("NEAR_DUPLICATE_WINDOW", "5000"))
+            )
+        self._seeded = False
+        self._warm_up_lock = threading.Lock()
+
+        def timed(name, func, fallback, deps=()):
+            return Stage(name, _tracked(name, func), deps=deps,
+                         timeout=stage_timeouts.get(name, stage_timeout), fallback=fallback)
+
+        if fused_analysis:
+            analysis_stages = [
+                timed("analysis", self._fused_analysis, lambda ctx: self.faa.fan_out({})),
+                Stage("intent_info", _fused_field("intent_info"), deps=("analysis",)),
+                Stage("classification", _fused_field("classification"), deps=("analysis",)),
+                Stage("semantics", _fused_field("semantics"), deps=("analysis",)),
+                Stage("priority_info", _fused_field("priority_info"), deps=("analysis",)),
+            ]
+        else:
+            analysis_stages = [
+                timed("intent_info", self._intent, lambda ctx: self.iea.default_result()),
+                timed("classification", self._classification, lambda ctx: self.tca.default_result()),
+                timed("semantics", self._semantics, lambda ctx: self.lsa.default_result()),
+                timed("priority_info", self._priority, self._priority_fallback, deps=("classification",)),
+            ]
+
+        self.executor = PipelineExecutor(analysis_stages + [
+            timed("kb_solution", self._kb_solution, lambda ctx: self.kba.default_result()),
+            timed("solution_info", self._solution, lambda ctx: self.sra.default_result(),
+                  deps=("classification", "kb_solution")),
+            timed("automation_info", self._automation, lambda ctx: self.ara.default_result(),
+                  deps=("classification", "priority_info")),
+            timed("response", self._response, lambda ctx: self.cga.default_result(), deps=("kb_solution",)),
+        ], max_workers=max_workers, budget=budget)
+        if warm_up:
+            self.warm_up()
+
+    def warm_up(self):
+        """
+        Seed the near-duplicate index from the database and build every agent
+        the pipeline uses. Safe to call more than once and concurrently with
+        process().
+        """
+        with self._warm_up_lock:
+            if self.dedup is not None and self.database is not None and not self._seeded:
+                self.dedup.rebuild(self.database.get_cluster_representatives(self.dedup.max_entries))
+            self._seeded = True
+        self.agents.warm_up(self._agent_names())
+
+    def _agent_names(self):
+        names = ['knowledge_base', 'solution_recommendation', 'automated_resolution', 'content_generation']
+        if self.fused_analysis:
+            names.append('fused_analysis')
+        else:
+            names += ['ticket_classification', 'intent_extraction', 'language_semantics', 'priority_understanding']
+        return names
+
+    def _fused_analysis(self, ctx):
+        return self.faa.process(ctx['title'], ctx['description'])
+
+    def _intent(self, ctx):
+        return self.iea.process(ctx['title'], ctx['description'])
+
+    def _classification(self, ctx):
+        return self.tca.process(ctx['title'], ctx['description'])
+
+    def _semantics(self, ctx):
+        return self.lsa.process(ctx['title'], ctx['description'])
+
+    def _kb_solution(self, ctx):
+        kb_solution = self.kba.process(ctx['title'], ctx['description'])
+
+        # Validate knowledge base response
+        if kb_solution and isinstance(kb_solution, str) and len(kb_solution.strip()) > 0:
+            logger.debug("Valid knowledge base solution found")
+            return kb_solution
+        logger.debug("No valid knowledge base solution found")
+        return None
+
+    def _priority(self, ctx):
+        _, initial_priority = ctx['classification']
+        return self.pua.process(ctx['title'], ctx['description'], initial_priority)
+
+    def _priority_fallback(self, ctx):
+        _, initial_priority = ctx['classification']
+        return self.pua.default_result(initial_priority)
+
+    def _solution(self, ctx):
+        category, _ = ctx['classification']
+        return self.sra.process(ctx['title'], ctx['description'], ctx['kb_solution'], category)
+
+    def _automation(self, ctx):
+        category, _ = ctx['classification']
+        priority = ctx['priority_info']['priority']
+        return self.ara.process(ctx['title'], ctx['description'], category, priority)
+
+    def _response(self, ctx):
+        return self.cga.process(ctx['title'], ctx['description'], ctx['kb_solution'])
+
+    def classify_batch(self, tickets: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Classify and extract the intent of many (title, description) tickets
+        with a few batched LLM requests instead of two per ticket. Returns
+        the stage results of each ticket to pass to process() as given;
+        whatever the batch could not answer is left to the ticket's own
+        stages. Nothing is batched with fused_analysis, which already covers
+        both in one request per ticket. Labels the LLM assigned are noted
+        under 'llm_labels' so they can become training labels.
+        """
+        given = [{} for _ in tickets]
+        if self.fused_analysis or not tickets:
+            return given
+        for stage, agent in (('classification', self.tca), ('intent_info', self.iea)):
+            with track_llm_labels() as labels:
+                answers = agent.process_batch(tickets, fallback=False)
+            for results, answer in zip(given, answers):
+                if answer is not None:
+                    results[stage] = answer
+            for name, i in labels:
+                given[i].setdefault('llm_labels', set()).add(name)
+        return given
+
+    def process(self, title: str, description: str, stream_response: bool = False,
+                given: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Analyze a ticket. Stage results already known, such as those from
+        classify_batch(), can be passed in given and are not recomputed.
+        With stream_response the response is not generated up front:
+        results['response'] starts as None and results['response_stream']
+        yields the text as it is generated, filling in results['response']
+        once it completes. Either way the response gets the response
+        stage's timeout, within the ticket's budget.
+        """
+        started = time.monotonic()
+        skip = ("response",) if stream_response else ()
+        entry = results = None
+        if self.dedup is not None:
+            deadline = started + self.executor.budget if self.executor.budget is not None else None
+            entry, similarity = self.dedup.find_or_add(title, description, deadline)
+            if similarity is not None:
+                results = self._reuse(entry, similarity, deadline)
+
+        if results is None:
+            try:
+                results = self._analyze(title, description, skip, given)
+            except Exception:
+                if entry is not None and similarity is None:
+                    self.dedup.remove(entry)
+                raise
+            if entry is not None:
+                # A partial analysis is not shared; the next near-duplicate analyzes itself instead
+                entry.resolve(_reusable(results) if _complete(results) else None)
+                if similarity is not None:
+                    results.update(cluster_id=entry.ticket_id, similarity=similarity)
+        if (entry is not None and similarity is not None and results['cluster_id'] is None
+                and self.database is not None):
+            # The representative is not saved yet; link_ticket() fills in the cluster id
+            self.dedup.expect_link(title, description, entry)
+
+        if stream_response:
+            results['response_stream'] = self._stream_response(title, description, results, started)
+        elif results['response'] is None:
+            # Reused analysis: the reply is always written for this ticket's own customer
+            with deadline_at(self._response_deadline(started)), track_failures() as failures:
+                results['response'] = self.cga.process(title, description, results['kb_solution'])
+            if failures:
+                results['degraded'].append('response')
+        return results
+
+    def _response_deadline(self, started: float) -> Optional[float]:
+        """
+        Deadline of a response generated outside the executor, for a ticket
+        whose processing started at started (a time.monotonic() value)
+        """
+        timeout = self.executor.stages['response'].timeout
+        deadlines = [time.monotonic() + timeout if timeout is not None else None,
+                     started + self.executor.budget if self.executor.budget is not None else None]
+        deadlines = [deadline for deadline in deadlines if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def _stream_response(self, title: str, description: str, results: Dict[str, Any],
+                         started: float) -> Iterator[str]:
+        if results.get('response') is not None:
+            yield results['response']
+            return
+
+        deadline = self._response_deadline(started)
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        chunks = []
+        stream_started = time.perf_counter()
+        stream = self.cga.process_stream(title, description, results['kb_solution'], timeout)
+        while True:
+            try:
+                chunk = next(stream)
+            except StopIteration as done:
+                complete = done.value
+                break
+            chunks.append(chunk)
+            yield chunk
+        if not complete:
+            results['degraded'].append('response')
+            logger.info("Degraded fields: %s", results['degraded'])
+        results['response'] = "".join(chunks)
+        results['timings']['response'] = round(time.perf_counter() - stream_started, 4)
+
+    def link_ticket(self, title: str, description: str, ticket_id: int,
+                    results: Optional[Dict[str, Any]] = None):
+        """
+        Tell the near-duplicate index the id a processed ticket was saved
+        under, so later duplicates can be linked to it. Pass the ticket's
+        results: a near-duplicate processed before its representative was
+        saved gets its cluster_id here, in the database and in results,
+        as soon as the representative has an id.
+        """
+        if self.dedup is None:
+            return
+        if results is not None and results.get('similarity') is not None:
+            if results.get('cluster_id') is None:
+                cluster_id = self.dedup.link_duplicate(title, description, ticket_id)
+                if cluster_id is not None:
+                    self.database.set_cluster_id([ticket_id], cluster_id)
+                    results['cluster_id'] = cluster_id
+            return
+        unlinked = self.dedup.link_ticket(title, description, ticket_id)
+        if unlinked:
+            self.database.set_cluster_id(unlinked, ticket_id)
+
+    def save_analysis(self, ticket_id: int, results: Dict[str, Any]):
+        """
+        Queue the complete results of a saved ticket for the analysis store.
+        With stream_response, call it once the response stream is consumed.
+        """
+        if self.analysis_store is None:
+            return
+        if not _complete(results):
+            logger.debug("Not storing the analysis of ticket %s, degraded fields: %s",
+                         ticket_id, results['degraded'])
+            return
+        analysis = {key: value for key, value in results.items() if key != 'response_stream'}
+        self.analysis_store.put(TicketAnalysis(
+            ticket_id=ticket_id,
+            analysis=analysis,
+            prompt_version=PROMPT_VERSION,
+            models={name: get_profile(name).model for name in self._agent_names()},
+            timings=analysis.get('timings') or {}
+        ))
+
+    def _stored_analysis(self, entry: ClusterEntry):
+        """
+        Fill in the analysis of a representative loaded from the database
+        from the analysis store
+        """
+        try:
+            stored = self.analysis_store.get(entry.ticket_id)
+        except Exception as e:
+            logger.warning("Unable to load the stored analysis of ticket %s: %s", entry.ticket_id, e)
+            return
+        if stored is not None:
+            entry.resolve(stored.analysis)
+
+    def _reuse(self, entry: ClusterEntry, similarity: float,
+               deadline: Optional[float]) -> Optional[Dict[str, Any]]:
+        if entry.analysis is None and not entry.ready.is_set():
+            # The representative is still being analyzed; waiting is cheaper than
+            # repeating it, but only until its budget or this ticket's runs out
+            deadlines = [d for d in (entry.deadline, deadline) if d is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            if not entry.ready.wait(timeout):
+                logger.debug("Gave up waiting for near-duplicate ticket %s, analyzing in full", entry.ticket_id)
+                return None
+        if entry.analysis is None and entry.ticket_id is not None and self.analysis_store is not None:
+            self._stored_analysis(entry)
+        if entry.analysis is None:
+            return None
+        logger.debug("Near-duplicate of ticket %s (%.2f), reusing its analysis", entry.ticket_id, similarity)
+        TICKETS.inc(path="reused")
+        results = _reusable(entry.analysis)
+        # The labels were assigned to the representative's text, not this one's
+        results.update(cluster_id=entry.ticket_id, similarity=similarity, reused_analysis=True,
+                       training_labels=None)
+        return results
+
+    def _analyze(self, title: str, description: str, skip=(), given=None) -> Dict[str, Any]:
+        logger.debug("Starting ticket processing pipeline...")
+        started = time.perf_counter()
+
+        given = dict(given or {})
+        timings, failed, llm_labels = {}, set(), set(given.pop('llm_labels', ()))
+        results, degraded = self.executor.run(skip, timings, given, title=title, description=description,
+                                              failed=failed, llm_labels=llm_labels)
+        degraded += [name for name in self.executor.stages if name in failed and name not in degraded]
+        results.setdefault('response', None)
+
+        results.pop('analysis', None)
+        category, initial_priority = results.pop('classification')
+        results['category'] = category
+        results['initial_priority'] = initial_priority
+        results['priority'] = results['priority_info']['priority']
+        results['degraded'] = [field for stage in degraded for field in DEGRADED_FIELDS.get(stage, (stage,))]
+        if degraded:
+            logger.info("Degraded fields: %s", results['degraded'])
+        results['training_labels'] = _training_labels(results, llm_labels)
+        results.update(cluster_id=None, similarity=None, reused_analysis=False, timings=timings)
+
+        elapsed = time.perf_counter() - started
+        TICKET_SECONDS.observe(elapsed)
+        TICKETS.inc(path="analyzed")
+        logger.debug("Pipeline completed in %.2fs", elapsed)
+        return results
+
+# Result fields produced by stages whose names differ from the field names
+DEGRADED_FIELDS = {
+    'analysis': ('intent_info', 'category', 'initial_priority', 'semantics', 'priority_info', 'priority'),
+    'classification': ('category', 'initial_priority'),
+    'priority_info': ('priority_info', 'priority'),
+}
+
+# Results that belong to one ticket's own run and are never shared with its
+# near-duplicates: the reply is written for a specific customer
+_PER_TICKET_FIELDS = ('response', 'response_stream', 'timings')
+
+def _reusable(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of an analysis that near-duplicates can build on, without the
+    reply and the per-run timings
+    """
+    shared = copy.deepcopy({key: value for key, value in results.items() if key not in _PER_TICKET_FIELDS})
+    shared.update(response=None, timings={})
+    return shared
+
+def _complete(results: Dict[str, Any]) -> bool:
+    """
+    Whether every analysis field came from its agent; the reply is
+    generated per ticket and does not count
+    """
+    return all(field == 'response' for field in results.get('degraded', ()))
+
+def _training_labels(results: Dict[str, Any], llm_labels) -> Optional[Dict[str, Any]]:
+    """
+    Labels of an analyzed ticket that the LLM assigned, to train the local
+    classifiers on. Local predictions, defaults and local rules are left
+    out, so the models never learn from their own or a fallback's output;
+    priority is the classifier's, before priority understanding.
+    """
+    labels = {}
+    if 'ticket_classification' in llm_labels and 'category' not in results['degraded']:
+        labels.update(category=results['category'], priority=results['initial_priority'])
+    if 'intent_extraction' in llm_labels and 'intent_info' not in results['degraded']:
+        labels['intent'] = results['intent_info']['primary_intent']
+    return labels or None
+
+def _tracked(name, func):
+    """
+    Stage function that notes the stage in ctx['failed'] when one of its
+    LLM calls fails and the agent falls back, and the labels the LLM
+    assigned in ctx['llm_labels']
+    """
+    def run(ctx):
+        with track_failures() as failures, track_llm_labels() as labels:
+            result = func(ctx)
+        if failures and 'failed' in ctx:
+            ctx['failed'].add(name)
+        if labels and 'llm_labels' in ctx:
+            ctx['llm_labels'].update(label for label, _ in labels)
+        return result
+    return run
+
+def _fused_field(name):
+    return lambda ctx: ctx['analysis'][name]
@@ -0,0 +1,123 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_STATE = metrics.gauge("llm_circuit_state", "1 for the LLM circuit breaker's current state", ["state"])
+
+class CircuitOpenError(Exception):
+    """Raised when a request is rejected because the circuit is open"""
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for the LLM backend.
+
+    closed:    every request is allowed; the circuit opens once at least
+               minimum_calls outcomes in the last window_seconds show a failure
+               rate of failure_rate_threshold or more.
+    open:      every request is rejected for open_seconds.
+    half_open: a growing share of requests is let through as probes, starting
+               at initial_probe_rate and doubling with each successful probe
+               until all traffic is restored. Any failed probe reopens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_rate_threshold: float = 0.5, minimum_calls: int = 10,
+                 window_seconds: float = 30.0, open_seconds: float = 30.0,
+                 initial_probe_rate: float = 0.1, probe_interval: float = 1.0):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.initial_probe_rate = initial_probe_rate
+        # Let at least one probe through this often, however low the probe rate
+        self.probe_interval = probe_interval
+
+        self.state = self.CLOSED
+        CIRCUIT_STATE.set(1, state=self.state)
+        self.rejected = 0
+        self._outcomes = deque()
+        self._opened_at = 0.0
+        self._probe_rate = initial_probe_rate
+        self._last_probe = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """
+        Whether requests may currently reach the backend at all; unlike
+        allow() this does not admit a request
+        """
+        with self._lock:
+            return self.state != self.OPEN or time.monotonic() - self._opened_at >= self.open_seconds
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._transition(self.HALF_OPEN)
+                self._probe_rate = self.initial_probe_rate
+                self._last_probe = 0.0
+
+            if self.state == self.HALF_OPEN:
+                if now - self._last_probe < self.probe_interval and random.random() >= self._probe_rate:
+                    self.rejected += 1
+                    return False
+                self._last_probe = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_rate *= 2
+                if self._probe_rate >= 1.0:
+                    self._transition(self.CLOSED)
+                return
+            self._record(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            if self.state == self.CLOSED and self._record(False):
+                self._open()
+
+    def _record(self, ok: bool) -> bool:
+        """
+        Add an outcome to the window; returns True if the failure rate is
+        now over the threshold
+        """
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+        if len(self._outcomes) < self.minimum_calls:
+            return False
+        failures = sum(1 for _, outcome in self._outcomes if not outcome)
+        return failures / len(self._outcomes) >= self.failure_rate_threshold
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._transition(self.OPEN)
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.info("LLM circuit breaker %s -> %s", self.state, state)
+            CIRCUIT_STATE.set(0, state=self.state)
+            CIRCUIT_STATE.set(1, state=state)
+        self.state = state
+        self._outcomes.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'state': self.state, 'rejected': self.rejected, 'probe_rate': self._probe_rate}
@@ -0,0 +1,74 @@
+"""
+Generation settings for every agent, in one place. Agents that answer with
+a short structured line run on the small model with a tight token cap;
+only free-text generation (responses and solution recommendations) uses
+the large model.
+
+Individual fields can be overridden without code changes through
+GENERATION_PROFILES, a JSON object keyed by profile name, e.g.
+GENERATION_PROFILES='{"content_generation": {"max_tokens": 500}}'.
+"""
+import json
+import os
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+# Stored analyses are only reused while this matches; bump it whenever an
+# agent prompt or output format changes
+PROMPT_VERSION = "2"
+
+LARGE_MODEL = os.getenv("GROQ_LARGE_MODEL", "llama-3.1-70b-versatile")
+SMALL_MODEL = os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant")
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    name: str
+    model: str
+    max_tokens: int
+    temperature: float
+    stop: Tuple[str, ...] = ()
+
+    def override(self, max_tokens: Optional[int] = None, temperature: Optional[float] = None,
+                 stop: Optional[Tuple[str, ...]] = None) -> "GenerationProfile":
+        """
+        Copy with any explicitly given per-call settings applied
+        """
+        changes = {}
+        if max_tokens is not None:
+            changes['max_tokens'] = max_tokens
+        if temperature is not None:
+            changes['temperature'] = temperature
+        if stop is not None:
+            changes['stop'] = tuple(stop)
+        return replace(self, **changes) if changes else self
+
+_DEFAULTS = [
+    GenerationProfile("default", LARGE_MODEL, 1000, 0.7),
+    # Single "a|b|c" line. No newline stop: a leading blank line or a short
+    # preamble would become the whole completion, and the cap already bounds it
+    GenerationProfile("ticket_classification", SMALL_MODEL, 16, 0.0),
+    GenerationProfile("intent_extraction", SMALL_MODEL, 80, 0.0),
+    GenerationProfile("language_semantics", SMALL_MODEL, 120, 0.0),
+    GenerationProfile("priority_understanding", SMALL_MODEL, 60, 0.0),
+    GenerationProfile("automated_resolution", SMALL_MODEL, 160, 0.2),
+    # Copies a whole knowledge base article; a lower cap would cut long ones off
+    GenerationProfile("knowledge_base", SMALL_MODEL, 1000, 0.2),
+    GenerationProfile("fused_analysis", SMALL_MODEL, 400, 0.0),
+    GenerationProfile("solution_recommendation", LARGE_MODEL, 300, 0.3),
+    GenerationProfile("content_generation", LARGE_MODEL, 700, 0.7),
+]
+
+def _load_profiles() -> Dict[str, GenerationProfile]:
+    profiles = {profile.name: profile for profile in _DEFAULTS}
+    overrides = json.loads(os.getenv("GENERATION_PROFILES", "{}"))
+    for name, fields in overrides.items():
+        if 'stop' in fields:
+            fields['stop'] = tuple(fields['stop'])
+        base = profiles.get(name, replace(profiles["default"], name=name))
+        profiles[name] = replace(base, **fields)
+    return profiles
+
+PROFILES = _load_profiles()
+
+def get_profile(name: str) -> GenerationProfile:
+    return PROFILES.get(name) or replace(PROFILES["default"], name=name)
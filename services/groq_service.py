@@ -1,40 +1,510 @@
+import asyncio
+import atexit
+import concurrent.futures
+import json
+import logging
 import os
-import requests
-from typing import Optional
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import httpx
+from typing import Iterator, Optional, Sequence
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.generation_profiles import GenerationProfile, get_profile
+from services.llm_cache import llm_cache
+from services.rate_limiter import RateLimiter, backoff_delay
+from utils import metrics
+from utils.deadline import remaining
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 support in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# OpenAI-compatible chat completions endpoint; point it at a local mock for benchmarks
+API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+DEFAULT_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "20"))
+DEFAULT_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+# Plan quotas; the defaults match Groq's free tier for the 70B model
+REQUESTS_PER_MINUTE = float(os.getenv("GROQ_RPM", "30"))
+TOKENS_PER_MINUTE = float(os.getenv("GROQ_TPM", "6000"))
+MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "4"))
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Send a duplicate request once a call has been slower than this latency
+# percentile (e.g. 95) of recent calls; unset disables hedging
+HEDGE_PERCENTILE = float(os.getenv("GROQ_HEDGE_PERCENTILE", "0"))
+HEDGE_MIN_SAMPLES = 20
+# Returned immediately while the circuit breaker is open; agents answer
+# from local rules instead
+BACKEND_UNAVAILABLE = "Error: LLM backend unavailable"
+# Returned (or ends a stream) when a call runs out of time
+REQUEST_TIMED_OUT = "Error: Request timed out"
+# Ends a stream that failed after some text was already yielded
+STREAM_INTERRUPTED = "Error: Response stream interrupted"
+
+LLM_CALL_SECONDS = metrics.histogram("llm_call_seconds",
+                                     "Completion calls end to end, including cache hits, coalescing and retries",
+                                     ["profile", "model"])
+LLM_HTTP_SECONDS = metrics.histogram("llm_http_request_seconds", "Individual HTTP requests to the LLM API",
+                                     ["model", "status"])
+LLM_TOKENS = metrics.counter("llm_tokens_total", "Tokens reported in the API usage field",
+                             ["profile", "model", "kind"])
+LLM_ERRORS = metrics.counter("llm_errors_total", "Completion calls that returned an error", ["profile", "error"])
+
+# Error results of completion calls made inside track_failures()
+_failed_calls: ContextVar[Optional[list]] = ContextVar("failed_llm_calls", default=None)
+
+@contextmanager
+def track_failures():
+    """
+    Collect the error results of the completion calls made in the enclosed
+    block, so a caller can tell an agent's answer from its fallback
+    """
+    failures = []
+    token = _failed_calls.set(failures)
+    try:
+        yield failures
+    finally:
+        _failed_calls.reset(token)
+
+def _record_failure(result: str):
+    failures = _failed_calls.get()
+    if failures is not None and result.startswith("Error:"):
+        failures.append(result)
+
+def _seconds_until(deadline: Optional[float]) -> Optional[float]:
+    return max(0.0, deadline - time.monotonic()) if deadline is not None else None
+
+class _SharedClient:
+    """
+    Background event loop owning the pooled HTTP client shared by every
+    GroqService instance, so connections are kept alive across agents and
+    Streamlit sessions instead of re-handshaking on every call. It starts on
+    the first request rather than when services are created.
+    """
 
-class GroqService:
     def __init__(self):
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.model = "llama-3.1-70b-versatile"
-        print(f"[DEBUG] Initializing GroqService with model: {self.model}")
-    
-    def get_completion(self, prompt: str, max_tokens: Optional[int] = 1000) -> str:
+        self._lock = threading.Lock()
+        self._settings = None
+        self.loop = None
+        self.client = None
+        self.rate_limiter = None
+        self.breaker = CircuitBreaker(
+            failure_rate_threshold=float(os.getenv("GROQ_BREAKER_FAILURE_RATE", "0.5")),
+            minimum_calls=int(os.getenv("GROQ_BREAKER_MIN_CALLS", "10")),
+            open_seconds=float(os.getenv("GROQ_BREAKER_OPEN_SECONDS", "30"))
+        )
+        # Latencies of recent successful requests, used to time hedges
+        self.latencies = deque(maxlen=500)
+        # Request key -> _InFlight; only touched from the event loop thread
+        self.inflight = {}
+        # (profile, model) -> token counts reported by the API
+        self.usage = {}
+        self._usage_lock = threading.Lock()
+
+    def configure(self, pool_size: int, timeout: float, connect_timeout: float):
+        # The pool is shared, so the first service created decides its size and timeouts
+        with self._lock:
+            if self._settings is None:
+                self._settings = (pool_size, timeout, connect_timeout)
+
+    def start(self):
+        with self._lock:
+            if self.loop is not None:
+                return
+            pool_size, timeout, connect_timeout = self._settings or (
+                DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT
+            )
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="groq-client", daemon=True)
+            thread.start()
+            self.client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(timeout, connect=connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=60
+                )
+            )
+            self.rate_limiter = RateLimiter(
+                REQUESTS_PER_MINUTE,
+                TOKENS_PER_MINUTE,
+                initial_concurrency=min(pool_size, 4),
+                max_concurrency=pool_size
+            )
+            self.loop = loop
+            logger.debug("Started shared Groq HTTP client (pool_size=%s, http2=%s)", pool_size, HTTP2_AVAILABLE)
+
+    def submit(self, coro):
+        if self.loop is None:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def hedge_delay(self) -> Optional[float]:
+        if HEDGE_PERCENTILE <= 0 or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))]
+
+    def record_usage(self, call: GenerationProfile, usage: dict):
+        with self._usage_lock:
+            totals = self.usage.setdefault((call.name, call.model), {
+                'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0
+            })
+            totals['calls'] += 1
+            for field in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+                totals[field] += usage.get(field) or 0
+        for kind in ('prompt', 'completion'):
+            LLM_TOKENS.inc(usage.get(f"{kind}_tokens") or 0, profile=call.name, model=call.model, kind=kind)
+        logger.debug("%s on %s used %s prompt + %s completion tokens",
+                     call.name, call.model, usage.get('prompt_tokens'), usage.get('completion_tokens'))
+
+    def token_usage(self) -> dict:
+        with self._usage_lock:
+            return {key: dict(totals) for key, totals in self.usage.items()}
+
+    def close(self):
+        with self._lock:
+            if self.loop is None:
+                return
+            self.submit(self.client.aclose()).result(timeout=5)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
+            self.client = None
+
+class _InFlight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+    @property
+    def joinable(self) -> bool:
+        # A cancelled request can still be unwinding; joining it would only yield CancelledError
+        return not (self.task.cancelled() or self.task.cancelling())
+
+def _forget_flight(key: str, flight: _InFlight):
+    # The key may already belong to a newer request that replaced a cancelled one
+    if _shared_client.inflight.get(key) is flight:
+        del _shared_client.inflight[key]
+
+_shared_client = _SharedClient()
+atexit.register(_shared_client.close)
+
+class GroqService:
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, use_cache: bool = True,
+                 profile: Optional[GenerationProfile] = None):
+        self.api_url = API_URL
+        # Model, token cap, temperature and stop sequences used unless a call overrides them
+        self.profile = profile or get_profile("default")
+        self.model = self.profile.model
+        self.use_cache = use_cache
+        _shared_client.configure(pool_size, timeout, connect_timeout)
+        logger.debug("Initializing GroqService with model: %s", self.model)
+
+    def available(self) -> bool:
+        """
+        False while the circuit breaker is open and requests would be rejected
+        """
+        return _shared_client.breaker.available()
+
+    @staticmethod
+    def token_usage() -> dict:
+        """
+        Tokens reported by the API so far, keyed by (profile name, model)
+        """
+        return _shared_client.token_usage()
+
+    def get_completion(self, prompt: str, max_tokens: Optional[int] = None, temperature: Optional[float] = None,
+                       timeout: Optional[float] = None, stop: Optional[Sequence[str]] = None) -> str:
+        """
+        Blocking completion. Settings left as None come from the service's
+        profile. Gives up after timeout seconds, or sooner if the caller runs
+        under a pipeline stage deadline.
+        """
+        timeout = remaining(timeout)
+        future = _shared_client.submit(self.get_completion_async(prompt, max_tokens, temperature, stop))
         try:
-            headers = {
-                "Authorization": f"Bearer {os.getenv('GROQ_API_KEY')}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": max_tokens,
-                "temperature": 0.7
-            }
-            
-            response = requests.post(self.api_url, headers=headers, json=data)
-            response.raise_for_status()
-            
+            result = future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            LLM_ERRORS.inc(profile=self.profile.name, error="timeout")
+            logger.debug("LLM request abandoned after its %.1fs deadline", timeout)
+            result = REQUEST_TIMED_OUT
+        _record_failure(result)
+        return result
+
+    async def get_completion_async(self, prompt: str, max_tokens: Optional[int] = None,
+                                   temperature: Optional[float] = None,
+                                   stop: Optional[Sequence[str]] = None) -> str:
+        if asyncio.get_running_loop() is not _shared_client.loop:
+            # The pooled client is bound to its own loop; hand the call over to it
+            return await asyncio.wrap_future(
+                _shared_client.submit(self.get_completion_async(prompt, max_tokens, temperature, stop))
+            )
+
+        call = self.profile.override(max_tokens, temperature, stop)
+        key = llm_cache.make_key(call.model, prompt, call.max_tokens, call.temperature, call.stop)
+        with LLM_CALL_SECONDS.time(profile=call.name, model=call.model):
+            if self.use_cache:
+                cached = await llm_cache.get_async(key)
+                if cached is not None:
+                    logger.debug("LLM cache hit")
+                    return cached
+
+            result = await self._coalesced_request(key, prompt, call)
+            if self.use_cache:
+                llm_cache.set_in_background(key, result)
+            return result
+
+    async def _coalesced_request(self, key: str, prompt: str, call: GenerationProfile) -> str:
+        """
+        Share one in-flight request between concurrent callers sending an
+        identical prompt. The request is only cancelled once every caller
+        waiting on it has been cancelled; a caller arriving after that
+        starts a new request instead of joining it.
+        """
+        flight = _shared_client.inflight.get(key)
+        if flight is None or not flight.joinable:
+            flight = _InFlight(asyncio.ensure_future(self._hedged_request(prompt, call)))
+            _shared_client.inflight[key] = flight
+            flight.task.add_done_callback(lambda _, flight=flight: _forget_flight(key, flight))
+        else:
+            logger.debug("Joining identical in-flight LLM request")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def stream_completion(self, prompt: str, max_tokens: Optional[int] = None,
+                          temperature: Optional[float] = None, stop: Optional[Sequence[str]] = None,
+                          timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield the completion text in chunks as the API streams it. Failures
+        before the first chunk produce a single error string, like
+        get_completion; a failure after it ends the stream with
+        STREAM_INTERRUPTED. Closing the generator early cancels the request.
+        Once timeout seconds (or the caller's deadline) have passed, the
+        stream ends with REQUEST_TIMED_OUT, even after some text was yielded.
+        """
+        timeout = remaining(timeout)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        chunks = queue.Queue()
+        call = self.profile.override(max_tokens, temperature, stop)
+        future = _shared_client.submit(self._stream_into(chunks, prompt, call, deadline))
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=_seconds_until(deadline))
+                except queue.Empty:
+                    LLM_ERRORS.inc(profile=call.name, error="timeout")
+                    logger.debug("LLM stream abandoned after its %.1fs deadline", timeout)
+                    yield REQUEST_TIMED_OUT
+                    return
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            future.cancel()
+
+    async def _stream_into(self, chunks: queue.Queue, prompt: str, call: GenerationProfile,
+                           deadline: Optional[float] = None):
+        received = False
+        try:
+            async for chunk in self._stream(prompt, call):
+                received = True
+                chunks.put(chunk)
+        except CircuitOpenError:
+            LLM_ERRORS.inc(profile=call.name, error="circuit_open")
+            chunks.put(BACKEND_UNAVAILABLE)
+        except (httpx.HTTPError, ValueError, KeyError, IndexError) as e:
+            LLM_ERRORS.inc(profile=call.name, error="stream")
+            logger.warning("API Stream Error: %s", e)
+            if not received:
+                # Nothing has been shown yet, so a regular request (with retries) can take over
+                # for whatever time the stream has left
+                try:
+                    chunks.put(await asyncio.wait_for(self._request(prompt, call), _seconds_until(deadline)))
+                except asyncio.TimeoutError:
+                    chunks.put(REQUEST_TIMED_OUT)
+            else:
+                # The text so far is truncated; the caller has to know it is incomplete
+                chunks.put(STREAM_INTERRUPTED)
+        finally:
+            chunks.put(None)
+
+    async def _stream(self, prompt: str, call: GenerationProfile):
+        """
+        Stream one completion, parsing the server-sent events into text chunks
+        """
+        breaker = _shared_client.breaker
+        limiter = _shared_client.rate_limiter
+        if not breaker.allow():
+            raise CircuitOpenError()
+
+        estimated_tokens = len(prompt) // 4 + min(call.max_tokens, 300)
+        data = dict(self._payload(prompt, call), stream=True)
+        async with limiter.slot(estimated_tokens):
+            started = time.monotonic()
+            try:
+                async with _shared_client.client.stream("POST", self.api_url, headers=self._headers(),
+                                                        json=data) as response:
+                    latency = time.monotonic() - started
+                    LLM_HTTP_SECONDS.observe(latency, model=call.model, status=str(response.status_code))
+                    if response.status_code >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    if response.status_code == 429:
+                        limiter.on_throttled()
+                    response.raise_for_status()
+
+                    usage = {}
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[len("data:"):].strip()
+                        if payload == "[DONE]":
+                            break
+                        event = json.loads(payload)
+                        usage = event.get("usage") or (event.get("x_groq") or {}).get("usage") or usage
+                        if event.get("choices"):
+                            text = event["choices"][0].get("delta", {}).get("content")
+                            if text:
+                                yield text
+            except httpx.TransportError:
+                breaker.record_failure()
+                raise
+        limiter.on_success(latency, estimated_tokens, usage.get("total_tokens"))
+        _shared_client.record_usage(call, usage)
+
+    async def _hedged_request(self, prompt: str, call: GenerationProfile) -> str:
+        """
+        Run the request, and if it is still outstanding after the hedge delay
+        send a duplicate and return whichever succeeds first
+        """
+        delay = _shared_client.hedge_delay()
+        primary = asyncio.ensure_future(self._request(prompt, call))
+        if delay is None:
+            return await primary
+
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+
+            logger.debug("LLM request slower than %.2fs, sending a hedged duplicate", delay)
+            tasks.add(asyncio.ensure_future(self._request(prompt, call)))
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                results = [task.result() for task in done]
+                # Both copies can finish together; prefer any success over an error
+                for result in results:
+                    if not result.startswith("Error:"):
+                        return result
+                if not tasks:
+                    return results[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _request(self, prompt: str, call: GenerationProfile) -> str:
+        try:
+            response = await self._send_with_retries(self._headers(), self._payload(prompt, call),
+                                                     len(prompt) // 4 + min(call.max_tokens, 300))
+            _shared_client.record_usage(call, response.json().get("usage") or {})
+
             return response.json()["choices"][0]["message"]["content"].strip()
-            
-        except requests.exceptions.RequestException as e:
-            print(f"API Request Error: {str(e)}")
+
+        except CircuitOpenError:
+            LLM_ERRORS.inc(profile=call.name, error="circuit_open")
+            return BACKEND_UNAVAILABLE
+        except httpx.HTTPError as e:
+            LLM_ERRORS.inc(profile=call.name, error="http")
+            logger.warning("API Request Error: %s", e)
             return "Error: Unable to process request"
         except (KeyError, IndexError) as e:
-            print(f"API Response Format Error: {str(e)}")
+            LLM_ERRORS.inc(profile=call.name, error="format")
+            logger.warning("API Response Format Error: %s", e)
             return "Error: Invalid response format"
         except Exception as e:
-            print(f"Unexpected Error: {str(e)}")
+            LLM_ERRORS.inc(profile=call.name, error="unexpected")
+            logger.exception("Unexpected Error: %s", e)
             return "Error: An unexpected error occurred"
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {os.getenv('GROQ_API_KEY')}",
+            "Content-Type": "application/json"
+        }
+
+    def _payload(self, prompt: str, call: GenerationProfile) -> dict:
+        data = {
+            "model": call.model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": call.max_tokens,
+            "temperature": call.temperature
+        }
+        if call.stop:
+            data["stop"] = list(call.stop)
+        return data
+
+    async def _send_with_retries(self, headers: dict, data: dict, estimated_tokens: int) -> httpx.Response:
+        """
+        POST within the shared rate limits, retrying throttled, 5xx and
+        transport failures with jittered exponential backoff that honors
+        Retry-After. Every attempt goes through the circuit breaker.
+        """
+        limiter = _shared_client.rate_limiter
+        breaker = _shared_client.breaker
+        for attempt in range(MAX_RETRIES + 1):
+            if not breaker.allow():
+                raise CircuitOpenError()
+            retry_after = None
+            try:
+                async with limiter.slot(estimated_tokens):
+                    started = time.monotonic()
+                    response = await _shared_client.client.post(self.api_url, headers=headers, json=data)
+                    latency = time.monotonic() - started
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                LLM_HTTP_SECONDS.observe(time.monotonic() - started, model=data["model"], status="transport_error")
+                if attempt == MAX_RETRIES:
+                    raise
+                logger.warning("Groq transport error, retrying: %s", e)
+            else:
+                LLM_HTTP_SECONDS.observe(latency, model=data["model"], status=str(response.status_code))
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    breaker.record_success()
+                    response.raise_for_status()
+                    usage = response.json().get("usage") or {}
+                    limiter.on_success(latency, estimated_tokens, usage.get("total_tokens"))
+                    _shared_client.latencies.append(latency)
+                    return response
+                if response.status_code == 429:
+                    # Throttling means the backend is up, so it does not count against the breaker
+                    breaker.record_success()
+                    limiter.on_throttled()
+                else:
+                    breaker.record_failure()
+                if attempt == MAX_RETRIES:
+                    response.raise_for_status()
+                retry_after = response.headers.get("retry-after")
+                logger.debug("Groq returned %s, retrying (attempt %s)", response.status_code, attempt + 1)
+
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = metrics.counter("llm_cache_lookups_total", "LLM cache lookups by result (hit, disk_hit, miss)",
+                                ["result"])
+
+class LLMCache:
+    """
+    Content-addressed cache for LLM completions: a bounded in-memory LRU with
+    TTL in front of an optional SQLite file that survives restarts.
+
+    get() and set() block on the SQLite file. From an event loop use
+    get_async() and set_in_background(), which only touch the in-memory
+    LRU on the loop and leave the file to worker threads.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # Guards the SQLite connection, so memory lookups never wait on disk I/O
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._disk = None
+        if db_path:
+            self._disk = sqlite3.connect(db_path, check_same_thread=False)
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._disk.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            self._disk.commit()
+            logger.debug("LLM cache persisting to %s", db_path)
+
+    @staticmethod
+    def make_key(model: str, prompt: str, max_tokens: Optional[int], temperature: float, stop=()) -> str:
+        payload = json.dumps([model, prompt, max_tokens, temperature, list(stop)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        if value is None:
+            value = self._get_disk(key)
+        return value
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """
+        get() that looks up the SQLite file in a worker thread
+        """
+        value = self._get_memory(key)
+        if value is None:
+            value = await asyncio.to_thread(self._get_disk, key)
+        return value
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_LOOKUPS.inc(result="hit")
+                    return value
+                del self._entries[key]
+        return None
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        row = None
+        if self._disk is not None:
+            with self._disk_lock:
+                row = self._disk.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+                    (key, time.time())
+                ).fetchone()
+        with self._lock:
+            if row is not None:
+                self._store(key, row[0], row[1])
+                self.disk_hits += 1
+                CACHE_LOOKUPS.inc(result="disk_hit")
+                return row[0]
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+    def set(self, key: str, value: str):
+        expires_at = self._set_memory(key, value)
+        if expires_at is not None:
+            self._set_disk(key, value, expires_at)
+
+    def set_in_background(self, key: str, value: str):
+        """
+        set() that writes the SQLite file from a worker thread without
+        waiting for it; must be called on a running event loop
+        """
+        expires_at = self._set_memory(key, value)
+        if expires_at is not None and self._disk is not None:
+            asyncio.get_running_loop().run_in_executor(None, self._set_disk, key, value, expires_at)
+
+    def _set_memory(self, key: str, value: str) -> Optional[float]:
+        # Error sentinels are transient and must never be served from cache
+        if value.startswith("Error:"):
+            return None
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+        return expires_at
+
+    def _set_disk(self, key: str, value: str, expires_at: float):
+        if self._disk is None:
+            return
+        try:
+            with self._disk_lock:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._disk.commit()
+        except sqlite3.Error as e:
+            logger.warning("Unable to persist LLM cache entry: %s", e)
+
+    def _store(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM llm_cache")
+                self._disk.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+llm_cache = LLMCache(
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+    db_path=os.getenv("LLM_CACHE_PATH")
+)
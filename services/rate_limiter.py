@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY_LIMIT = metrics.gauge("llm_concurrency_limit", "Current adaptive limit on concurrent LLM requests")
+
+class TokenBucket:
+    """
+    Continuously refilling token bucket. Waiters are served in arrival order,
+    so a large request cannot be starved by a stream of small ones.
+    Must only be used from a single event loop.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def adjust(self, amount: float):
+        """
+        Return (positive) or charge (negative) tokens after the fact, e.g.
+        once the real token usage of a request is known
+        """
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit: grows by roughly one slot per window of
+    successful requests, halves on throttling and backs off gently when
+    latency climbs well above the best latency seen so far
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 32,
+                 latency_tolerance: float = 3.0, decrease_cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self._baseline = None
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float):
+        self._baseline = latency if self._baseline is None else min(self._baseline * 1.01, latency)
+        if latency > self._baseline * self.latency_tolerance:
+            self._decrease(0.9)
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        CONCURRENCY_LIMIT.set(int(self.limit))
+
+    def on_throttled(self):
+        self._decrease(0.5)
+
+    def _decrease(self, factor: float):
+        # A burst of 429s from one overload episode should only halve the limit once
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * factor)
+        CONCURRENCY_LIMIT.set(int(self.limit))
+        logger.info("Groq concurrency limit reduced to %s", int(self.limit))
+
+class RateLimiter:
+    """
+    Client-side limits for the Groq API: requests per minute, estimated
+    tokens per minute and adaptive concurrency. Callers wait for capacity
+    instead of being rejected.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float,
+                 initial_concurrency: int = 4, max_concurrency: int = 32):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrencyLimiter(initial_concurrency, maximum=max_concurrency)
+        self.throttled = 0
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        await self.concurrency.acquire()
+        try:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            yield
+        finally:
+            await self.concurrency.release()
+
+    def on_success(self, latency: float, estimated_tokens: int, used_tokens: Optional[int]):
+        self.concurrency.on_success(latency)
+        if used_tokens is not None:
+            self.tokens.adjust(estimated_tokens - used_tokens)
+
+    def on_throttled(self):
+        self.throttled += 1
+        self.concurrency.on_throttled()
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None, base: float = 0.5, cap: float = 30.0) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based). Honors a
+    Retry-After header given in seconds or as an HTTP date; otherwise uses
+    exponential backoff with full jitter.
+    """
+    if retry_after:
+        try:
+            return min(cap, max(0.0, float(retry_after)))
+        except ValueError:
+            try:
+                return min(cap, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
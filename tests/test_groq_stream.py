@@ -0,0 +1,48 @@
+import json
+import httpx
+import pytest
+from agents.content_generation import ContentGenerationAgent
+from services import groq_service
+from services.groq_service import GroqService, STREAM_INTERRUPTED
+
+class _BrokenStream(httpx.AsyncByteStream):
+    """
+    Server-sent events that fail with a read error after the given chunks
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            event = {"choices": [{"delta": {"content": chunk}}]}
+            yield f"data: {json.dumps(event)}\n\n".encode()
+        raise httpx.ReadError("connection reset")
+
+@pytest.fixture
+def broken_stream():
+    client = groq_service._shared_client
+    client.start()
+    original = client.client
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, stream=_BrokenStream(["Hello, ", "we are "]))
+    ))
+    yield
+    client.client = original
+
+def test_stream_failing_midway_ends_with_interrupted_marker(broken_stream):
+    chunks = list(GroqService(use_cache=False).stream_completion("prompt", timeout=5))
+    assert chunks == ["Hello, ", "we are ", STREAM_INTERRUPTED]
+
+def test_response_stream_failing_midway_is_incomplete(broken_stream):
+    agent = ContentGenerationAgent(groq_service=GroqService(use_cache=False))
+    stream = agent.process_stream("Title", "Description", timeout=5)
+    chunks = []
+    while True:
+        try:
+            chunks.append(next(stream))
+        except StopIteration as done:
+            complete = done.value
+            break
+    assert chunks == ["Hello, ", "we are "]
+    assert complete is False
@@ -0,0 +1,101 @@
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from agents.registry import AgentRegistry
+from pipeline.ticket_pipeline import TicketPipeline
+
+TITLE = "Printer on the third floor is jammed"
+DESCRIPTION = "The printer on the third floor jams on every print job since this morning"
+
+class StubAgent:
+    def __init__(self, result, gate=None):
+        self.result = result
+        self.gate = gate
+
+    def process(self, *args, **kwargs):
+        if self.gate is not None:
+            self.gate.wait(5)
+        return copy.deepcopy(self.result)
+
+    def default_result(self, *args):
+        return copy.deepcopy(self.result)
+
+class FakeDatabase:
+    def __init__(self):
+        self.cluster_ids = {}
+        self._ids = iter(range(1, 1000))
+        self._lock = threading.Lock()
+
+    def save_ticket(self, cluster_id=None):
+        with self._lock:
+            ticket_id = next(self._ids)
+            self.cluster_ids[ticket_id] = cluster_id
+        return ticket_id
+
+    def set_cluster_id(self, ticket_ids, cluster_id):
+        with self._lock:
+            for ticket_id in ticket_ids:
+                self.cluster_ids[ticket_id] = cluster_id
+
+def _pipeline(gate, database):
+    agents = {
+        'ticket_classification': StubAgent(("Technical Issue", 2), gate),
+        'intent_extraction': StubAgent({'primary_intent': 'technical_support', 'secondary_intents': [],
+                                        'required_actions': [], 'routing': 'it'}),
+        'language_semantics': StubAgent({'sentiment': 'Neutral'}),
+        'priority_understanding': StubAgent({'priority': 2, 'sla_requirement': '24h'}),
+        'knowledge_base': StubAgent(None),
+        'solution_recommendation': StubAgent({'steps': []}),
+        'automated_resolution': StubAgent({'automated': False}),
+        'content_generation': StubAgent("We are looking into it."),
+    }
+    return TicketPipeline(near_duplicates=True, database=database, agents=AgentRegistry(agents), warm_up=False)
+
+def _process_burst(pipeline, gate):
+    """
+    Process a representative and a near-duplicate that arrives while the
+    representative is still being analyzed
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        representative = executor.submit(pipeline.process, TITLE, DESCRIPTION)
+        _wait_until(lambda: len(pipeline.dedup) == 1)
+        duplicate = executor.submit(pipeline.process, TITLE, DESCRIPTION)
+        # The duplicate blocks on the representative's analysis
+        _wait_until(lambda: any(entry.ready._cond._waiters for entry in pipeline.dedup._entries.values()))
+        gate.set()
+        return representative.result(), duplicate.result()
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+def _save(pipeline, database, results):
+    ticket_id = database.save_ticket(results['cluster_id'])
+    pipeline.link_ticket(TITLE, DESCRIPTION, ticket_id, results)
+    return ticket_id
+
+def test_duplicate_saved_before_its_representative_is_linked_afterwards():
+    gate, database = threading.Event(), FakeDatabase()
+    pipeline = _pipeline(gate, database)
+    representative, duplicate = _process_burst(pipeline, gate)
+    assert duplicate['reused_analysis'] and duplicate['cluster_id'] is None
+
+    duplicate_id = _save(pipeline, database, duplicate)
+    assert database.cluster_ids[duplicate_id] is None
+    representative_id = _save(pipeline, database, representative)
+
+    assert database.cluster_ids == {duplicate_id: representative_id, representative_id: None}
+
+def test_duplicate_saved_after_its_representative_gets_the_cluster_id():
+    gate, database = threading.Event(), FakeDatabase()
+    pipeline = _pipeline(gate, database)
+    representative, duplicate = _process_burst(pipeline, gate)
+
+    representative_id = _save(pipeline, database, representative)
+    duplicate_id = _save(pipeline, database, duplicate)
+
+    assert duplicate['cluster_id'] == representative_id
+    assert database.cluster_ids == {representative_id: None, duplicate_id: representative_id}
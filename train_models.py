@@ -0,0 +1,75 @@
+"""
+Train the local fast-path classifiers for ticket classification and intent
+extraction from tickets stored in the database.
+
+    python train_models.py --limit 50000
+
+A held-out share of the tickets is used first to report how many tickets
+each model would answer locally at its confidence threshold and how often
+it agrees with the stored (LLM-assigned) label there. The models are then
+refit on all tickets and saved to LOCAL_MODEL_DIR, where the agents load
+them at startup.
+"""
+import argparse
+import random
+from typing import Dict, List
+from agents.intent_extraction import IntentExtractionAgent
+from agents.ticket_classification import TicketClassificationAgent, _label
+from utils.naive_bayes import HashedNaiveBayes
+
+def evaluate(agent, tickets: List[Dict], label_of, holdout: float) -> Dict:
+    """
+    Fit a throwaway copy of the agent's model on part of the tickets and
+    measure fast-path coverage and agreement on the rest
+    """
+    tickets = list(tickets)
+    random.Random(0).shuffle(tickets)
+    split = int(len(tickets) * (1 - holdout))
+    train = [t for t in tickets[:split] if label_of(t)]
+    test = [t for t in tickets[split:] if label_of(t)]
+
+    if not test or len(train) < agent.fast_path.min_examples:
+        return {'tested': len(test), 'coverage': None, 'agreement': None}
+    model = HashedNaiveBayes().fit([f"{t['title']} {t['description']}" for t in train], [label_of(t) for t in train])
+    threshold = agent.fast_path.threshold
+
+    local = agreed = 0
+    for ticket in test:
+        label, confidence = model.predict(f"{ticket['title']} {ticket['description']}")
+        if confidence >= threshold:
+            local += 1
+            agreed += label == label_of(ticket)
+    return {
+        'tested': len(test),
+        'coverage': local / len(test),
+        'agreement': agreed / local if local else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local fast-path ticket classifiers")
+    parser.add_argument("--limit", type=int, default=100000, help="Most recent tickets to train on")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of tickets held out for the report")
+    args = parser.parse_args()
+
+    from database.db import db
+    tickets = db.get_training_tickets(args.limit)
+    print(f"Loaded {len(tickets)} labelled tickets")
+
+    tca = TicketClassificationAgent()
+    iea = IntentExtractionAgent()
+    jobs = [
+        (tca, lambda t: _label(t['category'], t['priority'])
+            if t.get('category') in tca.categories and t.get('priority') in tca.priority_levels else None),
+        (iea, lambda t: t['intent'] if t.get('intent') in iea.intent_types else None),
+    ]
+    for agent, label_of in jobs:
+        report = evaluate(agent, tickets, label_of, args.holdout)
+        trained = agent.train(tickets)
+        coverage = "n/a" if report['coverage'] is None else f"{report['coverage']:.1%}"
+        agreement = "n/a" if report['agreement'] is None else f"{report['agreement']:.1%}"
+        print(f"{agent.fast_path.name}: trained on {trained} tickets; on {report['tested']} held-out tickets "
+              f"{coverage} answered locally at threshold {agent.fast_path.threshold} "
+              f"with {agreement} agreement")
+
+if __name__ == "__main__":
+    main()
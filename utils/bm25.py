@@ -0,0 +1,155 @@
+import math
+import threading
+from collections import Counter
+from typing import Dict, Hashable, List, Tuple
+import numpy as np
+from utils.text_processing import preprocess_text, extract_keywords
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenize text the same way for documents and queries
+    """
+    return extract_keywords(preprocess_text(text))
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring. Documents can be added,
+    replaced and removed individually, so the index never needs a full rebuild.
+
+    Postings are kept in dicts for cheap updates and compiled lazily into
+    NumPy arrays per term, so a query scores each term's postings in one
+    vectorized step.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}  # term -> {slot: term frequency}
+        self._compiled: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._slots: Dict[Hashable, int] = {}  # doc_id -> dense slot
+        self._slot_ids: List[Hashable] = []
+        self._free_slots: List[int] = []
+        self._doc_terms: Dict[Hashable, Counter] = {}
+        self._doc_texts: Dict[Hashable, str] = {}
+        self._lengths = np.zeros(64, dtype=np.float32)
+        self._total_length = 0
+        self._norms = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._doc_terms
+
+    def _allocate_slot(self, doc_id: Hashable) -> int:
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_ids[slot] = doc_id
+        else:
+            slot = len(self._slot_ids)
+            self._slot_ids.append(doc_id)
+            if slot >= len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+        self._slots[doc_id] = slot
+        return slot
+
+    def add(self, doc_id: Hashable, text: str):
+        with self._lock:
+            if doc_id in self._doc_terms:
+                if self._doc_texts[doc_id] == text:
+                    return
+                self.remove(doc_id)
+
+            slot = self._allocate_slot(doc_id)
+            terms = Counter(tokenize(text))
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[slot] = tf
+                self._compiled.pop(term, None)
+            self._doc_terms[doc_id] = terms
+            self._doc_texts[doc_id] = text
+            length = sum(terms.values())
+            self._lengths[slot] = length
+            self._total_length += length
+            self._norms = None
+
+    def remove(self, doc_id: Hashable):
+        with self._lock:
+            terms = self._doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+            del self._doc_texts[doc_id]
+            slot = self._slots.pop(doc_id)
+            for term in terms:
+                postings = self._postings[term]
+                del postings[slot]
+                if not postings:
+                    del self._postings[term]
+                self._compiled.pop(term, None)
+            self._total_length -= int(self._lengths[slot])
+            self._lengths[slot] = 0
+            self._slot_ids[slot] = None
+            self._free_slots.append(slot)
+            self._norms = None
+
+    def sync(self, documents: Dict[Hashable, str]) -> Tuple[int, int]:
+        """
+        Bring the index in line with the given {doc_id: text} mapping, touching
+        only documents that were added, changed or removed.
+        Returns (documents indexed, documents removed).
+        """
+        with self._lock:
+            removed = [doc_id for doc_id in self._doc_terms if doc_id not in documents]
+            for doc_id in removed:
+                self.remove(doc_id)
+
+            changed = [doc_id for doc_id, text in documents.items() if self._doc_texts.get(doc_id) != text]
+            for doc_id in changed:
+                self.add(doc_id, documents[doc_id])
+            return len(changed), len(removed)
+
+    def _term_postings(self, term: str):
+        compiled = self._compiled.get(term)
+        if compiled is None:
+            postings = self._postings[term]
+            compiled = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            )
+            self._compiled[term] = compiled
+        return compiled
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Hashable, float]]:
+        """
+        Return up to k (doc_id, score) pairs, best match first
+        """
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            terms = [term for term in set(tokenize(query)) if term in self._postings]
+            if not n_docs or not terms:
+                return []
+
+            if self._norms is None:
+                avg_length = self._total_length / n_docs
+                self._norms = self.k1 * (1 - self.b + self.b * self._lengths / avg_length)
+
+            scores = np.zeros(len(self._lengths), dtype=np.float32)
+            touched = []
+            for term in terms:
+                slots, tfs = self._term_postings(term)
+                idf = math.log(1 + (n_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+                scores[slots] += idf * tfs * (self.k1 + 1) / (tfs + self._norms[slots])
+                touched.append(slots)
+
+            # Selective queries only look at the documents they touched;
+            # broad ones select from the whole score vector instead
+            if sum(len(slots) for slots in touched) < len(scores) // 8:
+                candidates = np.unique(np.concatenate(touched))
+            else:
+                candidates = np.arange(len(scores))
+            # Partition on negated scores: selecting the k largest directly
+            # degrades badly when most scores are tied at zero
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self._slot_ids[slot], float(scores[slot])) for slot in candidates if scores[slot] > 0]
@@ -0,0 +1,33 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Absolute time.monotonic() by which the current unit of work must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline_at(when: Optional[float]):
+    """
+    Run the enclosed block under a deadline (a time.monotonic() value).
+    Nested deadlines can only tighten the outer one.
+    """
+    current = _deadline.get()
+    if current is not None and (when is None or current < when):
+        when = current
+    token = _deadline.set(when)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining(timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds left before the current deadline, capped at timeout. Returns
+    None when neither is set.
+    """
+    when = _deadline.get()
+    if when is None:
+        return timeout
+    left = max(0.0, when - time.monotonic())
+    return left if timeout is None else min(left, timeout)
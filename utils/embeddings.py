@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import glob
+import os
+import tempfile
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from utils.text_processing import preprocess_text
+
+logger = logging.getLogger(__name__)
+
+class HashingEmbedder:
+    """
+    Local, deterministic text embedding: character n-grams are hashed into a
+    fixed number of buckets and weighted by TF-IDF. Needs no model download
+    or network access, and gives identical vectors in every process.
+    """
+
+    _PRIME = np.uint64(1099511628211)
+
+    def __init__(self, dim: int = 1024, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def _counts(self, text: str) -> np.ndarray:
+        data = np.frombuffer(f" {preprocess_text(text)} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        counts = np.zeros(self.dim, dtype=np.float32)
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            if len(data) < n:
+                break
+            # Rolling polynomial hash of every n-gram at once
+            hashes = np.full(len(data) - n + 1, n, dtype=np.uint64)
+            for offset in range(n):
+                hashes = hashes * self._PRIME + data[offset:len(data) - n + 1 + offset]
+            counts += np.bincount((hashes % np.uint64(self.dim)).astype(np.int64), minlength=self.dim)
+        return counts
+
+    def fit(self, texts: List[str]) -> np.ndarray:
+        """
+        Learn IDF weights from the corpus and return its embedding matrix
+        """
+        counts = np.vstack([self._counts(text) for text in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        doc_freq = (counts > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + doc_freq)) + 1).astype(np.float32)
+        return self._weight(counts)
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        counts = np.vstack([self._counts(text) for text in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        return self._weight(counts)
+
+    def _weight(self, counts: np.ndarray) -> np.ndarray:
+        vectors = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return (vectors / norms).astype(np.float32)
+
+class VectorIndex:
+    """
+    Dense-vector index over knowledge base entries. Vectors live in one
+    contiguous float32 matrix saved as a .npy file and opened memory-mapped,
+    so several processes serving the same KB share a single copy in the page
+    cache. Cosine top-k for a batch of queries is one matrix multiply.
+
+    Files are named after the fingerprint of the documents they index, so
+    concurrent builders and readers never pair the metadata of one build
+    with the vectors of another.
+    """
+
+    def __init__(self, directory: str, embedder: Optional[HashingEmbedder] = None):
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        self.ids: List[Hashable] = []
+        self.matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self.fingerprint = None
+        self._lock = threading.Lock()
+
+    def _paths(self, fingerprint: str) -> Tuple[str, str, str]:
+        """
+        (matrix, idf, metadata) paths of the build for fingerprint
+        """
+        return tuple(os.path.join(self.directory, f"{name}-{fingerprint}.{ext}")
+                     for name, ext in (("kb_vectors", "npy"), ("kb_idf", "npy"), ("kb_vectors", "json")))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def compute_fingerprint(documents: Dict[Hashable, str]) -> str:
+        digest = hashlib.sha256()
+        for doc_id in sorted(documents, key=str):
+            digest.update(f"{doc_id}\0{documents[doc_id]}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    def sync(self, documents: Dict[Hashable, str]) -> bool:
+        """
+        Make the index reflect the given {doc_id: text} mapping. Reuses the
+        on-disk matrix when another process already built it for the same
+        documents. Returns True if the index was rebuilt.
+        """
+        fingerprint = self.compute_fingerprint(documents)
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return False
+            if self._load(fingerprint):
+                return False
+            self._build(documents, fingerprint)
+            return True
+
+    def _load(self, fingerprint: str) -> bool:
+        matrix_path, idf_path, meta_path = self._paths(fingerprint)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("fingerprint") != fingerprint or meta.get("dim") != self.embedder.dim:
+                return False
+            idf = np.load(idf_path)
+            matrix = np.load(matrix_path, mmap_mode="r")
+        except (OSError, ValueError):
+            # Missing (e.g. removed by a newer build) or unreadable; rebuild instead
+            return False
+        if matrix.shape != (len(meta["ids"]), self.embedder.dim) or idf.shape != (self.embedder.dim,):
+            logger.warning("Ignoring KB vectors in %s that do not match their metadata", matrix_path)
+            return False
+
+        self.embedder.idf = idf
+        self.matrix = matrix
+        self.ids = meta["ids"]
+        self.fingerprint = fingerprint
+        logger.debug("Memory-mapped %s KB vectors from %s", len(self.ids), matrix_path)
+        return True
+
+    def _build(self, documents: Dict[Hashable, str], fingerprint: str):
+        ids = list(documents)
+        matrix = self.embedder.fit([documents[doc_id] for doc_id in ids])
+
+        # Each file is written under a unique temporary name and swapped in, so
+        # readers never see a partial one; the metadata goes last, so once it
+        # exists the matrix and idf of the same build do too
+        matrix_path, idf_path, meta_path = self._paths(fingerprint)
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomic(matrix_path, lambda f: np.save(f, matrix))
+        _write_atomic(idf_path, lambda f: np.save(f, self.embedder.idf))
+        _write_atomic(meta_path, lambda f: f.write(
+            json.dumps({"fingerprint": fingerprint, "dim": self.embedder.dim, "ids": ids}).encode("utf-8")
+        ))
+        self._remove_other_builds(fingerprint)
+
+        self.matrix = np.load(matrix_path, mmap_mode="r")
+        self.ids = ids
+        self.fingerprint = fingerprint
+        logger.debug("Built KB vector index with %s entries", len(ids))
+
+    def _remove_other_builds(self, fingerprint: str):
+        """
+        Delete the files of earlier builds. Processes that mapped them keep
+        their copy; one that finds them gone rebuilds.
+        """
+        keep = set(self._paths(fingerprint))
+        paths = [path for pattern in ("kb_vectors-*", "kb_idf-*")
+                 for path in glob.glob(os.path.join(self.directory, pattern))]
+        for path in paths:
+            if path not in keep and not path.endswith(".tmp"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Hashable, float]]:
+        return self.search_batch([query], k)[0]
+
+    def search_batch(self, queries: List[str], k: int = 5) -> List[List[Tuple[Hashable, float]]]:
+        """
+        Return the top-k (doc_id, cosine similarity) pairs for each query
+        """
+        with self._lock:
+            matrix, ids = self.matrix, self.ids
+            if not queries:
+                return []
+            if not len(ids):
+                return [[] for _ in queries]
+
+            similarities = self.embedder.transform(queries) @ matrix.T
+            k = min(k, len(ids))
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in zip(similarities, top):
+            candidates = candidates[np.argsort(-row[candidates], kind="stable")]
+            results.append([(ids[i], float(row[i])) for i in candidates if row[i] > 0])
+        return results
+
+def _write_atomic(path: str, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,88 @@
+import zlib
+from typing import Dict, Hashable, List, Set, Tuple
+import numpy as np
+from utils.text_processing import preprocess_text
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+class MinHasher:
+    """
+    MinHash signatures over character shingles of the preprocessed text.
+    The fraction of equal positions in two signatures estimates the Jaccard
+    similarity of their shingle sets.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        text = preprocess_text(text)
+        n = self.shingle_size
+        grams = {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self.shingles(text)
+        # One universal hash per permutation: (a * x + b) mod p, truncated to 32 bits
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / len(a)
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing over MinHash signatures: each signature is cut
+    into bands and any two items sharing a whole band become candidates.
+    With 16 bands of 4 rows, pairs at 0.8 Jaccard similarity are found with
+    over 99.9% probability while dissimilar pairs rarely collide.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[Hashable]]] = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: Hashable, signature: np.ndarray):
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def query(self, signature: np.ndarray, threshold: float) -> List[Tuple[Hashable, float]]:
+        """
+        Return (key, estimated similarity) for candidates at or above
+        threshold, most similar first
+        """
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        matches = [(key, similarity(signature, self.signatures[key])) for key in candidates]
+        return sorted((m for m in matches if m[1] >= threshold), key=lambda m: m[1], reverse=True)
@@ -0,0 +1,72 @@
+import os
+import zlib
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from utils.bm25 import tokenize
+
+class HashedNaiveBayes:
+    """
+    Multinomial naive Bayes over hashed word unigrams and bigrams. Small
+    enough to train on the ticket history in seconds and to score a ticket
+    in well under a millisecond on the CPU.
+    """
+
+    def __init__(self, dim: int = 2 ** 16, alpha: float = 0.1):
+        self.dim = dim
+        self.alpha = alpha
+        self.labels: List[str] = []
+        self.log_prior: Optional[np.ndarray] = None
+        self.log_likelihood: Optional[np.ndarray] = None
+
+    def features(self, text: str) -> np.ndarray:
+        tokens = tokenize(text)
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) % self.dim for gram in grams),
+                           dtype=np.int64, count=len(grams))
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str]) -> "HashedNaiveBayes":
+        self.labels = sorted(set(labels))
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        counts = np.zeros((len(self.labels), self.dim), dtype=np.float64)
+        class_counts = np.zeros(len(self.labels), dtype=np.float64)
+
+        for text, label in zip(texts, labels):
+            row = label_index[label]
+            np.add.at(counts[row], self.features(text), 1.0)
+            class_counts[row] += 1
+
+        counts += self.alpha
+        self.log_likelihood = (np.log(counts) - np.log(counts.sum(axis=1, keepdims=True))).astype(np.float32)
+        self.log_prior = np.log(class_counts / class_counts.sum()).astype(np.float32)
+        return self
+
+    @property
+    def trained(self) -> bool:
+        return self.log_likelihood is not None
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Return (most likely label, its posterior probability)
+        """
+        scores = self.log_prior + self.log_likelihood[:, self.features(text)].sum(axis=1)
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Write next to the target and rename so readers never see a partial file
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, labels=np.array(self.labels), log_prior=self.log_prior,
+                            log_likelihood=self.log_likelihood, alpha=self.alpha)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNaiveBayes":
+        with np.load(path) as data:
+            model = cls(dim=data['log_likelihood'].shape[1], alpha=float(data['alpha']))
+            model.labels = [str(label) for label in data['labels']]
+            model.log_prior = data['log_prior']
+            model.log_likelihood = data['log_likelihood']
+        return model